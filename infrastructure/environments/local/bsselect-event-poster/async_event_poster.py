@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+import time
+from typing import List, Tuple
+import aiohttp
+import psycopg
+from event_poster import (
+    BATCH_MAX_RECORDS,
+    MAX_ATTEMPTS,
+    MAX_IN_FLIGHT,
+    NDJSON_CONTENT_TYPE,
+    NSP_URL,
+    REQUEST_TIMEOUT_SECONDS,
+    connection_settings,
+    echo,
+    expand_change_sets,
+    payloads_to_retry,
+    retry_delay,
+    trace_headers,
+)
+
+# Notifications buffered between the listener and the HTTP workers
+QUEUE_SIZE = int(os.environ.get("POSTER_QUEUE_SIZE") or "10000")
+RECONNECT_MAX_DELAY_SECONDS = 30
+
+# A payload and the time it was read from the database, in epoch seconds
+Notification = Tuple[float, str]
+
+
+async def listen(queue: "asyncio.Queue[Notification]") -> None:
+    """
+    Put every notification on the queue, reconnecting whenever the connection drops.
+
+    The connection is read as soon as notifications arrive, independently of the
+    HTTP workers. Once the queue is full the listener waits for the workers to
+    catch up, and Postgres holds further notifications in its own queue.
+    Notifications sent while the listener is disconnected are not redelivered.
+    """
+    attempt = 0
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(**connection_settings(), autocommit=True) as conn:
+                await conn.execute("LISTEN subjects;")
+                attempt = 0
+                logging.info("Listening for notifications...")
+                async for notify in conn.notifies():
+                    # Stamped on arrival, so time spent waiting in the queue counts towards latency
+                    captured_at = time.time()
+                    for payload in expand_change_sets([notify.payload]):
+                        await queue.put((captured_at, payload))
+        except psycopg.OperationalError as e:
+            attempt += 1
+            delay = min(2 ** attempt, RECONNECT_MAX_DELAY_SECONDS)
+            logging.warning(f"Lost connection to Postgres, reconnecting in {delay}s: {e}")
+            await asyncio.sleep(delay)
+
+
+async def next_batch(queue: "asyncio.Queue[Notification]") -> List[Notification]:
+    """Wait for a notification, then take whatever else is already queued up to a full batch."""
+    notifications = [await queue.get()]
+    while len(notifications) < BATCH_MAX_RECORDS and not queue.empty():
+        notifications.append(queue.get_nowait())
+    return notifications
+
+
+async def send(session: aiohttp.ClientSession, payloads: List[str], captured_at: float) -> List[str]:
+    """Post one batch and return the payloads that should be retried."""
+    try:
+        async with session.post(
+            NSP_URL, data="\n".join(payloads).encode("utf-8"), headers=trace_headers(captured_at)
+        ) as response:
+            try:
+                results = (await response.json(content_type=None))["results"]
+            except (ValueError, KeyError, TypeError):
+                results = None
+            return payloads_to_retry(payloads, response.status, results)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.warning(f"Failed to post {len(payloads)} notifications: {e}")
+        return payloads
+
+
+async def forward(queue: "asyncio.Queue[Notification]", session: aiohttp.ClientSession) -> None:
+    while True:
+        notifications = await next_batch(queue)
+        # The batch is as old as its oldest notification
+        captured_at = min(captured_at for captured_at, _ in notifications)
+        payloads = [payload for _, payload in notifications]
+        echo(payloads)
+        pending = payloads
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            pending = await send(session, pending, captured_at)
+            if not pending:
+                break
+            if attempt < MAX_ATTEMPTS:
+                await asyncio.sleep(retry_delay(attempt))
+        else:
+            logging.error(f"Giving up on {len(pending)} notifications after {MAX_ATTEMPTS} attempts.")
+        for _ in payloads:
+            queue.task_done()
+
+
+async def main() -> None:
+    queue: "asyncio.Queue[Notification]" = asyncio.Queue(maxsize=QUEUE_SIZE)
+    connector = aiohttp.TCPConnector(limit=MAX_IN_FLIGHT)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS)
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=timeout, headers={"Content-Type": NDJSON_CONTENT_TYPE}
+    ) as session:
+        workers = [asyncio.create_task(forward(queue, session)) for _ in range(MAX_IN_FLIGHT)]
+        await asyncio.gather(listen(queue), *workers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
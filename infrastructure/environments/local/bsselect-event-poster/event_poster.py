@@ -1,50 +1,239 @@
 import psycopg2
 import psycopg2.extensions
 import json
+import logging
 import os
 import requests
 import select
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+from uuid import uuid4
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
 load_dotenv()
 
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
 NSP_URL = os.environ.get("NSP_SERVICE_LAYER_URL")
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+# Carried by the service layer as Service Bus application properties, so each stage can be timed
+CORRELATION_ID_HEADER = "X-Correlation-Id"
+CAPTURE_TIME_HEADER = "X-Capture-Time"
+
+# Notifications are forwarded in batches of up to this many records per request
+BATCH_MAX_RECORDS = int(os.environ.get("POSTER_BATCH_MAX_RECORDS") or "500")
+# Requests allowed in flight at once; the listener waits for a free slot beyond this
+MAX_IN_FLIGHT = int(os.environ.get("POSTER_MAX_IN_FLIGHT") or "4")
+MAX_ATTEMPTS = int(os.environ.get("POSTER_MAX_ATTEMPTS") or "5")
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("POSTER_REQUEST_TIMEOUT_SECONDS") or "30")
+# Where changes are read from: "notify" payloads, "statement" change sets, the "outbox" table
+# or a "logical" replication slot
+CHANGE_CAPTURE_MODE = (os.environ.get("CHANGE_CAPTURE_MODE") or "notify").lower()
+# Listen with the asyncio consumer in async_event_poster.py instead of the select loop
+ASYNC_ENABLED = (os.environ.get("POSTER_ASYNC_ENABLED") or "false").lower() == "true"
+# Print every notification to stdout, as the poster used to
+DEBUG_ECHO = (os.environ.get("POSTER_DEBUG_ECHO") or "false").lower() == "true"
+
 
-# Connect to your database
-conn = psycopg2.connect(
-    dbname=os.environ.get("POSTGRES_DB"),
-    user=os.environ.get("POSTGRES_USER"),
-    password=os.environ.get("POSTGRES_PASSWORD"),
-    host=os.environ.get("POSTGRES_HOST"),
-    port=os.environ.get("POSTGRES_PORT"),
-)
+def connection_settings() -> dict:
+    return {
+        "dbname": os.environ.get("POSTGRES_DB"),
+        "user": os.environ.get("POSTGRES_USER"),
+        "password": os.environ.get("POSTGRES_PASSWORD"),
+        "host": os.environ.get("POSTGRES_HOST"),
+        "port": os.environ.get("POSTGRES_PORT"),
+    }
 
 
+def connect():
+    conn = psycopg2.connect(**connection_settings())
+    # Set isolation level to autocommit
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    cursor = conn.cursor()
+    cursor.execute("LISTEN subjects;")
+    return conn
 
-# Set isolation level to autocommit
-conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
 
-# Create cursor and listen for notifications
-cursor = conn.cursor()
-cursor.execute("LISTEN subjects;")
+def create_session(pool_size: int = MAX_IN_FLIGHT) -> requests.Session:
+    """A keep-alive session with a connection for every request that can be in flight."""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+    session.headers["Content-Type"] = NDJSON_CONTENT_TYPE
+    return session
 
-print("Listening for notifications...")
-while True:
-    # conn.poll() didn't work without this blocking call
-    if select.select([conn], [], [], 5) == ([], [], []):
-        # Timeout, no notifications
-        print("Timeout")
-        continue
 
-    print("Ooh, there's something to poll!")
+def drain_notifies(conn) -> List[str]:
+    """Read every notification the connection has received so far."""
     conn.poll()
-    while conn.notifies:
-        notify = conn.notifies.pop(0)
-        # Parse the JSON payload and pretty print it
-        data = json.loads(notify.payload)
-        print(json.dumps(data, indent=2))
+    payloads = [notify.payload for notify in conn.notifies]
+    conn.notifies.clear()
+    return payloads
+
+
+def expand_change_sets(payloads: List[str]) -> List[str]:
+    """
+    Split statement-level change sets into one event per row.
+
+    In statement mode each notification holds the rows one statement changed,
+    as {"operation", "timestamp", "rows"}. The service layer expects the same
+    {"operation", "timestamp", "data"} events the row trigger sends.
+    """
+    if CHANGE_CAPTURE_MODE != "statement":
+        return payloads
+    events = []
+    for payload in payloads:
+        change_set = json.loads(payload)
+        for row in change_set["rows"]:
+            events.append(
+                json.dumps({"operation": change_set["operation"], "timestamp": change_set["timestamp"], "data": row})
+            )
+    return events
+
+
+def echo(payloads: List[str]) -> None:
+    if DEBUG_ECHO:
+        for payload in payloads:
+            print(json.dumps(json.loads(payload), indent=2))
+
+
+def iter_batches(payloads: List[str], size: int) -> Iterator[List[str]]:
+    for start in range(0, len(payloads), size):
+        yield payloads[start:start + size]
+
+
+def payloads_to_retry(payloads: List[str], status_code: int, results: Optional[List[dict]]) -> List[str]:
+    """Pick the payloads of a batch to post again, given the service layer response."""
+    if status_code == 200:
+        logging.info(f"Forwarded {len(payloads)} notifications.")
+        return []
+
+    if results is None:
+        logging.warning(f"Service layer returned {status_code} for {len(payloads)} notifications.")
+        return payloads if status_code >= 500 else []
+
+    # Rejected records are invalid and would be rejected again; only failed ones are retried
+    retry = []
+    for result in results:
+        if result["status"] == "rejected":
+            logging.error(f"Notification rejected by the service layer: {result.get('error')}")
+        elif result["status"] == "failed":
+            retry.append(payloads[result["index"]])
+    logging.info(f"Forwarded {len(payloads) - len(retry)} of {len(payloads)} notifications.")
+    return retry
+
+
+def trace_headers(captured_at: float) -> Dict[str, str]:
+    """A correlation ID for the request and the time its changes were read from the database, in epoch ms."""
+    return {CORRELATION_ID_HEADER: uuid4().hex, CAPTURE_TIME_HEADER: str(int(captured_at * 1000))}
+
+
+def retry_delay(attempt: int) -> float:
+    return min(2 ** attempt, 30)
+
+
+class Forwarder:
+    """
+    Posts batches of notifications to the service layer bulk endpoint.
+
+    Each batch is sent as one NDJSON request. The trigger already emits one
+    JSON object per notification, so payloads are forwarded without being
+    parsed. At most ``max_in_flight`` requests run at once and ``submit``
+    blocks while they do, so a slow service layer holds the listener back
+    instead of growing an unbounded backlog in memory.
+    """
+
+    def __init__(self, session: requests.Session, url: str, max_in_flight: int):
+        self._session = session
+        self._url = url
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="forwarder")
+        self._window = threading.BoundedSemaphore(max_in_flight)
+
+    def submit(self, payloads: List[str], captured_at: float) -> None:
+        self._window.acquire()
+        future = self._executor.submit(self._post, payloads, captured_at)
+        future.add_done_callback(lambda _: self._window.release())
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def _post(self, payloads: List[str], captured_at: float) -> None:
+        post_with_retries(self._session, self._url, payloads, captured_at)
+
+
+def post_with_retries(
+    session: requests.Session, url: str, payloads: List[str], captured_at: Optional[float] = None
+) -> List[str]:
+    """Post a batch, retrying failed records with backoff. Returns the payloads that never got through."""
+    captured_at = captured_at or time.time()
+    pending = payloads
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        pending = send(session, url, pending, captured_at)
+        if not pending:
+            return []
+        if attempt < MAX_ATTEMPTS:
+            time.sleep(retry_delay(attempt))
+    logging.error(f"Giving up on {len(pending)} notifications after {MAX_ATTEMPTS} attempts.")
+    return pending
+
+
+def send(session: requests.Session, url: str, payloads: List[str], captured_at: float) -> List[str]:
+    """Post one batch and return the payloads that should be retried."""
+    try:
+        response = session.post(
+            url,
+            data="\n".join(payloads).encode("utf-8"),
+            headers=trace_headers(captured_at),
+            timeout=REQUEST_TIMEOUT_SECONDS,
+        )
+    except requests.RequestException as e:
+        logging.warning(f"Failed to post {len(payloads)} notifications: {e}")
+        return payloads
+
+    try:
+        results = response.json()["results"]
+    except (ValueError, KeyError, TypeError):
+        results = None
+    return payloads_to_retry(payloads, response.status_code, results)
+
+
+def main():
+    conn = connect()
+    forwarder = Forwarder(create_session(), NSP_URL, MAX_IN_FLIGHT)
+
+    logging.info("Listening for notifications...")
+    try:
+        while True:
+            # conn.poll() didn't work without this blocking call
+            if select.select([conn], [], [], 5) == ([], [], []):
+                continue
+
+            payloads = expand_change_sets(drain_notifies(conn))
+            captured_at = time.time()
+            echo(payloads)
+
+            for batch in iter_batches(payloads, BATCH_MAX_RECORDS):
+                forwarder.submit(batch, captured_at)
+    finally:
+        forwarder.close()
+
+
+if __name__ == "__main__":
+    if CHANGE_CAPTURE_MODE == "outbox":
+        from outbox_poster import main as outbox_main
 
+        outbox_main()
+    elif CHANGE_CAPTURE_MODE == "logical":
+        from replication_poster import main as replication_main
 
-        result = requests.post(NSP_URL, json = data)
+        replication_main()
+    elif ASYNC_ENABLED:
+        import asyncio
+        from async_event_poster import main as async_main
 
-        print('result is ', result)
+        asyncio.run(async_main())
+    else:
+        main()
@@ -0,0 +1,121 @@
+import logging
+import os
+import select
+import threading
+import time
+from collections import Counter
+from typing import Tuple
+import psycopg2
+import requests
+from event_poster import (
+    BATCH_MAX_RECORDS,
+    NSP_URL,
+    connection_settings,
+    create_session,
+    echo,
+    retry_delay,
+    send,
+)
+
+OUTBOX_CHANNEL = "subjects_outbox"
+# Connections draining the outbox in parallel; use 1 to forward changes in order
+OUTBOX_DRAINERS = int(os.environ.get("POSTER_OUTBOX_DRAINERS") or "1")
+# Drain the outbox this often even without a wake-up notification
+OUTBOX_POLL_SECONDS = float(os.environ.get("POSTER_OUTBOX_POLL_SECONDS") or "5")
+RECONNECT_MAX_DELAY_SECONDS = 30
+
+CLAIM_SQL = """
+    SELECT id, payload::text FROM subjects_outbox
+    ORDER BY id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+DELETE_SQL = "DELETE FROM subjects_outbox WHERE id = ANY(%s)"
+
+
+def connect():
+    conn = psycopg2.connect(**connection_settings())
+    with conn, conn.cursor() as cursor:
+        cursor.execute(f"LISTEN {OUTBOX_CHANNEL};")
+    return conn
+
+
+def drain_outbox(conn, session: requests.Session) -> Tuple[int, int]:
+    """
+    Forward one batch of outbox rows and delete the ones that got through.
+
+    The rows stay locked for a single post, so parallel drainers skip them.
+    The transaction is committed straight after, releasing rows that could not
+    be forwarded, so no lock is held while the caller backs off before retrying.
+    Returns the number of rows claimed and the number left undelivered.
+    """
+    with conn, conn.cursor() as cursor:
+        cursor.execute(CLAIM_SQL, (BATCH_MAX_RECORDS,))
+        rows = cursor.fetchall()
+        if not rows:
+            return 0, 0
+
+        payloads = [payload for _, payload in rows]
+        echo(payloads)
+        undelivered = Counter(send(session, NSP_URL, payloads, time.time()))
+        delivered_ids = []
+        for row_id, payload in rows:
+            if undelivered[payload]:
+                undelivered[payload] -= 1
+            else:
+                delivered_ids.append(row_id)
+        cursor.execute(DELETE_SQL, (delivered_ids,))
+    return len(rows), len(rows) - len(delivered_ids)
+
+
+def wait_for_changes(conn) -> None:
+    if select.select([conn], [], [], OUTBOX_POLL_SECONDS) != ([], [], []):
+        conn.poll()
+        conn.notifies.clear()
+
+
+def run_drainer(session: requests.Session) -> None:
+    attempt = 0
+    while True:
+        try:
+            conn = connect()
+            attempt = 0
+            failures = 0
+            try:
+                while True:
+                    # Keep draining while there is a backlog, then wait to be woken up
+                    claimed, undelivered = drain_outbox(conn, session)
+                    if undelivered:
+                        # The rows stay in the outbox, so back off and retry them without giving up
+                        failures += 1
+                        delay = retry_delay(failures)
+                        logging.warning(f"{undelivered} outbox rows were not forwarded, retrying in {delay}s.")
+                        time.sleep(delay)
+                        continue
+                    failures = 0
+                    if claimed == 0:
+                        wait_for_changes(conn)
+            finally:
+                conn.close()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            attempt += 1
+            delay = min(2 ** attempt, RECONNECT_MAX_DELAY_SECONDS)
+            logging.warning(f"Lost connection to Postgres, reconnecting in {delay}s: {e}")
+            time.sleep(delay)
+
+
+def main():
+    session = create_session(pool_size=OUTBOX_DRAINERS)
+    logging.info(f"Draining the outbox with {OUTBOX_DRAINERS} connection(s)...")
+    drainers = [
+        threading.Thread(target=run_drainer, args=(session,), name=f"outbox-drainer-{i}", daemon=True)
+        for i in range(OUTBOX_DRAINERS)
+    ]
+    for drainer in drainers:
+        drainer.start()
+    for drainer in drainers:
+        drainer.join()
+
+
+if __name__ == "__main__":
+    main()
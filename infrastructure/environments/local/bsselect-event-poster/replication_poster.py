@@ -0,0 +1,232 @@
+import json
+import logging
+import os
+import select
+import struct
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+import psycopg2
+import psycopg2.extras
+import requests
+from event_poster import (
+    BATCH_MAX_RECORDS,
+    NSP_URL,
+    connection_settings,
+    create_session,
+    echo,
+    iter_batches,
+    post_with_retries,
+)
+
+REPLICATION_SLOT = os.environ.get("POSTER_REPLICATION_SLOT") or "subjects_slot"
+PUBLICATION = os.environ.get("POSTER_PUBLICATION") or "subjects_publication"
+# Forward what has been decoded once the stream has been idle this long
+IDLE_SECONDS = 1
+RECONNECT_MAX_DELAY_SECONDS = 30
+
+POSTGRES_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+OPERATIONS = {b"I": "INSERT", b"U": "UPDATE", b"D": "DELETE"}
+
+# Type OIDs that json_build_object renders as JSON numbers, booleans or nested JSON
+BOOL_OID = 16
+INTEGER_OIDS = {20, 21, 23}
+FLOAT_OIDS = {700, 701, 1700}
+JSON_OIDS = {114, 3802}
+TIMESTAMP_OID = 1114
+TIMESTAMPTZ_OID = 1184
+
+
+class Relation(NamedTuple):
+    name: str
+    columns: List[Tuple[str, int]]
+
+
+class Commit(NamedTuple):
+    end_lsn: int
+
+
+class ReplicationError(Exception):
+    """Raised when decoded changes could not be forwarded, so they are replayed from the slot."""
+
+
+class PgOutputDecoder:
+    """
+    Decodes pgoutput (protocol version 1) messages into change events.
+
+    Inserts, updates and deletes become ``{operation, timestamp, data}`` dicts,
+    the same shape the row trigger sends, with ``timestamp`` the commit time.
+    Deletes carry the old row, which is complete because the table uses
+    ``REPLICA IDENTITY FULL``. Other messages are consumed for their state.
+    """
+
+    def __init__(self):
+        self.relations: Dict[int, Relation] = {}
+        self.commit_time: Optional[str] = None
+
+    def decode(self, payload: bytes) -> Union[dict, Commit, None]:
+        kind, body = payload[:1], memoryview(payload)[1:]
+        if kind == b"B":
+            _, commit_ts, _ = struct.unpack_from(">qqi", body)
+            self.commit_time = (POSTGRES_EPOCH + timedelta(microseconds=commit_ts)).isoformat()
+        elif kind == b"C":
+            _, _, end_lsn, _ = struct.unpack_from(">bqqq", body)
+            return Commit(end_lsn)
+        elif kind == b"R":
+            self._decode_relation(body)
+        elif kind in OPERATIONS:
+            return self._decode_change(OPERATIONS[kind], body)
+        elif kind == b"T":
+            logging.warning("Ignoring TRUNCATE, which has no row events to forward.")
+        return None
+
+    def _decode_relation(self, body: memoryview) -> None:
+        (relation_id,) = struct.unpack_from(">i", body)
+        offset = 4
+        _, offset = read_string(body, offset)
+        name, offset = read_string(body, offset)
+        (n_columns,) = struct.unpack_from(">h", body, offset + 1)
+        offset += 3
+        columns = []
+        for _ in range(n_columns):
+            column, offset = read_string(body, offset + 1)
+            (type_oid,) = struct.unpack_from(">i", body, offset)
+            offset += 8
+            columns.append((column, type_oid))
+        self.relations[relation_id] = Relation(name, columns)
+
+    def _decode_change(self, operation: str, body: memoryview) -> dict:
+        (relation_id,) = struct.unpack_from(">i", body)
+        relation = self.relations[relation_id]
+        offset = 4
+        old: Optional[dict] = None
+        new: Optional[dict] = None
+        while offset < len(body):
+            marker = bytes(body[offset:offset + 1])
+            row, offset = read_tuple(body, offset + 1, relation, old)
+            if marker == b"N":
+                new = row
+            else:
+                old = row
+        return {"operation": operation, "timestamp": self.commit_time, "data": new if new is not None else old}
+
+
+def read_string(body: memoryview, offset: int) -> Tuple[str, int]:
+    end = bytes(body[offset:]).index(b"\0") + offset
+    return bytes(body[offset:end]).decode("utf-8"), end + 1
+
+
+def read_tuple(body: memoryview, offset: int, relation: Relation, old: Optional[dict]) -> Tuple[dict, int]:
+    (n_columns,) = struct.unpack_from(">h", body, offset)
+    offset += 2
+    row = {}
+    for name, type_oid in relation.columns[:n_columns]:
+        kind = bytes(body[offset:offset + 1])
+        offset += 1
+        if kind == b"t":
+            (length,) = struct.unpack_from(">i", body, offset)
+            text = bytes(body[offset + 4:offset + 4 + length]).decode("utf-8")
+            offset += 4 + length
+            row[name] = to_json_value(text, type_oid)
+        elif kind == b"u":
+            # Unchanged TOAST values are not sent; the old row has them
+            row[name] = old.get(name) if old else None
+        else:
+            row[name] = None
+    return row, offset
+
+
+def to_json_value(text: str, type_oid: int):
+    """Convert a column's text output to the value json_build_object would give it."""
+    if type_oid in INTEGER_OIDS:
+        return int(text)
+    if type_oid in FLOAT_OIDS:
+        return float(text)
+    if type_oid == BOOL_OID:
+        return text == "t"
+    if type_oid in JSON_OIDS:
+        return json.loads(text)
+    if type_oid == TIMESTAMP_OID:
+        return text.replace(" ", "T")
+    if type_oid == TIMESTAMPTZ_OID:
+        value = text.replace(" ", "T")
+        # Offsets print as "+00"; JSON renders them as "+00:00"
+        return value + ":00" if value[-3] in "+-" else value
+    return text
+
+
+def forward(session: requests.Session, payloads: List[str]) -> None:
+    echo(payloads)
+    for batch in iter_batches(payloads, BATCH_MAX_RECORDS):
+        if post_with_retries(session, NSP_URL, batch):
+            raise ReplicationError(f"Could not forward {len(batch)} changes.")
+
+
+def stream_changes(session: requests.Session) -> None:
+    """
+    Forward changes from the replication slot until the connection fails.
+
+    Changes are forwarded a whole transaction at a time, once a batch has
+    built up or the stream goes idle, and only then is the slot told the
+    commit LSN. After a restart the slot replays from the last acknowledged
+    commit, so nothing is lost.
+    """
+    conn = psycopg2.connect(**connection_settings(), connection_factory=psycopg2.extras.LogicalReplicationConnection)
+    try:
+        cursor = conn.cursor()
+        cursor.start_replication(
+            slot_name=REPLICATION_SLOT,
+            decode=False,
+            options={"proto_version": "1", "publication_names": PUBLICATION},
+        )
+        logging.info(f"Streaming changes from replication slot '{REPLICATION_SLOT}'...")
+
+        decoder = PgOutputDecoder()
+        transaction: List[str] = []
+        committed: List[str] = []
+        commit_lsn: Optional[int] = None
+        while True:
+            message = cursor.read_message()
+            if message is None:
+                if committed:
+                    forward(session, committed)
+                    committed = []
+                if commit_lsn is not None:
+                    cursor.send_feedback(flush_lsn=commit_lsn)
+                    commit_lsn = None
+                select.select([cursor], [], [], IDLE_SECONDS)
+                continue
+
+            change = decoder.decode(message.payload)
+            if isinstance(change, Commit):
+                committed.extend(transaction)
+                transaction = []
+                commit_lsn = change.end_lsn
+                if len(committed) >= BATCH_MAX_RECORDS:
+                    forward(session, committed)
+                    committed = []
+                    cursor.send_feedback(flush_lsn=commit_lsn)
+                    commit_lsn = None
+            elif change is not None:
+                transaction.append(json.dumps(change))
+    finally:
+        conn.close()
+
+
+def main():
+    session = create_session(pool_size=1)
+    attempt = 0
+    while True:
+        started = time.monotonic()
+        try:
+            stream_changes(session)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError, ReplicationError) as e:
+            # Back off only while the stream keeps failing straight away
+            attempt = attempt + 1 if time.monotonic() - started < RECONNECT_MAX_DELAY_SECONDS else 1
+            delay = min(2 ** attempt, RECONNECT_MAX_DELAY_SECONDS)
+            logging.warning(f"Replication stopped, resuming from the last acknowledged change in {delay}s: {e}")
+            time.sleep(delay)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+-- =================================================================================
+-- Capture subjects changes from the write-ahead log instead of a row trigger.
+-- The event poster streams them from a logical replication slot with pgoutput,
+-- so writes to subjects no longer build JSON or notify inside their transaction.
+-- Requires wal_level=logical, which docker-compose sets on the database.
+-- =================================================================================
+-- Created first, as a slot cannot be created in a transaction that has written.
+-- The slot keeps WAL from here on, so no change is missed before the poster starts.
+SELECT pg_create_logical_replication_slot('subjects_slot', 'pgoutput');
+
+DROP TRIGGER subjects_change_capture ON subjects;
+
+-- Log whole old rows, so deletes carry the full row rather than just its key
+ALTER TABLE subjects REPLICA IDENTITY FULL;
+
+CREATE PUBLICATION subjects_publication FOR TABLE subjects;
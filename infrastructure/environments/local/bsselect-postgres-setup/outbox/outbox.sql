@@ -0,0 +1,23 @@
+-- =================================================================================
+-- Capture subjects changes in an outbox table instead of notification payloads.
+-- Rows stay in the outbox until the event poster has forwarded them, so no change
+-- is lost while the poster is down, and there is no 8KB payload limit. NOTIFY is
+-- only a wake-up hint; its empty payloads are collapsed within a transaction.
+-- =================================================================================
+CREATE TABLE subjects_outbox (
+    id               BIGSERIAL PRIMARY KEY,
+    payload          JSON NOT NULL,
+    created_at       TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE OR REPLACE FUNCTION process_subjects_change_capture() RETURNS TRIGGER AS $$
+
+    DECLARE channel varchar := 'subjects_outbox';
+
+    BEGIN
+        INSERT INTO subjects_outbox (payload)
+        VALUES (json_build_object('operation',TG_OP,'timestamp',CURRENT_TIMESTAMP,'data',NEW));
+        PERFORM pg_notify(channel, '');
+        RETURN NULL; -- result is ignored since this is an AFTER trigger
+    END;
+$$ LANGUAGE plpgsql;
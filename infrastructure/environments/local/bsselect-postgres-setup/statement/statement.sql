@@ -0,0 +1,51 @@
+-- =================================================================================
+-- Emit one change set per statement instead of one notification per row.
+-- Statement-level triggers read the affected rows from transition tables and send
+-- them as {"operation", "timestamp", "rows": [...]} envelopes, split so each stays
+-- under the 8000 byte NOTIFY payload limit. Deletes carry the deleted rows.
+-- =================================================================================
+DROP TRIGGER subjects_change_capture ON subjects;
+
+CREATE OR REPLACE FUNCTION process_subjects_statement_change_capture() RETURNS TRIGGER AS $$
+
+    DECLARE
+        channel varchar := 'subjects';
+        max_payload_bytes integer := 7999;
+        envelope_start text := json_build_object('operation',TG_OP,'timestamp',CURRENT_TIMESTAMP)::text;
+        envelope_end text := ']}';
+        chunk text := '';
+        row_json text;
+
+    BEGIN
+        -- Reopen the object to append the rows array: {"operation" : ..., "timestamp" : ..., "rows":[
+        envelope_start := left(envelope_start, -1) || ', "rows":[';
+        FOR row_json IN SELECT row_to_json(changed_rows)::text FROM changed_rows LOOP
+            IF chunk <> '' AND octet_length(envelope_start) + octet_length(chunk) + 1
+                    + octet_length(row_json) + octet_length(envelope_end) > max_payload_bytes THEN
+                PERFORM pg_notify(channel, envelope_start || chunk || envelope_end);
+                chunk := '';
+            END IF;
+            chunk := chunk || CASE WHEN chunk = '' THEN '' ELSE ',' END || row_json;
+        END LOOP;
+        IF chunk <> '' THEN
+            PERFORM pg_notify(channel, envelope_start || chunk || envelope_end);
+        END IF;
+        RETURN NULL; -- result is ignored since this is an AFTER trigger
+    END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event
+CREATE TRIGGER subjects_insert_change_capture
+AFTER INSERT ON subjects
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION process_subjects_statement_change_capture();
+
+CREATE TRIGGER subjects_update_change_capture
+AFTER UPDATE ON subjects
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION process_subjects_statement_change_capture();
+
+CREATE TRIGGER subjects_delete_change_capture
+AFTER DELETE ON subjects
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION process_subjects_statement_change_capture();
@@ -0,0 +1,12 @@
+#!/bin/bash
+
+set -euo pipefail
+
+# The entrypoint runs init files in name order, so the zz_ prefix keeps this after ddl.sql has created
+# the subjects table and its row trigger. Modes other than the default notify have their SQL in a
+# directory of the same name.
+mode="${CHANGE_CAPTURE_MODE:-notify}"
+if [ -d "/docker-entrypoint-initdb.d/${mode}" ]; then
+    psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" \
+        -f "/docker-entrypoint-initdb.d/${mode}/${mode}.sql"
+fi
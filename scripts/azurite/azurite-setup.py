@@ -11,7 +11,8 @@ def setup_azurite():
         connect_str = os.getenv("AZURITE_CONNECTION_STRING")
         container_names = [
             os.getenv("AZURITE_CONTAINER_NAME"),
-            os.getenv("AZURITE_POISON_CONTAINER_NAME")
+            os.getenv("AZURITE_POISON_CONTAINER_NAME"),
+            os.getenv("AZURITE_CLAIM_CHECK_CONTAINER_NAME")
         ]
 
         if not connect_str:
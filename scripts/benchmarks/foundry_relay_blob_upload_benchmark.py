@@ -0,0 +1,103 @@
+"""
+Benchmark for foundry_relay blob uploads against Azurite.
+
+Uploads generated batches of ``subjects`` change events through
+``write_to_blob`` twice: once with a block size larger than the batch, which
+forces the single ``upload_blob`` request, and once staging blocks in
+parallel. Reports wall time, throughput and the peak Python memory allocated
+during each upload.
+
+Start Azurite from the docker-compose stack first (``docker compose up azurite``),
+then run from the repository root:
+
+    python scripts/benchmarks/foundry_relay_blob_upload_benchmark.py --events 200000 --concurrency 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from azure.core.exceptions import ResourceExistsError  # noqa: E402
+from function_apps.foundry_relay.foundry_relay import foundry_relay  # noqa: E402
+
+AZURITE_CONNECTION_STRING = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+
+
+def make_bodies(n_events: int) -> list:
+    return [
+        json.dumps(
+            {
+                "operation": "INSERT",
+                "timestamp": "2024-05-01T09:30:00.123456+00:00",
+                "data": {
+                    "id": index,
+                    "name": f"Subject {index}",
+                    "age": 50 + index % 21,
+                    "created_at": "2024-05-01T09:30:00.123456",
+                    "updated_at": "2024-05-01T09:30:00.123456",
+                },
+            }
+        ).encode("utf-8")
+        for index in range(n_events)
+    ]
+
+
+def run(label: str, bodies: list, conn_str: str, container: str, block_size: int, concurrency: int) -> dict:
+    os.environ["BLOB_UPLOAD_BLOCK_SIZE"] = str(block_size)
+    os.environ["BLOB_UPLOAD_MAX_CONCURRENCY"] = str(concurrency)
+    file_name = foundry_relay.generate_file_name()
+    content = foundry_relay.encode_batch(bodies, foundry_relay.FileFormat.JSON)
+    raw_bytes = sum(len(body) + 2 for body in bodies)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    foundry_relay.write_to_blob(file_name, content, conn_str, container)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "variant": label,
+        "bytes": raw_bytes,
+        "seconds": round(elapsed, 3),
+        "mb_per_s": round(raw_bytes / elapsed / 1_000_000, 1),
+        "peak_alloc_mb": round(peak / 1_000_000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200_000, help="Events per batch (~230 bytes each).")
+    parser.add_argument("--block-size", type=int, default=4 * 1024 * 1024)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--connection-string", default=os.getenv("BENCHMARK_AZURITE_CONNECTION_STRING", AZURITE_CONNECTION_STRING))
+    parser.add_argument("--container", default="benchmark")
+    args = parser.parse_args()
+
+    service_client = foundry_relay.get_blob_service_client(args.connection_string)
+    try:
+        service_client.create_container(args.container)
+    except ResourceExistsError:
+        pass
+
+    bodies = make_bodies(args.events)
+    single_block = sum(len(body) + 2 for body in bodies) + 1
+    results = [
+        run("single-upload", bodies, args.connection_string, args.container, single_block, 1),
+        run("staged-serial", bodies, args.connection_string, args.container, args.block_size, 1),
+        run(f"staged-x{args.concurrency}", bodies, args.connection_string, args.container, args.block_size, args.concurrency),
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
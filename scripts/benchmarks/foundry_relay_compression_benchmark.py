@@ -0,0 +1,103 @@
+"""
+Local benchmark for foundry_relay batch compression.
+
+Builds batches of realistic BS Select ``subjects`` change events, encodes them
+the way foundry_relay does for each output format, and reports the bytes that
+would go over the wire against the CPU time spent compressing them. No storage
+account or Foundry stack is needed.
+
+Run from the repository root:
+
+    python scripts/benchmarks/foundry_relay_compression_benchmark.py --batch-size 1000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from function_apps.foundry_relay.foundry_relay import foundry_relay  # noqa: E402
+from function_apps.foundry_relay.foundry_relay.compression import Compression  # noqa: E402
+from function_apps.foundry_relay.foundry_relay.serialization import as_bytes  # noqa: E402
+
+FIRST_NAMES = ["Alice", "Bashir", "Chloe", "Dmitri", "Eilidh", "Farah", "Gareth", "Hannah", "Ifeoma", "Jack"]
+OPERATIONS = ["INSERT"] * 6 + ["UPDATE"] * 3 + ["DELETE"]
+
+
+def make_bodies(n_events: int, seed: int) -> list:
+    """Events shaped like the output of the subjects pg_notify trigger."""
+    rng = random.Random(seed)
+    start = datetime(2024, 5, 1, 9, 0, 0)
+    bodies = []
+    for index in range(n_events):
+        created_at = start + timedelta(seconds=index, microseconds=rng.randrange(1_000_000))
+        operation = rng.choice(OPERATIONS)
+        data = None
+        if operation != "DELETE":
+            data = {
+                "id": index + 1,
+                "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES)}son",
+                "age": rng.randint(50, 71),
+                "created_at": created_at.isoformat(),
+                "updated_at": (created_at + timedelta(seconds=rng.randint(0, 600))).isoformat(),
+            }
+        event = {"operation": operation, "timestamp": created_at.isoformat() + "+00:00", "data": data}
+        bodies.append(json.dumps(event).encode("utf-8"))
+    return bodies
+
+
+def measure(bodies: list, file_format, compression, level, repeats: int) -> dict:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        content = as_bytes(foundry_relay.encode_batch(bodies, file_format, compression, level))
+        timings.append(time.perf_counter() - start)
+    raw_bytes = sum(len(body) for body in bodies)
+    encode_seconds = min(timings)
+    return {
+        "format": file_format.value,
+        "compression": compression.value,
+        "level": level,
+        "bytes_on_wire": len(content),
+        "ratio": round(raw_bytes / len(content), 2),
+        "encode_ms": round(encode_seconds * 1000, 3),
+        "encode_mb_per_s": round(raw_bytes / encode_seconds / 1_000_000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000, help="Events per batch file.")
+    parser.add_argument("--repeats", type=int, default=5, help="Best of this many runs is reported.")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    bodies = make_bodies(args.batch_size, args.seed)
+    variants = [
+        (foundry_relay.FileFormat.JSON, Compression.NONE, None),
+        (foundry_relay.FileFormat.JSON, Compression.GZIP, 1),
+        (foundry_relay.FileFormat.JSON, Compression.GZIP, 6),
+        (foundry_relay.FileFormat.JSON, Compression.GZIP, 9),
+        (foundry_relay.FileFormat.NDJSON, Compression.GZIP, 6),
+        (foundry_relay.FileFormat.JSON, Compression.ZSTD, 1),
+        (foundry_relay.FileFormat.JSON, Compression.ZSTD, 3),
+        (foundry_relay.FileFormat.JSON, Compression.ZSTD, 19),
+        (foundry_relay.FileFormat.PARQUET, Compression.NONE, None),
+    ]
+
+    results = []
+    for file_format, compression, level in variants:
+        try:
+            results.append(measure(bodies, file_format, compression, level, args.repeats))
+        except EnvironmentError as missing_dependency:
+            print(f"Skipping {file_format.value}/{compression.value}: {missing_dependency}", file=sys.stderr)
+    print(json.dumps({"batch_size": args.batch_size, "raw_bytes": sum(map(len, bodies)), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Microbenchmark for the JSON codec shared by service_layer and foundry_relay.
+
+Times the JSON work each function does per ``subjects`` change event, with the
+codec backed by orjson (when installed) and by the stdlib fallback. The
+"before" rows repeat what the functions did before the codec: service_layer
+decoding and re-encoding every payload, foundry_relay validating with the
+stdlib decoder. No Service Bus, storage account or Foundry stack is needed.
+
+Run from the repository root:
+
+    python scripts/benchmarks/json_codec_benchmark.py --events 10000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from foundry_relay_compression_benchmark import make_bodies  # noqa: E402
+from function_apps.foundry_relay.foundry_relay import codec as relay_codec  # noqa: E402
+from function_apps.service_layer.service_layer import codec as service_layer_codec  # noqa: E402
+
+_stdlib_validator = json.JSONDecoder(object_pairs_hook=lambda pairs: None)
+
+
+def service_layer_before(body: bytes) -> bytes:
+    return json.dumps(json.loads(body.decode("utf-8"))).encode("utf-8")
+
+
+def service_layer_after(body: bytes) -> bytes:
+    service_layer_codec.is_object(body)
+    return body
+
+
+def relay_validate_before(body: bytes) -> None:
+    _stdlib_validator.decode(body.decode("utf-8"))
+
+
+def relay_reencode_before(body: bytes) -> bytes:
+    return json.dumps(json.loads(body), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def relay_reencode_after(body: bytes) -> bytes:
+    return relay_codec.dumps(relay_codec.loads(body))
+
+
+def measure(case: str, backend: str, function, bodies: list, repeats: int) -> dict:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for body in bodies:
+            function(body)
+        timings.append(time.perf_counter() - start)
+    seconds = min(timings)
+    raw_bytes = sum(len(body) for body in bodies)
+    return {
+        "case": case,
+        "backend": backend,
+        "us_per_event": round(seconds / len(bodies) * 1_000_000, 3),
+        "mb_per_s": round(raw_bytes / seconds / 1_000_000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=10000, help="Events per run.")
+    parser.add_argument("--repeats", type=int, default=5, help="Best of this many runs is reported.")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    bodies = make_bodies(args.events, args.seed)
+    # Pretty-printed bodies are the ones foundry_relay re-encodes for NDJSON output
+    indented = [json.dumps(json.loads(body), indent=2).encode("utf-8") for body in bodies]
+
+    results = [
+        measure("service_layer_payload", "json (before)", service_layer_before, bodies, args.repeats),
+        measure("foundry_relay_validate", "json (before)", relay_validate_before, bodies, args.repeats),
+        measure("foundry_relay_ndjson_reencode", "json (before)", relay_reencode_before, indented, args.repeats),
+    ]
+    orjson = relay_codec.orjson
+    backends = ([orjson] if orjson is not None else []) + [None]
+    if orjson is None:
+        print("orjson is not installed, only the stdlib fallback is measured.", file=sys.stderr)
+    for module in backends:
+        relay_codec.orjson = service_layer_codec.orjson = module
+        backend = relay_codec.backend()
+        results.append(measure("service_layer_payload", backend, service_layer_after, bodies, args.repeats))
+        results.append(measure("foundry_relay_validate", backend, relay_codec.validate, bodies, args.repeats))
+        results.append(measure("foundry_relay_ndjson_reencode", backend, relay_reencode_after, indented, args.repeats))
+    relay_codec.orjson = service_layer_codec.orjson = orjson
+
+    results.sort(key=lambda result: result["case"])
+    print(json.dumps({"events": args.events, "raw_bytes": sum(map(len, bodies)), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+End-to-end throughput and latency benchmark for the docker-compose pipeline.
+
+Generates ``subjects`` change events at a fixed rate and payload size, entering
+the pipeline at one of three stages:
+
+    db          INSERT rows into Postgres, picked up by bsselect-event-poster
+    http        POST NDJSON batches to the service layer
+    servicebus  send messages straight to the Service Bus topic
+
+Every event carries a run-specific marker in ``data.name``. The events are
+then timed at each later stage:
+
+- on the topic, through the unfiltered ``subscription.benchmark`` subscription,
+  which leaves foundry-relay's own subscription alone;
+- in Azurite, by when the blob foundry-relay wrote them to is first listed,
+  polling every ``BLOB_POLL_SECONDS``. Blob creation times only have
+  one-second resolution, so they are not used.
+
+The benchmark reports sustained events/sec, p50/p95/p99 end-to-end latency and
+the lag between stages as JSON, optionally written to ``--output`` for
+comparison across commits. Foundry-relay must write to blob storage
+(``TARGET_DATA_WAREHOUSE`` including ``blob``), in json, ndjson or parquet,
+optionally compressed.
+
+Start the stack first (``make local-environment action=start``), then run from
+the repository root:
+
+    python scripts/benchmarks/pipeline_benchmark.py --entry db --rate 200 --duration 30 --payload-bytes 512
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+import psycopg2
+import requests
+from azure.servicebus import ServiceBusClient, ServiceBusMessage
+from azure.storage.blob import BlobServiceClient
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", "..", ".env"))
+
+SERVICE_LAYER_URL = "http://localhost:7072/api/service_layer"
+TAP_SUBSCRIPTION = "subscription.benchmark"
+BLOB_POLL_SECONDS = 0.2
+
+
+def localhost(connection_str: str, host: str) -> str:
+    """Connection strings in .env use container names; the benchmark runs on the host."""
+    return connection_str.replace(host, "localhost")
+
+
+def percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    if len(values) == 1:
+        cuts = values * 99
+    else:
+        cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": round(cuts[49], 1),
+        "p95": round(cuts[94], 1),
+        "p99": round(cuts[98], 1),
+        "max": round(max(values), 1),
+    }
+
+
+class Run:
+    """Events sent in one benchmark run and the times each stage saw them, in epoch seconds."""
+
+    def __init__(self, payload_bytes: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.prefix = f"bench-{self.id}-"
+        self.payload_bytes = payload_bytes
+        self.sent: Dict[int, float] = {}
+        self.on_topic: Dict[int, float] = {}
+        self.in_blob: Dict[int, float] = {}
+
+    def name(self, seq: int) -> str:
+        marker = f"{self.prefix}{seq}-"
+        return marker + "x" * max(self.payload_bytes - len(marker), 0)
+
+    def event(self, seq: int) -> dict:
+        now = datetime.now(timezone.utc)
+        return {
+            "operation": "INSERT",
+            "timestamp": now.isoformat(),
+            "data": {
+                "id": seq,
+                "name": self.name(seq),
+                "age": 40,
+                "created_at": now.replace(tzinfo=None).isoformat(),
+                "updated_at": now.replace(tzinfo=None).isoformat(),
+            },
+        }
+
+    def seq(self, event: dict) -> Optional[int]:
+        name = (event.get("data") or {}).get("name") or ""
+        if not name.startswith(self.prefix):
+            return None
+        return int(name[len(self.prefix):].split("-", 1)[0])
+
+
+def paced(n_events: int, rate: float, chunk: int):
+    """Yield the start of each chunk of events, sleeping to hold ``rate`` events/sec."""
+    start = time.monotonic()
+    for first in range(0, n_events, chunk):
+        delay = start + first / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        yield first, min(chunk, n_events - first)
+
+
+def generate_db(run: Run, n_events: int, rate: float, chunk: int) -> None:
+    conn = psycopg2.connect(
+        dbname=os.environ["POSTGRES_DB"],
+        user=os.environ["POSTGRES_USER"],
+        password=os.environ["POSTGRES_PASSWORD"],
+        host="localhost",
+        port=os.environ.get("POSTGRES_PORT", "5432"),
+    )
+    conn.autocommit = True
+    with conn, conn.cursor() as cursor:
+        for first, count in paced(n_events, rate, chunk):
+            rows = [(run.name(seq), 40) for seq in range(first, first + count)]
+            sent_at = time.time()
+            cursor.executemany("INSERT INTO subjects (name, age) VALUES (%s, %s)", rows)
+            for seq in range(first, first + count):
+                run.sent[seq] = sent_at
+    conn.close()
+
+
+def generate_http(run: Run, n_events: int, rate: float, chunk: int) -> None:
+    session = requests.Session()
+    for first, count in paced(n_events, rate, chunk):
+        events = [run.event(seq) for seq in range(first, first + count)]
+        sent_at = time.time()
+        response = session.post(
+            SERVICE_LAYER_URL,
+            data="\n".join(json.dumps(event) for event in events).encode("utf-8"),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        response.raise_for_status()
+        for seq in range(first, first + count):
+            run.sent[seq] = sent_at
+
+
+def generate_servicebus(run: Run, n_events: int, rate: float, chunk: int) -> None:
+    client = ServiceBusClient.from_connection_string(
+        localhost(os.environ["SERVICE_BUS_CONNECTION_STR"], "sb-emulator")
+    )
+    with client, client.get_topic_sender(topic_name=os.environ["TOPIC_NAME"]) as sender:
+        for first, count in paced(n_events, rate, chunk):
+            messages = [ServiceBusMessage(json.dumps(run.event(seq))) for seq in range(first, first + count)]
+            sent_at = time.time()
+            sender.send_messages(messages)
+            for seq in range(first, first + count):
+                run.sent[seq] = sent_at
+
+
+GENERATORS = {"db": generate_db, "http": generate_http, "servicebus": generate_servicebus}
+
+
+def watch_topic(run: Run, stop: threading.Event) -> None:
+    client = ServiceBusClient.from_connection_string(
+        localhost(os.environ["SERVICE_BUS_CONNECTION_STR"], "sb-emulator")
+    )
+    receiver = client.get_subscription_receiver(
+        topic_name=os.environ["TOPIC_NAME"], subscription_name=TAP_SUBSCRIPTION, max_wait_time=1
+    )
+    with client, receiver:
+        while not stop.is_set():
+            for message in receiver.receive_messages(max_message_count=200, max_wait_time=1):
+                seq = run.seq(json.loads(b"".join(message.body)))
+                if seq is not None:
+                    run.on_topic.setdefault(seq, message.enqueued_time_utc.timestamp())
+                receiver.complete_message(message)
+
+
+def parse_blob(name: str, content: bytes) -> List[dict]:
+    if name.endswith(".gz"):
+        content, name = gzip.decompress(content), name[:-3]
+    elif name.endswith(".zst"):
+        import zstandard
+
+        content, name = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(content)).read(), name[:-4]
+    if name.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(io.BytesIO(content)).to_pylist()
+    if name.endswith(".ndjson"):
+        return [json.loads(line) for line in content.splitlines() if line]
+    return json.loads(content)
+
+
+def get_container_client():
+    service_client = BlobServiceClient.from_connection_string(
+        localhost(os.environ["AZURITE_CONNECTION_STRING"], "azurite")
+    )
+    return service_client.get_container_client(os.environ.get("AZURITE_CONTAINER_NAME", "inbound"))
+
+
+def watch_blobs(run: Run, existing: Set[str], stop: threading.Event) -> None:
+    """Time each event by when its blob is first listed; blobs in ``existing`` predate the run."""
+    container_client = get_container_client()
+    seen = set(existing)
+    while not stop.is_set():
+        listed_at = time.time()
+        for blob in container_client.list_blobs():
+            if blob.name in seen:
+                continue
+            seen.add(blob.name)
+            content = container_client.get_blob_client(blob.name).download_blob().readall()
+            for event in parse_blob(blob.name, content):
+                seq = run.seq(event)
+                if seq is not None:
+                    run.in_blob.setdefault(seq, listed_at)
+        stop.wait(BLOB_POLL_SECONDS)
+
+
+def lags_ms(start: Dict[int, float], end: Dict[int, float]) -> List[float]:
+    return [(end[seq] - start[seq]) * 1000 for seq in end if seq in start]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entry", choices=sorted(GENERATORS), default="db", help="Stage the events enter at.")
+    parser.add_argument("--rate", type=float, default=100.0, help="Events per second to generate.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate events for.")
+    parser.add_argument("--payload-bytes", type=int, default=256, help="Size of each event's name field.")
+    parser.add_argument("--chunk", type=int, default=1, help="Events per INSERT, HTTP request or send.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for events to arrive.")
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    run = Run(args.payload_bytes)
+    n_events = int(args.rate * args.duration)
+    # Blobs already in the container belong to earlier runs
+    existing = {blob.name for blob in get_container_client().list_blobs()}
+    started_at = datetime.now(timezone.utc)
+    stop = threading.Event()
+    watchers = [
+        threading.Thread(target=watch_topic, args=(run, stop), daemon=True),
+        threading.Thread(target=watch_blobs, args=(run, existing, stop), daemon=True),
+    ]
+    for watcher in watchers:
+        watcher.start()
+
+    generate_start = time.time()
+    GENERATORS[args.entry](run, n_events, args.rate, args.chunk)
+    generate_end = time.time()
+
+    deadline = time.monotonic() + args.timeout
+    while len(run.in_blob) < n_events and time.monotonic() < deadline:
+        time.sleep(1)
+    stop.set()
+    for watcher in watchers:
+        watcher.join()
+
+    arrivals = list(run.in_blob.values())
+    stages = {"service_bus_to_blob_ms": percentiles(lags_ms(run.on_topic, run.in_blob))}
+    if args.entry != "servicebus":
+        stages = {"source_to_service_bus_ms": percentiles(lags_ms(run.sent, run.on_topic)), **stages}
+    results = {
+        "run_id": run.id,
+        "commit": git_commit(),
+        "started_at": started_at.isoformat(),
+        "entry": args.entry,
+        "target_events_per_s": args.rate,
+        "payload_bytes": args.payload_bytes,
+        "chunk": args.chunk,
+        "events_sent": len(run.sent),
+        "events_on_topic": len(run.on_topic),
+        "events_delivered": len(run.in_blob),
+        "send_events_per_s": round(len(run.sent) / (generate_end - generate_start), 1),
+        "sustained_events_per_s": (
+            round(len(arrivals) / (max(arrivals) - generate_start), 1) if arrivals else 0.0
+        ),
+        "end_to_end_ms": percentiles(lags_ms(run.sent, run.in_blob)),
+        "stages": stages,
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if len(run.in_blob) < n_events:
+        sys.exit(f"Only {len(run.in_blob)} of {n_events} events arrived within {args.timeout}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Load-test harness comparing the sync and async service_layer functions.
+
+Drives both HTTP functions in-process with a fake Service Bus sender whose send
+round trip is simulated (time.sleep for the sync SDK, asyncio.sleep for the aio
+SDK), so no broker is needed. Both are run at each concurrency level: the sync
+function from a thread pool of that many threads, the async one from a single
+event loop with that many requests in flight. Each level reports the pair side
+by side, so the comparison is sync against async rather than one concurrency
+against another.
+
+Run from the repository root:
+
+    python scripts/benchmarks/service_layer_load_test.py --requests 2000 --concurrency 1 4 16 64
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+import azure.functions as func  # noqa: E402
+from function_apps.service_layer.service_layer import async_service_layer, service_layer  # noqa: E402
+from function_apps.service_layer.service_layer.async_sender_pool import AsyncSenderPool  # noqa: E402
+from function_apps.service_layer.service_layer.sender_pool import SenderPool  # noqa: E402
+
+SEND_LATENCY = 0.005
+
+
+class FakeSender:
+    def send_messages(self, message):
+        time.sleep(SEND_LATENCY)
+
+    def close(self):
+        pass
+
+
+class FakeServiceBusClient:
+    @classmethod
+    def from_connection_string(cls, conn_str):
+        return cls()
+
+    def get_topic_sender(self, topic_name):
+        return FakeSender()
+
+    def close(self):
+        pass
+
+
+class FakeAsyncSender:
+    async def send_messages(self, message):
+        await asyncio.sleep(SEND_LATENCY)
+
+    async def close(self):
+        pass
+
+
+class FakeAsyncServiceBusClient:
+    @classmethod
+    def from_connection_string(cls, conn_str):
+        return cls()
+
+    def get_topic_sender(self, topic_name):
+        return FakeAsyncSender()
+
+    async def close(self):
+        pass
+
+
+def make_request(i: int) -> func.HttpRequest:
+    body = json.dumps({"operation": "INSERT", "data": {"id": i, "name": "Kate", "age": 40}}).encode("utf-8")
+    return func.HttpRequest(method="POST", url="/api/service_layer", body=body, headers={})
+
+
+def run_sync(n_requests: int, threads: int, pool_size: int) -> float:
+    service_layer.sender_pool = SenderPool(max_size=pool_size)
+    requests = [make_request(i) for i in range(n_requests)]
+    with patch.object(service_layer, "ServiceBusClient", FakeServiceBusClient):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            responses = list(executor.map(service_layer.main, requests))
+        elapsed = time.perf_counter() - start
+    service_layer.sender_pool.close()
+    assert all(response.status_code == 200 for response in responses)
+    return elapsed
+
+
+async def _drive_async(requests, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(request):
+        async with semaphore:
+            return await async_service_layer.main(request)
+
+    return await asyncio.gather(*(one(request) for request in requests))
+
+
+def run_async(n_requests: int, concurrency: int, pool_size: int) -> float:
+    async_service_layer.sender_pool = AsyncSenderPool(max_size=pool_size)
+    requests = [make_request(i) for i in range(n_requests)]
+    with patch.object(async_service_layer, "ServiceBusClient", FakeAsyncServiceBusClient):
+        start = time.perf_counter()
+        responses = asyncio.run(_drive_async(requests, concurrency))
+        elapsed = time.perf_counter() - start
+    assert all(response.status_code == 200 for response in responses)
+    return elapsed
+
+
+def main() -> None:
+    global SEND_LATENCY
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="In-flight request levels to compare at."
+    )
+    parser.add_argument("--pool-size", type=int, default=16, help="Pooled Service Bus connections per worker.")
+    parser.add_argument("--send-ms", type=float, default=5.0, help="Simulated send round trip time.")
+    args = parser.parse_args()
+
+    SEND_LATENCY = args.send_ms / 1000
+    os.environ.update({"TOPIC_NAME": "topic.1", "SERVICE_BUS_CONNECTION_STR": "Endpoint=sb://load-test;"})
+
+    results = []
+    for concurrency in args.concurrency:
+        sync_elapsed = run_sync(args.requests, concurrency, args.pool_size)
+        async_elapsed = run_async(args.requests, concurrency, args.pool_size)
+        results.append(
+            {
+                "concurrency": concurrency,
+                "requests": args.requests,
+                "sync_elapsed_s": round(sync_elapsed, 3),
+                "async_elapsed_s": round(async_elapsed, 3),
+                "sync_requests_per_s": round(args.requests / sync_elapsed, 1),
+                "async_requests_per_s": round(args.requests / async_elapsed, 1),
+            }
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
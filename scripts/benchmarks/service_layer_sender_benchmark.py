@@ -0,0 +1,108 @@
+"""
+Local benchmark for the service_layer send path.
+
+Compares the per-request latency of opening a fresh Service Bus connection for
+every request (the old behaviour) against reusing the pooled, process-lifetime
+sender. The Service Bus SDK is replaced by a fake client whose connection
+handshake and send round trip are simulated with sleeps, so no broker is needed.
+
+Run from the repository root:
+
+    python scripts/benchmarks/service_layer_sender_benchmark.py --requests 200
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+import azure.functions as func  # noqa: E402
+from function_apps.service_layer.service_layer import service_layer  # noqa: E402
+
+
+class FakeSender:
+    def __init__(self, send_latency: float):
+        self._send_latency = send_latency
+
+    def send_messages(self, message):
+        time.sleep(self._send_latency)
+
+    def close(self):
+        pass
+
+
+class FakeServiceBusClient:
+    connect_latency = 0.0
+    send_latency = 0.0
+
+    @classmethod
+    def from_connection_string(cls, conn_str):
+        # Stands in for the AMQP connection and CBS token handshakes.
+        time.sleep(cls.connect_latency)
+        return cls()
+
+    def get_topic_sender(self, topic_name):
+        return FakeSender(self.send_latency)
+
+    def close(self):
+        pass
+
+
+def run(n_requests: int, pooled: bool) -> list:
+    body = json.dumps({"operation": "INSERT", "data": {"id": 1, "name": "Kate", "age": 40}}).encode("utf-8")
+    latencies = []
+    for _ in range(n_requests):
+        if not pooled:
+            service_layer.sender_pool.close()
+        request = func.HttpRequest(method="POST", url="/api/service_layer", body=body, headers={})
+        start = time.perf_counter()
+        response = service_layer.main(request)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_body()
+    service_layer.sender_pool.close()
+    return latencies
+
+
+def summarise(label: str, latencies: list) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "variant": label,
+        "requests": len(ordered),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--connect-ms", type=float, default=40.0, help="Simulated connection + token handshake time.")
+    parser.add_argument("--send-ms", type=float, default=2.0, help="Simulated send round trip time.")
+    args = parser.parse_args()
+
+    FakeServiceBusClient.connect_latency = args.connect_ms / 1000
+    FakeServiceBusClient.send_latency = args.send_ms / 1000
+    os.environ.update(
+        {
+            "USE_MANAGED_IDENTITY": "false",
+            "TOPIC_NAME": "topic.1",
+            "SERVICE_BUS_CONNECTION_STR": "Endpoint=sb://benchmark;SharedAccessKeyName=k;SharedAccessKey=v;",
+        }
+    )
+
+    with patch.object(service_layer, "ServiceBusClient", FakeServiceBusClient):
+        results = [
+            summarise("connection-per-request", run(args.requests, pooled=False)),
+            summarise("pooled", run(args.requests, pooled=True)),
+        ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
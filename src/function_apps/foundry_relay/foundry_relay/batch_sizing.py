@@ -0,0 +1,59 @@
+import threading
+from collections import deque
+from typing import Deque, List, Tuple
+
+
+class AdaptiveBatchSizer:
+    """
+    Picks the payload size of each output file from how fast recent files were written.
+
+    Every successful write is observed as (payload bytes, seconds). The recent
+    write throughput times ``target_seconds`` gives the largest file expected to
+    be written within the latency target. The decision moves at most a factor of
+    two per observation, so a single slow or fast write cannot swing it, and is
+    kept between ``min_bytes`` and ``max_bytes``.
+    """
+
+    def __init__(self, target_bytes: int, target_seconds: float, min_bytes: int, max_bytes: int, window: int = 20):
+        self.target_seconds = target_seconds
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+        self._initial_bytes = self._clamp(target_bytes)
+        self.target_bytes = self._initial_bytes
+        self._lock = threading.Lock()
+        self._samples: Deque[Tuple[int, float]] = deque(maxlen=window)
+
+    def observe(self, size: int, seconds: float) -> None:
+        with self._lock:
+            self._samples.append((size, seconds))
+            total_bytes = sum(sample_size for sample_size, _ in self._samples)
+            total_seconds = sum(sample_seconds for _, sample_seconds in self._samples)
+            if total_seconds <= 0:
+                return
+            ideal = total_bytes / total_seconds * self.target_seconds
+            step = min(max(ideal, self.target_bytes / 2), self.target_bytes * 2)
+            self.target_bytes = self._clamp(step)
+
+    def split(self, bodies: List[bytes]) -> List[List[bytes]]:
+        """Split bodies, in order, into runs of about ``target_bytes``; a larger body gets a run of its own."""
+        target_bytes = self.target_bytes
+        batches: List[List[bytes]] = []
+        batch: List[bytes] = []
+        size = 0
+        for body in bodies:
+            if batch and size + len(body) > target_bytes:
+                batches.append(batch)
+                batch, size = [], 0
+            batch.append(body)
+            size += len(body)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self.target_bytes = self._initial_bytes
+
+    def _clamp(self, size: float) -> int:
+        return round(min(max(size, self.min_bytes), self.max_bytes))
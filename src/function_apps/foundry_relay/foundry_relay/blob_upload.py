@@ -0,0 +1,71 @@
+import base64
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, NamedTuple, Optional, Union
+from azure.storage.blob import BlobClient, ContentSettings
+from .serialization import Content
+
+logger = logging.getLogger(__name__)
+
+
+class BlockFromUrl(NamedTuple):
+    """A block the storage service copies from another blob, without it passing through the relay."""
+
+    source_url: str
+
+
+def iter_blocks(content: Content, block_size: int) -> Iterator[bytes]:
+    """Regroup content into blocks of ``block_size`` bytes; only the last block may be shorter."""
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        content = bytes(content)
+        for offset in range(0, len(content), block_size):
+            yield content[offset:offset + block_size]
+        return
+    block = bytearray()
+    for chunk in content:
+        block += chunk
+        while len(block) >= block_size:
+            yield bytes(block[:block_size])
+            del block[:block_size]
+    if block:
+        yield bytes(block)
+
+
+def block_id(index: int) -> str:
+    # Block IDs must be base64 strings of equal length within a blob.
+    return base64.b64encode(f"{index:08d}".encode("ascii")).decode("ascii")
+
+
+def stage_blocks(
+    blob_client: BlobClient,
+    blocks: Iterable[Union[bytes, BlockFromUrl]],
+    max_concurrency: int,
+    content_settings: Optional[ContentSettings] = None,
+) -> int:
+    """
+    Stage blocks in parallel as they are produced, then commit them as the blob.
+
+    At most ``max_concurrency`` blocks are held in memory or in flight at once,
+    so memory stays bounded however large the batch is. Returns the number of
+    blocks committed.
+    """
+    block_ids = []
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="blob-block") as executor:
+        for index, block in enumerate(blocks):
+            if len(in_flight) >= max_concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            block_ids.append(block_id(index))
+            if isinstance(block, BlockFromUrl):
+                in_flight.add(executor.submit(blob_client.stage_block_from_url, block_ids[-1], block.source_url))
+            else:
+                in_flight.add(executor.submit(blob_client.stage_block, block_ids[-1], block, length=len(block)))
+        for future in wait(in_flight).done:
+            future.result()
+    if content_settings is not None:
+        blob_client.commit_block_list(block_ids, content_settings=content_settings)
+    else:
+        blob_client.commit_block_list(block_ids)
+    return len(block_ids)
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Union
+import azure.functions as func
+from azure.storage.blob import BlobSasPermissions, BlobServiceClient, generate_blob_sas
+from .blob_upload import BlockFromUrl
+
+# Written by service_layer when it stores an oversized body in blob storage.
+CLAIM_CHECK_CONTAINER_PROPERTY = "claim_check_container"
+CLAIM_CHECK_BLOB_PROPERTY = "claim_check_blob"
+CLAIM_CHECK_SIZE_PROPERTY = "claim_check_size"
+
+
+class ClaimCheck(NamedTuple):
+    container: str
+    blob: str
+    size: int
+
+
+def get_claim_check(serviceBusMessage: func.ServiceBusMessage) -> Optional[ClaimCheck]:
+    """The blob holding the message's real body, or None if the body is inline."""
+    application_properties = getattr(serviceBusMessage, "application_properties", None)
+    if not isinstance(application_properties, dict) or CLAIM_CHECK_BLOB_PROPERTY not in application_properties:
+        return None
+    return ClaimCheck(
+        str(application_properties[CLAIM_CHECK_CONTAINER_PROPERTY]),
+        str(application_properties[CLAIM_CHECK_BLOB_PROPERTY]),
+        int(application_properties.get(CLAIM_CHECK_SIZE_PROPERTY, 0)),
+    )
+
+
+def read_claimed_body(blob_service_client: BlobServiceClient, claim_check: ClaimCheck) -> bytes:
+    blob_client = blob_service_client.get_blob_client(container=claim_check.container, blob=claim_check.blob)
+    return blob_client.download_blob().readall()
+
+
+def can_sign(blob_service_client: BlobServiceClient) -> bool:
+    """Server-side copies need a SAS for the source, which takes the account key."""
+    return bool(getattr(blob_service_client.credential, "account_key", None))
+
+
+def claimed_body_url(blob_service_client: BlobServiceClient, claim_check: ClaimCheck, ttl: timedelta) -> str:
+    """A read-only URL for the claimed body, for the storage service to copy it from."""
+    credential = blob_service_client.credential
+    sas = generate_blob_sas(
+        credential.account_name,
+        claim_check.container,
+        claim_check.blob,
+        account_key=credential.account_key,
+        permission=BlobSasPermissions(read=True),
+        expiry=datetime.now(timezone.utc) + ttl,
+    )
+    blob_client = blob_service_client.get_blob_client(container=claim_check.container, blob=claim_check.blob)
+    return f"{blob_client.url}?{sas}"
+
+
+def iter_claimed_blocks(
+    chunks: Iterable[bytes],
+    claims: Dict[bytes, ClaimCheck],
+    source_url: Callable[[ClaimCheck], str],
+    block_size: int,
+) -> Iterator[Union[bytes, BlockFromUrl]]:
+    """
+    Regroup encoded chunks into blocks, turning each claim check reference into a copy of its blob.
+
+    Inline chunks are packed into blocks of up to ``block_size`` bytes; each
+    claimed body becomes a block of its own, copied by the storage service.
+    """
+    block = bytearray()
+    for chunk in chunks:
+        claim_check = claims.get(chunk)
+        if claim_check is None:
+            block += chunk
+            while len(block) >= block_size:
+                yield bytes(block[:block_size])
+                del block[:block_size]
+            continue
+        if block:
+            yield bytes(block)
+            block = bytearray()
+        yield BlockFromUrl(source_url(claim_check))
+    if block:
+        yield bytes(block)
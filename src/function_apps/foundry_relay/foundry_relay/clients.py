@@ -0,0 +1,51 @@
+import logging
+import threading
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ClientRegistry(Generic[T]):
+    """
+    Holds one SDK client for the lifetime of the worker, keyed by the config it was built from.
+
+    Reusing the client keeps its HTTP session and connection pool warm across
+    invocations. When the key changes (e.g. a rotated token) the old client is
+    closed and a new one is built from the new config.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._lock = threading.Lock()
+        self._key: Optional[Hashable] = None
+        self._client: Optional[T] = None
+
+    def get(self, key: Hashable, factory: Callable[[], T]) -> T:
+        with self._lock:
+            if self._client is not None and self._key == key:
+                return self._client
+            if self._client is not None:
+                logger.info(f"{self._name} config changed, rebuilding the cached client.")
+                _close_quietly(self._client)
+            self._client = factory()
+            self._key = key
+            return self._client
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._client is not None:
+                _close_quietly(self._client)
+            self._client = None
+            self._key = None
+
+
+def _close_quietly(client) -> None:
+    close = getattr(client, "close", None)
+    if close is None:
+        return
+    try:
+        close()
+    except Exception as close_err:
+        logger.warning(f"Error while closing cached client: {close_err}")
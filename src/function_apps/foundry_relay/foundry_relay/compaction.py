@@ -0,0 +1,194 @@
+import fcntl
+import glob
+import logging
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+_LENGTH = struct.Struct(">I")
+_SPILL_SUFFIX = ".spill"
+
+
+def _read_records(spill_file: BinaryIO) -> List[bytes]:
+    """Read length-prefixed records, ignoring a trailing record cut short by a crash."""
+    spill_file.seek(0)
+    data = spill_file.read()
+    records = []
+    pos = 0
+    while pos + _LENGTH.size <= len(data):
+        (length,) = _LENGTH.unpack_from(data, pos)
+        start = pos + _LENGTH.size
+        if start + length > len(data):
+            logger.warning(f"Ignoring a truncated record at the end of '{spill_file.name}'.")
+            break
+        records.append(data[start:start + length])
+        pos = start + length
+    return records
+
+
+def _created_at(path: str) -> float:
+    try:
+        return int(os.path.basename(path).split("-", 1)[0]) / 1000
+    except ValueError:
+        return os.path.getmtime(path)
+
+
+class CompactionBuffer:
+    """
+    Accumulates message bodies in a local spill file until they are worth writing out.
+
+    Each invocation appends its bodies to the spill file and fsyncs it before the
+    trigger completes the Service Bus messages, so buffered data survives a worker
+    crash. Every worker owns its own spill file, held with an exclusive lock; spill
+    files left behind by dead workers are unlocked and are adopted on the buffer's
+    first use and by ``adopt_orphans``, which the timer calls. The buffer is ready
+    to flush once it holds ``target_bytes`` or its oldest record is ``max_age``
+    seconds old, and a spill file is only deleted after its records have been
+    written out. No spill file is created until there is something to buffer.
+    """
+
+    def __init__(self, spill_dir: str, target_bytes: int, max_age: float):
+        self.spill_dir = spill_dir
+        self.target_bytes = target_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._file: Optional[BinaryIO] = None
+        self._size = 0
+        self._records = 0
+        self._oldest: Optional[float] = None
+        self._started = False
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def records(self) -> int:
+        return self._records
+
+    def append(self, bodies: Iterable[bytes]) -> None:
+        with self._lock:
+            self._start()
+            self._write(bodies)
+            if self._oldest is None:
+                self._oldest = time.time()
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            self._start()
+            if not self._records:
+                return False
+            return self._size >= self.target_bytes or time.time() - self._oldest >= self.max_age
+
+    def adopt_orphans(self) -> None:
+        """Take over the records of spill files whose worker has died."""
+        with self._lock:
+            self._adopt_orphans()
+
+    @contextmanager
+    def drain(self) -> Iterator[List[bytes]]:
+        """
+        Yield the buffered records and delete them once the caller's block succeeds.
+
+        The spill file is detached first, so concurrent appends go to a fresh file.
+        If the block raises, the records are put back into the buffer.
+        """
+        with self._lock:
+            self._start()
+            spill_file, oldest = self._file, self._oldest
+            records = _read_records(spill_file) if spill_file is not None else []
+            self._file = None
+            self._size = 0
+            self._records = 0
+            self._oldest = None
+        try:
+            yield records
+        except BaseException:
+            if spill_file is not None:
+                self._restore(spill_file, records, oldest)
+            raise
+        if spill_file is not None:
+            os.remove(spill_file.name)
+            spill_file.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is None:
+                return
+            if not self._records:
+                os.remove(self._file.name)
+            # Releasing the lock lets the next worker adopt anything still buffered.
+            self._file.close()
+            self._file = None
+
+    def _start(self) -> None:
+        if not self._started:
+            self._adopt_orphans()
+
+    def _open(self) -> BinaryIO:
+        if self._file is None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"{int(time.time() * 1000)}-{uuid4().hex}{_SPILL_SUFFIX}")
+            spill_file = open(path, "a+b")
+            fcntl.flock(spill_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._file = spill_file
+            self._size = 0
+            self._records = 0
+            self._oldest = None
+        return self._file
+
+    def _write(self, records: Iterable[bytes]) -> None:
+        spill_file = self._open()
+        for record in records:
+            spill_file.write(_LENGTH.pack(len(record)))
+            spill_file.write(record)
+            self._size += len(record)
+            self._records += 1
+        spill_file.flush()
+        os.fsync(spill_file.fileno())
+
+    def _restore(self, spill_file: BinaryIO, records: List[bytes], oldest: Optional[float]) -> None:
+        """Put the records of a failed drain back, reattaching their file if nothing was appended meanwhile."""
+        with self._lock:
+            if self._file is None:
+                self._file = spill_file
+                self._size = sum(len(record) for record in records)
+                self._records = len(records)
+                self._oldest = oldest
+                return
+            self._write(records)
+            if oldest is not None:
+                self._oldest = oldest if self._oldest is None else min(self._oldest, oldest)
+        os.remove(spill_file.name)
+        spill_file.close()
+
+    def _adopt_orphans(self) -> None:
+        self._started = True
+        own_path = self._file.name if self._file is not None else None
+        for path in glob.glob(os.path.join(self.spill_dir, f"*{_SPILL_SUFFIX}")):
+            if path == own_path:
+                continue
+            try:
+                orphan = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            with orphan:
+                try:
+                    fcntl.flock(orphan, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # owned by a live worker
+                if not os.path.exists(path):
+                    continue  # adopted by another worker between listing and locking
+                records = _read_records(orphan)
+                if records:
+                    self._write(records)
+                    created_at = _created_at(path)
+                    self._oldest = created_at if self._oldest is None else min(self._oldest, created_at)
+                    logger.info(f"Adopted {len(records)} buffered records from '{path}'.")
+                os.remove(path)
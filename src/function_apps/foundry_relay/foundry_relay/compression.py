@@ -0,0 +1,48 @@
+import zlib
+from enum import Enum
+from typing import Iterator, Optional
+from .serialization import Content
+
+try:
+    import zstandard
+except ImportError:  # zstandard is only needed when TARGET_FILE_COMPRESSION=zstd
+    zstandard = None
+
+
+class Compression(Enum):
+    NONE = "none"
+    GZIP = "gzip"
+    ZSTD = "zstd"
+
+
+FILE_EXTENSIONS = {Compression.GZIP: "gz", Compression.ZSTD: "zst"}
+DEFAULT_LEVELS = {Compression.GZIP: 6, Compression.ZSTD: 3}
+
+
+def _compressor(compression: Compression, level: Optional[int]):
+    if level is None:
+        level = DEFAULT_LEVELS[compression]
+    if compression == Compression.GZIP:
+        # wbits=31 writes a gzip header and trailer rather than a bare zlib stream.
+        return zlib.compressobj(level, zlib.DEFLATED, 31)
+    if zstandard is None:
+        raise EnvironmentError("TARGET_FILE_COMPRESSION=zstd requires the zstandard package.")
+    return zstandard.ZstdCompressor(level=level).compressobj()
+
+
+def iter_compressed(content: Content, compression: Compression, level: Optional[int] = None) -> Iterator[bytes]:
+    """Compress content chunk by chunk, so the whole compressed file is never held at once."""
+    compressor = _compressor(compression, level)
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        content = [content]
+    for chunk in content:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def compress(content: Content, compression: Compression, level: Optional[int] = None) -> Content:
+    if compression == Compression.NONE:
+        return content
+    return iter_compressed(content, compression, level)
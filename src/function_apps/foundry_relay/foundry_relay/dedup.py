@@ -0,0 +1,109 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DedupIndex:
+    """
+    Bounded index of recently written message keys, used to drop redelivered messages.
+
+    Keys expire ``ttl`` seconds after they were added, and the least recently
+    seen keys are evicted once ``max_size`` is reached. With a ``db_path``, keys
+    are also written to a SQLite file, so the index survives restarts and is
+    shared by workers on the same host. Keys are only added once their batch
+    has been written, so a failed batch is never mistaken for a duplicate.
+    """
+
+    def __init__(self, max_size: int, ttl: float, db_path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._entries)}
+
+    def is_duplicate(self, key: str) -> bool:
+        with self._lock:
+            now = time.time()
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                expires_at = self._lookup(key, now)
+            if expires_at is not None and expires_at > now:
+                self._entries[key] = expires_at
+                self._entries.move_to_end(key)
+                self._evict()
+                self.hits += 1
+                return True
+            self._entries.pop(key, None)
+            self.misses += 1
+            return False
+
+    def add(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            expires_at = time.time() + self.ttl
+            keys = list(keys)
+            for key in keys:
+                self._entries[key] = expires_at
+                self._entries.move_to_end(key)
+            self._evict()
+            db = self._connect()
+            if db is not None:
+                with db:
+                    db.executemany(
+                        "INSERT OR REPLACE INTO seen (key, expires_at) VALUES (?, ?)",
+                        [(key, expires_at) for key in keys],
+                    )
+
+    def prune(self) -> None:
+        """Drop expired keys from the SQLite file."""
+        with self._lock:
+            db = self._connect()
+            if db is not None:
+                with db:
+                    db.execute("DELETE FROM seen WHERE expires_at <= ?", (time.time(),))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def close(self) -> None:
+        self.prune()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _lookup(self, key: str, now: float) -> Optional[float]:
+        db = self._connect()
+        if db is None:
+            return None
+        row = db.execute("SELECT expires_at FROM seen WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+        return row[0] if row else None
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self.db_path is None:
+            return None
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            with self._db:
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+            logger.info(f"Using dedup index at '{self.db_path}'.")
+        return self._db
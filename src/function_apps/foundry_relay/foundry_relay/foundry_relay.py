@@ -1,13 +1,53 @@
+import atexit
 import json
 import logging
 import os
-from datetime import datetime
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from http import HTTPStatus
+from itertools import chain
 from uuid import uuid4
 from enum import Enum
-from typing import List, Union, NoReturn, NamedTuple, Optional
+from typing import Any, Callable, Dict, List, Union, NoReturn, NamedTuple, Optional, Tuple
 import azure.functions as func
-from azure.storage.blob import BlobServiceClient
+from azure.storage.blob import BlobServiceClient, ContentSettings
 from foundry_sdk import FoundryClient, UserTokenAuth
+from .batch_sizing import AdaptiveBatchSizer
+from .blob_upload import iter_blocks, stage_blocks
+from .claim_check import (
+    ClaimCheck,
+    can_sign,
+    claimed_body_url,
+    get_claim_check,
+    iter_claimed_blocks,
+    read_claimed_body,
+)
+from .clients import ClientRegistry
+from .compaction import CompactionBuffer
+from .compression import FILE_EXTENSIONS, Compression, compress
+from .dedup import DedupIndex
+from .idempotency import WrittenFiles, content_hash
+from .metrics import (
+    BYTES_BUCKETS,
+    EXPOSITION_CONTENT_TYPE,
+    RECORDS_BUCKETS,
+    SECONDS_BUCKETS,
+    ContentMeter,
+    MetricsRegistry,
+)
+from .rolling_dataset import RollingDatasetWriter
+from .parquet import PARQUET_COMPRESSION, check_record, get_schema, serialize_parquet
+from .serialization import (
+    Content,
+    as_bytes,
+    iter_json_array_chunks,
+    iter_ndjson_chunks,
+    serialize_ndjson,
+    validate_json_body,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +64,37 @@ class DataWarehouseTarget(Enum):
     BLOB = "blob"
 
 
+class SinkWriteError(Exception):
+    """Raised when a batch could not be written to some of its targets."""
+
+    def __init__(self, failures: Dict[DataWarehouseTarget, Exception]):
+        self.failures = failures
+        targets = ", ".join(target.value for target in failures)
+        super().__init__(f"Failed to write batch to: {targets}")
+
+
+class FoundryWriteMode(Enum):
+    DATASET_PER_BATCH = "dataset_per_batch"
+    ROLLING = "rolling"
+
+
+class FileFormat(Enum):
+    JSON = "json"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+
+
+class FileNaming(Enum):
+    RANDOM = "random"
+    CONTENT_HASH = "content_hash"
+    SEQUENCE = "sequence"
+
+
+class DedupKey(Enum):
+    MESSAGE_ID = "message_id"
+    PAYLOAD_HASH = "payload_hash"
+
+
 class FoundryEnv(NamedTuple):
     url: str
     token: str
@@ -50,6 +121,259 @@ def load_blob_env() -> BlobEnv:
     )
 
 
+# Clients live for the lifetime of the worker process and are shared by invocations.
+foundry_clients: ClientRegistry[FoundryClient] = ClientRegistry("Foundry")
+blob_clients: ClientRegistry[BlobServiceClient] = ClientRegistry("Blob Storage")
+
+
+def get_foundry_client(foundry_url: str, api_token: str) -> FoundryClient:
+    return foundry_clients.get(
+        (foundry_url, api_token),
+        lambda: FoundryClient(auth=UserTokenAuth(api_token), hostname=foundry_url),
+    )
+
+
+def get_blob_service_client(azurite_connection_string: str) -> BlobServiceClient:
+    return blob_clients.get(
+        azurite_connection_string,
+        lambda: BlobServiceClient.from_connection_string(azurite_connection_string),
+    )
+
+
+# Writes to multiple targets run side by side, so a batch takes as long as its slowest target.
+sink_executor = ThreadPoolExecutor(
+    max_workers=int(get_env("FOUNDRY_RELAY_SINK_THREADS", "8")), thread_name_prefix="foundry-relay-sink"
+)
+atexit.register(sink_executor.shutdown)
+
+
+# Files written under a deterministic name, so a redelivered batch can be skipped.
+written_files = WrittenFiles(max_size=int(get_env("FOUNDRY_RELAY_WRITTEN_FILES_CACHE_SIZE", "10000")))
+
+
+# Opt-in: append every batch to one dataset instead of creating a dataset per batch.
+rolling_dataset = RollingDatasetWriter(
+    max_bytes=int(get_env("FOUNDRY_ROLLING_MAX_BYTES", str(128 * 1024 * 1024))),
+    max_age=float(get_env("FOUNDRY_ROLLING_MAX_AGE_SECONDS", "300")),
+    branch_name=get_env("FOUNDRY_BRANCH_NAME", "master"),
+)
+atexit.register(rolling_dataset.commit)
+
+
+SPILL_DIR = get_env("FOUNDRY_RELAY_SPILL_DIR", os.path.join(tempfile.gettempdir(), "foundry_relay_spill"))
+
+# Opt-in: buffer bodies in a local spill file and write them out as fewer, larger files.
+compaction_buffer = CompactionBuffer(
+    spill_dir=SPILL_DIR,
+    target_bytes=int(get_env("FOUNDRY_RELAY_COMPACTION_TARGET_BYTES", str(16 * 1024 * 1024))),
+    max_age=float(get_env("FOUNDRY_RELAY_COMPACTION_MAX_AGE_SECONDS", "300")),
+)
+atexit.register(compaction_buffer.close)
+
+
+def compaction_enabled() -> bool:
+    return get_env("FOUNDRY_RELAY_COMPACTION_ENABLED", "false").lower() == "true"
+
+
+# Opt-in: batches a target failed to take are kept per target and retried to that target alone.
+retry_buffers: Dict[DataWarehouseTarget, CompactionBuffer] = {
+    target: CompactionBuffer(spill_dir=os.path.join(SPILL_DIR, f"retry_{target.value}"), target_bytes=0, max_age=0)
+    for target in DataWarehouseTarget
+}
+for retry_buffer in retry_buffers.values():
+    atexit.register(retry_buffer.close)
+
+
+# Opt-in: drop messages whose key was already written by a recent batch.
+dedup_index = DedupIndex(
+    max_size=int(get_env("FOUNDRY_RELAY_DEDUP_MAX_ENTRIES", "100000")),
+    ttl=float(get_env("FOUNDRY_RELAY_DEDUP_TTL_SECONDS", "3600")),
+    db_path=get_env("FOUNDRY_RELAY_DEDUP_DB_PATH") or None,
+)
+atexit.register(dedup_index.close)
+
+
+# Per-stage histograms, served in the Prometheus text format by the foundry_relay_metrics function.
+relay_metrics = MetricsRegistry()
+decode_seconds = relay_metrics.histogram(
+    "foundry_relay_decode_seconds", "Time to read and validate the messages of a trigger.", SECONDS_BUCKETS
+)
+serialize_seconds = relay_metrics.histogram(
+    "foundry_relay_serialize_seconds", "Time to encode and compress a batch file.", SECONDS_BUCKETS
+)
+upload_seconds = relay_metrics.histogram(
+    "foundry_relay_upload_seconds", "Time to write a batch file to a target, excluding encoding.",
+    SECONDS_BUCKETS, ("target",)
+)
+batch_bytes = relay_metrics.histogram("foundry_relay_batch_bytes", "Size of each batch file.", BYTES_BUCKETS)
+batch_records = relay_metrics.histogram("foundry_relay_batch_records", "Records in each batch file.", RECORDS_BUCKETS)
+enqueue_to_write_seconds = relay_metrics.histogram(
+    "foundry_relay_enqueue_to_write_seconds",
+    "Time from a message being enqueued on the topic to its batch being written.",
+    SECONDS_BUCKETS,
+)
+capture_to_write_seconds = relay_metrics.histogram(
+    "foundry_relay_capture_to_write_seconds",
+    "Time from the event poster capturing a change to its batch being written.",
+    SECONDS_BUCKETS,
+)
+
+
+# Opt-in: size output files from the observed write throughput instead of the trigger batch size.
+batch_sizer = AdaptiveBatchSizer(
+    target_bytes=int(get_env("FOUNDRY_RELAY_TARGET_FILE_BYTES", str(8 * 1024 * 1024))),
+    target_seconds=float(get_env("FOUNDRY_RELAY_TARGET_UPLOAD_SECONDS", "5")),
+    min_bytes=int(get_env("FOUNDRY_RELAY_MIN_FILE_BYTES", str(256 * 1024))),
+    max_bytes=int(get_env("FOUNDRY_RELAY_MAX_FILE_BYTES", str(64 * 1024 * 1024))),
+)
+relay_metrics.gauge(
+    "foundry_relay_adaptive_target_bytes",
+    "Payload bytes the adaptive batch sizer currently aims to put in each file.",
+    lambda: batch_sizer.target_bytes,
+)
+
+
+def adaptive_batching_enabled() -> bool:
+    return get_env("FOUNDRY_RELAY_ADAPTIVE_BATCHING_ENABLED", "false").lower() == "true"
+
+
+def split_batch(batch_bodies: List[bytes]) -> List[List[bytes]]:
+    """Split a batch into files of the adaptive target size, or keep it whole when adaptive batching is off."""
+    if not adaptive_batching_enabled():
+        return [batch_bodies]
+    return batch_sizer.split(batch_bodies)
+
+
+def dedup_enabled() -> bool:
+    return get_env("FOUNDRY_RELAY_DEDUP_ENABLED", "false").lower() == "true"
+
+
+def get_dedup_key() -> DedupKey:
+    dedup_key = get_env("FOUNDRY_RELAY_DEDUP_KEY", DedupKey.MESSAGE_ID.value).lower()
+    try:
+        return DedupKey(dedup_key)
+    except ValueError:
+        raise ValueError(f"Unsupported FOUNDRY_RELAY_DEDUP_KEY value: {dedup_key}")
+
+
+def drop_duplicates(
+    serviceBusMessages: List[func.ServiceBusMessage], batch_bodies: List[bytes]
+) -> Tuple[List[bytes], List[str]]:
+    """Drop bodies already written by a recent batch, or repeated within this one."""
+    dedup_key = get_dedup_key()
+    unique_bodies = []
+    keys = []
+    seen_keys = set()
+    for serviceBusMessage, body in zip(serviceBusMessages, batch_bodies):
+        if dedup_key == DedupKey.MESSAGE_ID and serviceBusMessage.message_id:
+            key = serviceBusMessage.message_id
+        else:
+            key = content_hash([body])
+        if key in seen_keys or dedup_index.is_duplicate(key):
+            continue
+        unique_bodies.append(body)
+        keys.append(key)
+        seen_keys.add(key)
+    dropped = len(batch_bodies) - len(unique_bodies)
+    if dropped:
+        logger.info(f"Dropped {dropped} duplicate payloads. Dedup index: {dedup_index.stats()}")
+    return unique_bodies, keys
+
+
+def sink_retry_enabled() -> bool:
+    return get_env("FOUNDRY_RELAY_SINK_RETRY_ENABLED", "false").lower() == "true"
+
+
+def poison_enabled() -> bool:
+    return get_env("FOUNDRY_RELAY_POISON_ENABLED", "false").lower() == "true"
+
+
+def get_foundry_write_mode() -> FoundryWriteMode:
+    write_mode = get_env("FOUNDRY_WRITE_MODE", FoundryWriteMode.DATASET_PER_BATCH.value).lower()
+    try:
+        return FoundryWriteMode(write_mode)
+    except ValueError:
+        raise ValueError(f"Unsupported FOUNDRY_WRITE_MODE value: {write_mode}")
+
+
+def get_file_format() -> FileFormat:
+    file_format = get_env("TARGET_FILE_FORMAT", FileFormat.JSON.value).lower()
+    try:
+        return FileFormat(file_format)
+    except ValueError:
+        raise ValueError(f"Unsupported TARGET_FILE_FORMAT value: {file_format}")
+
+
+def get_file_naming() -> FileNaming:
+    file_naming = get_env("FOUNDRY_RELAY_FILE_NAMING", FileNaming.RANDOM.value).lower()
+    try:
+        return FileNaming(file_naming)
+    except ValueError:
+        raise ValueError(f"Unsupported FOUNDRY_RELAY_FILE_NAMING value: {file_naming}")
+
+
+def get_compression() -> Compression:
+    compression = get_env("TARGET_FILE_COMPRESSION", Compression.NONE.value).lower()
+    try:
+        return Compression(compression)
+    except ValueError:
+        raise ValueError(f"Unsupported TARGET_FILE_COMPRESSION value: {compression}")
+
+
+def get_compression_level() -> Optional[int]:
+    level = get_env("TARGET_FILE_COMPRESSION_LEVEL")
+    return int(level) if level else None
+
+
+def get_content_encoding(file_format: FileFormat, compression: Compression) -> Optional[str]:
+    # Parquet compresses its column chunks internally, so the file itself is never wrapped.
+    if file_format == FileFormat.PARQUET or compression == Compression.NONE:
+        return None
+    return compression.value
+
+
+def get_file_extension(file_format: FileFormat, compression: Compression) -> str:
+    if get_content_encoding(file_format, compression) is None:
+        return file_format.value
+    return f"{file_format.value}.{FILE_EXTENSIONS[compression]}"
+
+
+def encode_batch(
+    batch_bodies: List[bytes],
+    file_format: FileFormat,
+    compression: Compression = Compression.NONE,
+    compression_level: Optional[int] = None,
+) -> Content:
+    if file_format == FileFormat.PARQUET:
+        return serialize_parquet(
+            batch_bodies,
+            get_env("TARGET_FILE_SCHEMA", "subjects").lower(),
+            PARQUET_COMPRESSION if compression == Compression.NONE else compression.value,
+            compression_level,
+        )
+    # Text formats are produced lazily, so uploads can start before the whole file exists.
+    if file_format == FileFormat.NDJSON:
+        return compress(iter_ndjson_chunks(batch_bodies), compression, compression_level)
+    return compress(iter_json_array_chunks(batch_bodies), compression, compression_level)
+
+
+def get_record_schema() -> Optional[Any]:
+    """The Parquet schema every record is checked against, or None if records are not checked."""
+    if get_file_format() != FileFormat.PARQUET:
+        return None
+    return get_schema(get_env("TARGET_FILE_SCHEMA", "subjects").lower())
+
+
+def resolve_target_dataset(client: FoundryClient, parent_folder_rid: str) -> str:
+    """Use the configured dataset, or create one for this worker to append to."""
+    dataset_rid = get_env("FOUNDRY_TARGET_DATASET_RID")
+    if dataset_rid:
+        return dataset_rid
+    dataset_name = f"relay_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{uuid4().hex[:8]}"
+    dataset = client.datasets.Dataset.create(name=dataset_name, parent_folder_rid=parent_folder_rid)
+    return dataset.rid
+
+
 def get_data_warehouse_target(
     target_data_warehouse: Optional[str] = None,
 ) -> DataWarehouseTarget:
@@ -63,26 +387,43 @@ def get_data_warehouse_target(
         )
 
 
+def get_data_warehouse_targets() -> List[DataWarehouseTarget]:
+    """Parse TARGET_DATA_WAREHOUSE, which may be a comma-separated list such as ``foundry,blob``."""
+    targets = []
+    for target_data_warehouse in get_env("TARGET_DATA_WAREHOUSE", required=True).lower().split(","):
+        target = get_data_warehouse_target(target_data_warehouse.strip())
+        if target not in targets:
+            targets.append(target)
+    return targets
+
+
 def write_to_foundry(
     file_name: str,
-    content: str,
+    content: Content,
     foundry_url: str,
     api_token: str,
     parent_folder_rid: str,
 ) -> None:
     try:
-        client = FoundryClient(
-            auth=UserTokenAuth(api_token),
-            hostname=foundry_url,
-        )
-        dataset_name = file_name.replace(".json", "")
+        client = get_foundry_client(foundry_url, api_token)
+        if get_foundry_write_mode() == FoundryWriteMode.ROLLING:
+            rolling_dataset.upload(
+                client,
+                (foundry_url, api_token, parent_folder_rid, get_env("FOUNDRY_TARGET_DATASET_RID")),
+                file_name,
+                as_bytes(content),
+                lambda: resolve_target_dataset(client, parent_folder_rid),
+            )
+            logger.info(f"File '{file_name}' appended to Foundry dataset '{rolling_dataset.dataset_rid}'.")
+            return
+        dataset_name = file_name.split(".", 1)[0]
         dataset = client.datasets.Dataset.create(
             name=dataset_name, parent_folder_rid=parent_folder_rid
         )
         client.datasets.Dataset.File.upload(
             dataset_rid=dataset.rid,
             file_path=file_name,
-            body=content.encode("utf-8"),
+            body=as_bytes(content),
         )
         logger.info(f"File '{file_name}' written to Foundry.")
     except Exception as foundry_error:
@@ -92,53 +433,170 @@ def write_to_foundry(
 
 def write_to_blob(
     file_name: str,
-    content: str,
+    content: Content,
     azurite_connection_string: str,
     azurite_container_name: str,
+    content_encoding: Optional[str] = None,
 ) -> None:
     try:
-        blob_service_client = BlobServiceClient.from_connection_string(
-            azurite_connection_string
-        )
+        blob_service_client = get_blob_service_client(azurite_connection_string)
         blob_client = blob_service_client.get_blob_client(
             container=azurite_container_name, blob=file_name
         )
-        blob_client.upload_blob(content.encode("utf-8"), overwrite=True)
+        content_settings = ContentSettings(content_encoding=content_encoding) if content_encoding else None
+        blocks = iter_blocks(content, int(get_env("BLOB_UPLOAD_BLOCK_SIZE", str(4 * 1024 * 1024))))
+        first_block = next(blocks, b"")
+        second_block = next(blocks, None)
+        if second_block is not None:
+            # Larger batches are staged block by block in parallel as they are encoded.
+            block_count = stage_blocks(
+                blob_client,
+                chain((first_block, second_block), blocks),
+                int(get_env("BLOB_UPLOAD_MAX_CONCURRENCY", "4")),
+                content_settings,
+            )
+            logger.info(f"File '{file_name}' written to Azurite Blob in {block_count} blocks.")
+            return
+        if content_settings is not None:
+            blob_client.upload_blob(first_block, overwrite=True, content_settings=content_settings)
+        else:
+            blob_client.upload_blob(first_block, overwrite=True)
         logger.info(f"File '{file_name}' written to Azurite Blob.")
     except Exception as blob_error:
         logger.error(f"Failed to write batch to Azurite Blob: {blob_error}")
         raise
 
 
-def generate_file_name() -> str:
+# Lifetime of the read-only SAS handed to the storage service to copy a claimed body.
+CLAIM_CHECK_SAS_TTL = timedelta(hours=1)
+
+
+def claim_check_server_copy_enabled() -> bool:
+    return get_env("FOUNDRY_RELAY_CLAIM_CHECK_SERVER_COPY", "true").lower() == "true"
+
+
+def can_copy_claimed_bodies(targets: List[DataWarehouseTarget]) -> bool:
+    """Claimed bodies can be copied blob to blob only when the file is the bodies spliced together as they are."""
+    if not claim_check_server_copy_enabled() or targets != [DataWarehouseTarget.BLOB]:
+        return False
+    if compaction_enabled() or adaptive_batching_enabled():
+        return False
+    if get_file_format() == FileFormat.PARQUET or get_compression() != Compression.NONE:
+        return False
+    return can_sign(get_blob_service_client(load_blob_env().conn_str))
+
+
+def fetch_claimed_bodies(batch_bodies: List[bytes], claims: Dict[bytes, ClaimCheck]) -> List[bytes]:
+    """Swap claim check references for the bodies they point to, downloading them in parallel."""
+    blob_service_client = get_blob_service_client(get_env("AZURITE_CONNECTION_STRING", required=True))
+    downloads = {
+        index: sink_executor.submit(read_claimed_body, blob_service_client, claims[body])
+        for index, body in enumerate(batch_bodies)
+        if body in claims
+    }
+    return [downloads[index].result() if index in downloads else body for index, body in enumerate(batch_bodies)]
+
+
+def write_claimed_batch(
+    batch_bodies: List[bytes],
+    claims: Dict[bytes, ClaimCheck],
+    sequence_range: Optional[Tuple[int, int]] = None,
+) -> None:
+    """Write a batch to Blob Storage, with the storage service copying the claimed bodies into the file."""
+    target = DataWarehouseTarget.BLOB
+    file_format = get_file_format()
+    file_naming = get_file_naming()
+    file_name = batch_file_name(
+        file_naming, get_file_extension(file_format, Compression.NONE), batch_bodies, sequence_range
+    )
+    if file_naming != FileNaming.RANDOM and already_written(target, file_name):
+        logger.info(f"File '{file_name}' already written to {target.value}, skipping.")
+        return
+
+    blob_env = load_blob_env()
+    blob_service_client = get_blob_service_client(blob_env.conn_str)
+    if file_format == FileFormat.NDJSON:
+        chunks = iter_ndjson_chunks(batch_bodies)
+    else:
+        chunks = iter_json_array_chunks(batch_bodies)
+    blocks = iter_claimed_blocks(
+        chunks,
+        claims,
+        lambda claim_check: claimed_body_url(blob_service_client, claim_check, CLAIM_CHECK_SAS_TTL),
+        int(get_env("BLOB_UPLOAD_BLOCK_SIZE", str(4 * 1024 * 1024))),
+    )
+    start = time.perf_counter()
+    try:
+        block_count = stage_blocks(
+            blob_service_client.get_blob_client(container=blob_env.container, blob=file_name),
+            blocks,
+            int(get_env("BLOB_UPLOAD_MAX_CONCURRENCY", "4")),
+        )
+    except Exception as blob_error:
+        logger.error(f"Failed to write batch to Azurite Blob: {blob_error}")
+        raise
+    upload_seconds.observe(time.perf_counter() - start, target=target.value)
+    batch_records.observe(len(batch_bodies))
+    logger.info(f"File '{file_name}' written to Azurite Blob in {block_count} blocks, copying claimed bodies.")
+    if file_naming != FileNaming.RANDOM:
+        written_files.add((target, file_name))
+
+
+def generate_file_name(extension: str = FileFormat.JSON.value) -> str:
     current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     unique_suffix = uuid4().hex[:8]
-    return f"batch_{current_time}_{unique_suffix}.json"
+    return f"batch_{current_time}_{unique_suffix}.{extension}"
 
 
-def main(serviceBusMessages: List[func.ServiceBusMessage]) -> None:
+def batch_file_name(
+    file_naming: FileNaming,
+    extension: str,
+    batch_bodies: List[bytes],
+    sequence_range: Optional[Tuple[int, int]] = None,
+) -> str:
+    """Name a batch so that writing the same batch again produces the same file."""
+    if file_naming == FileNaming.SEQUENCE and sequence_range is not None:
+        first, last = sequence_range
+        return f"batch_{first:020d}-{last:020d}.{extension}"
+    if file_naming == FileNaming.RANDOM:
+        return generate_file_name(extension)
+    # Buffered batches have no sequence range of their own, so they fall back to the content hash.
+    return f"batch_{content_hash(batch_bodies)[:32]}.{extension}"
 
-    logger.info("Foundry batch upload function triggered by Service Bus.")
-    target = get_data_warehouse_target()
 
-    batch_payloads = []
-    for serviceBusMessage in serviceBusMessages:
-        try:
-            message_body = serviceBusMessage.get_body().decode("utf-8")
-            payload = json.loads(message_body)
-            batch_payloads.append(payload)
-        except Exception as e:
-            logger.error(f"Error parsing message: {e}")
+def blob_exists(file_name: str, azurite_connection_string: str, azurite_container_name: str) -> bool:
+    blob_service_client = get_blob_service_client(azurite_connection_string)
+    return blob_service_client.get_blob_client(container=azurite_container_name, blob=file_name).exists()
 
-    if not batch_payloads:
-        raise ValueError("No valid payloads to process.")
 
-    file_name = generate_file_name()
-    content = json.dumps(batch_payloads, indent=1)
+def already_written(target: DataWarehouseTarget, file_name: str) -> bool:
+    """
+    Check whether a deterministically named file has already been written to a target.
+
+    Files this worker wrote are remembered in memory. Blob Storage is also
+    asked with a HEAD request; Foundry relies on the in-memory record only.
+    """
+    if (target, file_name) in written_files:
+        return True
+    if target == DataWarehouseTarget.BLOB:
+        blob_env = load_blob_env()
+        if blob_exists(file_name, blob_env.conn_str, blob_env.container):
+            written_files.add((target, file_name))
+            return True
+    return False
 
+
+def make_sink_writer(
+    target: DataWarehouseTarget,
+    file_name: str,
+    content: Content,
+    content_encoding: Optional[str],
+) -> Callable[[], None]:
+    """Load the target's settings up front, so a config error fails the batch before anything is written."""
     if target == DataWarehouseTarget.FOUNDRY:
         foundry_env = load_foundry_env()
-        write_to_foundry(
+        return partial(
+            write_to_foundry,
             file_name,
             content,
             foundry_env.url,
@@ -147,11 +605,288 @@ def main(serviceBusMessages: List[func.ServiceBusMessage]) -> None:
         )
     elif target == DataWarehouseTarget.BLOB:
         blob_env = load_blob_env()
-        write_to_blob(
+        return partial(
+            write_to_blob,
             file_name,
             content,
             blob_env.conn_str,
             blob_env.container,
+            content_encoding,
         )
     else:
         raise ValueError(f"Unsupported TARGET_DATA_WAREHOUSE: {target}")
+
+
+def timed_write(target: DataWarehouseTarget, writer: Callable[[], None], meter: Optional[ContentMeter] = None) -> None:
+    """Run a sink writer, timing its upload without the encoding done while content streams into it."""
+    start = time.perf_counter()
+    writer()
+    encoding = meter.seconds if meter is not None else 0.0
+    upload_seconds.observe(time.perf_counter() - start - encoding, target=target.value)
+
+
+def observe_encoded_batch(
+    batch_bodies: List[bytes], content: Content, encode_time: float, meter: Optional[ContentMeter]
+) -> None:
+    serialize_seconds.observe(encode_time + (meter.seconds if meter is not None else 0.0))
+    batch_bytes.observe(meter.size if meter is not None else len(content))
+    batch_records.observe(len(batch_bodies))
+
+
+def observe_write_lag(serviceBusMessages: List[func.ServiceBusMessage]) -> None:
+    """Record how long each message took to reach a written batch, from the topic and from capture."""
+    now = datetime.now(timezone.utc)
+    for serviceBusMessage in serviceBusMessages:
+        enqueued_time = getattr(serviceBusMessage, "enqueued_time_utc", None)
+        if isinstance(enqueued_time, datetime):
+            if enqueued_time.tzinfo is None:
+                enqueued_time = enqueued_time.replace(tzinfo=timezone.utc)
+            enqueue_to_write_seconds.observe((now - enqueued_time).total_seconds())
+        application_properties = getattr(serviceBusMessage, "application_properties", None)
+        if isinstance(application_properties, dict) and "capture_time" in application_properties:
+            try:
+                capture_time = float(application_properties["capture_time"]) / 1000
+            except (TypeError, ValueError):
+                continue
+            capture_to_write_seconds.observe(now.timestamp() - capture_time)
+
+
+def write_batch(
+    targets: List[DataWarehouseTarget],
+    batch_bodies: List[bytes],
+    sequence_range: Optional[Tuple[int, int]] = None,
+) -> None:
+    file_format = get_file_format()
+    compression = get_compression()
+    file_naming = get_file_naming()
+    file_name = batch_file_name(
+        file_naming, get_file_extension(file_format, compression), batch_bodies, sequence_range
+    )
+    if file_naming != FileNaming.RANDOM:
+        pending = [target for target in targets if not already_written(target, file_name)]
+        for target in targets:
+            if target not in pending:
+                logger.info(f"File '{file_name}' already written to {target.value}, skipping.")
+        if not pending:
+            return
+        targets = pending
+
+    start = time.perf_counter()
+    content = encode_batch(batch_bodies, file_format, compression, get_compression_level())
+    encode_time = time.perf_counter() - start
+    meter = None
+    if not isinstance(content, (bytes, bytearray, memoryview)):
+        content = meter = ContentMeter(content)
+    content_encoding = get_content_encoding(file_format, compression)
+
+    if len(targets) == 1:
+        timed_write(targets[0], make_sink_writer(targets[0], file_name, content, content_encoding), meter)
+        observe_encoded_batch(batch_bodies, content, encode_time, meter)
+        batch_sizer.observe(sum(map(len, batch_bodies)), time.perf_counter() - start)
+        if file_naming != FileNaming.RANDOM:
+            written_files.add((targets[0], file_name))
+        return
+
+    # Every target uploads the same serialized buffer, so it is only encoded once.
+    content = as_bytes(content)
+    observe_encoded_batch(batch_bodies, content, encode_time, meter)
+    writers = {target: make_sink_writer(target, file_name, content, content_encoding) for target in targets}
+    futures = {target: sink_executor.submit(timed_write, target, writer) for target, writer in writers.items()}
+    failures = {}
+    for target, future in futures.items():
+        try:
+            future.result()
+        except Exception as sink_error:
+            failures[target] = sink_error
+        else:
+            if file_naming != FileNaming.RANDOM:
+                written_files.add((target, file_name))
+    if failures:
+        raise SinkWriteError(failures)
+    batch_sizer.observe(sum(map(len, batch_bodies)), time.perf_counter() - start)
+
+
+def deliver_batch(
+    targets: List[DataWarehouseTarget],
+    batch_bodies: List[bytes],
+    sequence_range: Optional[Tuple[int, int]] = None,
+) -> None:
+    """
+    Write a batch to every target.
+
+    With sink retry enabled, a batch that only some targets failed to take is
+    spilled for those targets and the call succeeds, so redelivering the messages
+    does not write the batch again to the targets that already have it.
+    """
+    try:
+        write_batch(targets, batch_bodies, sequence_range)
+    except SinkWriteError as sink_error:
+        if not sink_retry_enabled() or len(sink_error.failures) == len(targets):
+            raise
+        for target in sink_error.failures:
+            retry_buffers[target].append(batch_bodies)
+            logger.warning(f"Kept {len(batch_bodies)} payloads to retry against {target.value}.")
+
+
+def retry_failed_writes(targets: List[DataWarehouseTarget]) -> None:
+    for target in targets:
+        retry_buffer = retry_buffers[target]
+        if not retry_buffer.is_ready():
+            continue
+        try:
+            with retry_buffer.drain() as batch_bodies:
+                write_batch([target], batch_bodies)
+                logger.info(f"Retried {len(batch_bodies)} payloads against {target.value}.")
+        except Exception as retry_error:
+            logger.error(f"Retry against {target.value} failed, will try again on the next trigger: {retry_error}")
+
+
+def make_poison_record(serviceBusMessage: func.ServiceBusMessage, error: Exception) -> bytes:
+    record: Dict[str, Any] = {
+        "message_id": getattr(serviceBusMessage, "message_id", None),
+        "correlation_id": getattr(serviceBusMessage, "correlation_id", None),
+        "delivery_count": getattr(serviceBusMessage, "delivery_count", None),
+        "error": str(error),
+        "body": serviceBusMessage.get_body().decode("utf-8", errors="replace"),
+    }
+    return json.dumps(record, default=str).encode("utf-8")
+
+
+def write_poison_records(poison_records: List[bytes]) -> None:
+    """Park messages that can never be processed, so they are not redelivered or lost."""
+    poison_container = get_env("AZURITE_POISON_CONTAINER_NAME", required=True)
+    write_to_blob(
+        generate_file_name(FileFormat.NDJSON.value),
+        serialize_ndjson(poison_records),
+        get_env("AZURITE_CONNECTION_STRING", required=True),
+        poison_container,
+    )
+    logger.warning(f"Wrote {len(poison_records)} poison messages to '{poison_container}'.")
+
+
+def flush_compaction_buffer(targets: List[DataWarehouseTarget]) -> None:
+    """Write out the compaction buffer if it is full or old enough, keeping it on failure."""
+    if adaptive_batching_enabled():
+        compaction_buffer.target_bytes = batch_sizer.target_bytes
+    if not compaction_buffer.is_ready():
+        logger.info(
+            f"Buffered {compaction_buffer.records} payloads ({compaction_buffer.size} bytes) for compaction."
+        )
+        return
+    try:
+        with compaction_buffer.drain() as batch_bodies:
+            for batch in split_batch(batch_bodies):
+                deliver_batch(targets, batch)
+            logger.info(f"Flushed {len(batch_bodies)} buffered payloads.")
+    except Exception as flush_error:
+        # The payloads are safe in the spill file, so the messages can still be completed.
+        logger.error(f"Failed to flush compaction buffer, will retry on the next trigger: {flush_error}")
+
+
+def flush(timer: func.TimerRequest) -> None:
+    """Timer entry point, so buffered payloads still reach their max age when traffic stops."""
+    targets = get_data_warehouse_targets()
+    # Spill files of workers that died since startup are picked up here rather than on every trigger.
+    if sink_retry_enabled():
+        for target in targets:
+            retry_buffers[target].adopt_orphans()
+        retry_failed_writes(targets)
+    if compaction_enabled():
+        compaction_buffer.adopt_orphans()
+        flush_compaction_buffer(targets)
+    if DataWarehouseTarget.FOUNDRY in targets and get_foundry_write_mode() == FoundryWriteMode.ROLLING:
+        try:
+            rolling_dataset.commit_if_expired()
+        except Exception as commit_error:
+            logger.error(f"Failed to commit the rolling Foundry transaction, will retry next time: {commit_error}")
+
+
+def main(serviceBusMessages: List[func.ServiceBusMessage]) -> None:
+
+    logger.info("Foundry batch upload function triggered by Service Bus.")
+    targets = get_data_warehouse_targets()
+    if sink_retry_enabled():
+        retry_failed_writes(targets)
+
+    # Bodies are validated but never re-encoded; the output is spliced together from the raw bytes
+    decode_start = time.perf_counter()
+    batch_bodies = []
+    valid_messages = []
+    poison_records = []
+    # Reference bodies of claim check messages, and the blobs holding their real bodies
+    claims: Dict[bytes, ClaimCheck] = {}
+    record_schema = get_record_schema()
+    for serviceBusMessage in serviceBusMessages:
+        try:
+            body = validate_json_body(serviceBusMessage.get_body())
+            claim_check = get_claim_check(serviceBusMessage)
+            if record_schema is not None:
+                # Parquet files always take the claimed body, so it is fetched now to be checked too.
+                if claim_check is not None:
+                    body = read_claimed_body(
+                        get_blob_service_client(get_env("AZURITE_CONNECTION_STRING", required=True)), claim_check
+                    )
+                    claim_check = None
+                check_record(body, record_schema)
+            if claim_check is not None:
+                claims[body] = claim_check
+            batch_bodies.append(body)
+            valid_messages.append(serviceBusMessage)
+        except Exception as e:
+            logger.error(f"Error parsing message: {e}")
+            poison_records.append(make_poison_record(serviceBusMessage, e))
+    decode_seconds.observe(time.perf_counter() - decode_start)
+
+    if poison_records and poison_enabled():
+        write_poison_records(poison_records)
+        if not batch_bodies:
+            return
+
+    if not batch_bodies:
+        raise ValueError("No valid payloads to process.")
+
+    dedup_keys = []
+    if dedup_enabled():
+        batch_bodies, dedup_keys = drop_duplicates(valid_messages, batch_bodies)
+        if not batch_bodies:
+            return
+
+    if claims and not can_copy_claimed_bodies(targets):
+        batch_bodies = fetch_claimed_bodies(batch_bodies, claims)
+        claims = {}
+
+    if compaction_enabled():
+        # The bodies are fsynced to the spill file before the messages are completed.
+        compaction_buffer.append(batch_bodies)
+        dedup_index.add(dedup_keys)
+        flush_compaction_buffer(targets)
+        return
+
+    batches = split_batch(batch_bodies)
+    if len(batches) > 1:
+        # A split batch has no sequence range per file, so its files are named by content hash.
+        for batch in batches:
+            deliver_batch(targets, batch)
+    else:
+        sequence_range = None
+        if get_file_naming() == FileNaming.SEQUENCE:
+            sequence_numbers = [serviceBusMessage.sequence_number for serviceBusMessage in serviceBusMessages]
+            sequence_range = (min(sequence_numbers), max(sequence_numbers))
+        if claims:
+            write_claimed_batch(batch_bodies, claims, sequence_range)
+        else:
+            deliver_batch(targets, batch_bodies, sequence_range)
+    dedup_index.add(dedup_keys)
+    observe_write_lag(valid_messages)
+
+
+def metrics_enabled() -> bool:
+    return get_env("FOUNDRY_RELAY_METRICS_ENABLED", "false").lower() == "true"
+
+
+def metrics(req: func.HttpRequest) -> func.HttpResponse:
+    """HTTP entry point serving the relay's histograms, for Prometheus to scrape or to read with curl."""
+    # The route is anonymous, so it stays hidden unless it is explicitly turned on.
+    if not metrics_enabled():
+        return func.HttpResponse(status_code=HTTPStatus.NOT_FOUND)
+    return func.HttpResponse(relay_metrics.render(), headers={"Content-Type": EXPOSITION_CONTENT_TYPE})
@@ -0,0 +1,50 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Hashable, Iterable
+
+
+def content_hash(bodies: Iterable[bytes]) -> str:
+    """Hash a batch so the same payloads in the same order always get the same name."""
+    digest = hashlib.sha256()
+    for body in bodies:
+        # Length prefixes stop two different batches concatenating to the same bytes.
+        digest.update(len(body).to_bytes(8, "big"))
+        digest.update(body)
+    return digest.hexdigest()
+
+
+class WrittenFiles:
+    """
+    Bounded record of the files this worker has already written, most recent last.
+
+    Lets a redelivered batch with a deterministic name be skipped without a
+    round trip to the target. The oldest entries are forgotten once ``max_size``
+    is reached.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, None]" = OrderedDict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries[key] = None
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
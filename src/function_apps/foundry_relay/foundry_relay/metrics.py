@@ -0,0 +1,123 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# Prometheus' default buckets, suited to durations in seconds
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = tuple(1024 * 4 ** power for power in range(10))
+RECORDS_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+EXPOSITION_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """A cumulative histogram, one series per combination of label values."""
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float], label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def count(self, **labels: str) -> int:
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            return sum(series[0]) if series else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = {key: (list(counts), total[0]) for key, (counts, total) in self._series.items()}
+        for key, (counts, total) in sorted(series.items()):
+            labels = [f'{name}="{value}"' for name, value in zip(self.label_names, key)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                bucket_labels = ",".join(labels + ['le="' + le + '"'])
+                yield f"{self.name}_bucket{{{bucket_labels}}} {cumulative}"
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            yield f"{self.name}_sum{suffix} {total}"
+            yield f"{self.name}_count{suffix} {cumulative}"
+
+
+class Gauge:
+    """A value read from ``read`` each time the metrics are rendered."""
+
+    def __init__(self, name: str, description: str, read: Callable[[], float]):
+        self.name = name
+        self.description = description
+        self.read = read
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {self.read()}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.histograms: List[Histogram] = []
+        self.gauges: List[Gauge] = []
+
+    def histogram(
+        self, name: str, description: str, buckets: Sequence[float], label_names: Sequence[str] = ()
+    ) -> Histogram:
+        histogram = Histogram(name, description, buckets, label_names)
+        self.histograms.append(histogram)
+        return histogram
+
+    def gauge(self, name: str, description: str, read: Callable[[], float]) -> Gauge:
+        gauge = Gauge(name, description, read)
+        self.gauges.append(gauge)
+        return gauge
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        metrics = [*self.histograms, *self.gauges]
+        return "".join(f"{line}\n" for metric in metrics for line in metric.render())
+
+    def clear(self) -> None:
+        for histogram in self.histograms:
+            histogram.clear()
+
+
+class ContentMeter:
+    """
+    Wraps lazily encoded content to count its bytes and the time spent producing them.
+
+    Text formats are encoded as they are uploaded, so the encoding time has to be
+    measured chunk by chunk to tell it apart from the upload itself.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self.seconds = 0.0
+        self.size = 0
+
+    def __iter__(self) -> "ContentMeter":
+        return self
+
+    def __next__(self) -> bytes:
+        start = time.perf_counter()
+        try:
+            chunk = next(self._chunks)
+        finally:
+            self.seconds += time.perf_counter() - start
+        self.size += len(chunk)
+        return chunk
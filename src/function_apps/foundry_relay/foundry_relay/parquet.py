@@ -0,0 +1,121 @@
+import io
+from typing import Any, List, Optional
+from . import codec
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed when TARGET_FILE_FORMAT=parquet
+    pa = None
+    pq = None
+
+PARQUET_COMPRESSION = "zstd"
+
+
+def subjects_schema() -> "pa.Schema":
+    """Schema of the change events emitted by the BS Select ``subjects`` trigger."""
+    return pa.schema(
+        [
+            ("operation", pa.string()),
+            ("timestamp", pa.timestamp("us", tz="UTC")),
+            (
+                "data",
+                pa.struct(
+                    [
+                        ("id", pa.int64()),
+                        ("name", pa.string()),
+                        ("age", pa.int32()),
+                        ("created_at", pa.timestamp("us")),
+                        ("updated_at", pa.timestamp("us")),
+                    ]
+                ),
+            ),
+        ]
+    )
+
+
+def _as_parsed_type(data_type: "pa.DataType") -> "pa.DataType":
+    # Timestamps arrive as ISO 8601 strings and are cast after the table is built.
+    if pa.types.is_timestamp(data_type):
+        return pa.string()
+    if pa.types.is_struct(data_type):
+        return pa.struct([field.with_type(_as_parsed_type(field.type)) for field in data_type])
+    return data_type
+
+
+def _cast(array: "pa.Array", data_type: "pa.DataType") -> "pa.Array":
+    if pa.types.is_struct(data_type):
+        # flatten() nulls the children of null structs, e.g. ``data`` on a DELETE event.
+        children = [_cast(child, field.type) for child, field in zip(array.flatten(), data_type)]
+        return pa.StructArray.from_arrays(children, fields=list(data_type), mask=array.is_null())
+    return array.cast(data_type)
+
+
+def _unknown_fields(value: Any, data_type: "pa.DataType", path: str = "") -> List[str]:
+    if not isinstance(value, dict) or not pa.types.is_struct(data_type):
+        return []
+    names = {field.name for field in data_type}
+    unknown = [f"{path}{key}" for key in value if key not in names]
+    for field in data_type:
+        unknown += _unknown_fields(value.get(field.name), field.type, f"{path}{field.name}.")
+    return unknown
+
+
+def _table_from_rows(rows: List[Any], schema: Optional["pa.Schema"]) -> "pa.Table":
+    if schema is None:
+        return pa.Table.from_pylist(rows)
+    parsed_schema = pa.schema([field.with_type(_as_parsed_type(field.type)) for field in schema])
+    parsed = pa.Table.from_pylist(rows, schema=parsed_schema)
+    return pa.Table.from_arrays(
+        [_cast(parsed.column(field.name).combine_chunks(), field.type) for field in schema],
+        schema=schema,
+    )
+
+
+def build_table(bodies: List[bytes], schema: Optional["pa.Schema"]) -> "pa.Table":
+    """Build a table from JSON bodies, conforming to ``schema`` or inferring one if it is None."""
+    return _table_from_rows([codec.loads(body) for body in bodies], schema)
+
+
+def check_record(body: bytes, schema: "pa.Schema") -> None:
+    """
+    Raise ValueError unless ``body`` fits ``schema`` exactly.
+
+    Fields missing from the schema would be dropped from the file, and a value
+    of the wrong type would fail the whole batch, so either makes the record
+    unwritable.
+    """
+    row = codec.loads(body)
+    if not isinstance(row, dict):
+        raise ValueError("Parquet records must be JSON objects.")
+    unknown = _unknown_fields(row, pa.struct(list(schema)))
+    if unknown:
+        raise ValueError(f"Fields not in the Parquet schema: {', '.join(unknown)}")
+    try:
+        _table_from_rows([row], schema)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as arrow_error:
+        raise ValueError(f"Record does not match the Parquet schema: {arrow_error}") from arrow_error
+
+
+def get_schema(schema_name: str) -> Optional["pa.Schema"]:
+    """The schema named by TARGET_FILE_SCHEMA, or None if one is inferred per batch."""
+    if pa is None:
+        raise EnvironmentError("TARGET_FILE_FORMAT=parquet requires the pyarrow package.")
+    if schema_name == "subjects":
+        return subjects_schema()
+    if schema_name == "infer":
+        return None
+    raise ValueError(f"Unsupported TARGET_FILE_SCHEMA value: {schema_name}")
+
+
+def serialize_parquet(
+    bodies: List[bytes],
+    schema_name: str = "subjects",
+    compression: str = PARQUET_COMPRESSION,
+    compression_level: Optional[int] = None,
+) -> bytes:
+    sink = io.BytesIO()
+    pq.write_table(
+        build_table(bodies, get_schema(schema_name)), sink, compression=compression, compression_level=compression_level
+    )
+    return sink.getvalue()
@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+from typing import Callable, Hashable, Optional
+from foundry_sdk import BadRequestError, ConflictError, FoundryClient
+
+logger = logging.getLogger(__name__)
+
+
+def _error_name(error: Exception) -> Optional[str]:
+    return getattr(error, "name", None)
+
+
+class RollingDatasetWriter:
+    """
+    Appends batch files to a single Foundry dataset through a long-lived APPEND transaction.
+
+    The target dataset is resolved once and its RID cached, so a batch costs one
+    upload call instead of a dataset create plus an upload. The open transaction
+    is committed, making its files visible downstream, once it holds ``max_bytes``
+    or has been open for ``max_age`` seconds; the next batch opens a new one.
+    ``commit_if_expired`` applies the age limit when no batches arrive.
+    """
+
+    def __init__(self, max_bytes: int, max_age: float, branch_name: str = "master"):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.branch_name = branch_name
+        self._lock = threading.Lock()
+        self._key: Optional[Hashable] = None
+        self._client: Optional[FoundryClient] = None
+        self._dataset_rid: Optional[str] = None
+        self._transaction_rid: Optional[str] = None
+        self._opened_at = 0.0
+        self._bytes_written = 0
+
+    @property
+    def dataset_rid(self) -> Optional[str]:
+        return self._dataset_rid
+
+    def upload(
+        self,
+        client: FoundryClient,
+        key: Hashable,
+        file_name: str,
+        body: bytes,
+        resolve_dataset: Callable[[], str],
+    ) -> None:
+        with self._lock:
+            if key != self._key:
+                if self._transaction_rid is not None:
+                    logger.info("Foundry config changed, committing the open rolling transaction.")
+                    self._commit()
+                self._key = key
+                self._dataset_rid = None
+                self._transaction_rid = None
+            self._client = client
+
+            if self._dataset_rid is None:
+                self._dataset_rid = resolve_dataset()
+                logger.info(f"Appending batches to Foundry dataset '{self._dataset_rid}'.")
+            if self._transaction_rid is not None and self._should_roll():
+                self._commit()
+            if self._transaction_rid is None:
+                self._open()
+
+            try:
+                self._upload(file_name, body)
+            except BadRequestError as upload_err:
+                if _error_name(upload_err) != "TransactionNotOpen":
+                    raise
+                # Another worker committed the shared transaction; carry on in a new one.
+                logger.info("Rolling transaction was closed elsewhere, opening a new one.")
+                self._transaction_rid = None
+                self._open()
+                self._upload(file_name, body)
+
+            if self._should_roll():
+                self._commit()
+
+    def commit(self) -> None:
+        """Commit the open transaction, if any, e.g. when the worker shuts down."""
+        with self._lock:
+            if self._transaction_rid is not None:
+                self._commit()
+
+    def commit_if_expired(self) -> bool:
+        """Commit the open transaction once it is ``max_age`` old, so a quiet feed still becomes visible."""
+        with self._lock:
+            if self._transaction_rid is None or time.monotonic() - self._opened_at < self.max_age:
+                return False
+            self._commit()
+            return True
+
+    def _should_roll(self) -> bool:
+        return self._bytes_written >= self.max_bytes or time.monotonic() - self._opened_at >= self.max_age
+
+    def _upload(self, file_name: str, body: bytes) -> None:
+        self._client.datasets.Dataset.File.upload(
+            dataset_rid=self._dataset_rid,
+            file_path=file_name,
+            body=body,
+            transaction_rid=self._transaction_rid,
+        )
+        self._bytes_written += len(body)
+
+    def _open(self) -> None:
+        transactions = self._client.datasets.Dataset.Transaction
+        try:
+            transaction = transactions.create(
+                self._dataset_rid, transaction_type="APPEND", branch_name=self.branch_name
+            )
+        except ConflictError as create_err:
+            if _error_name(create_err) != "OpenTransactionAlreadyExists":
+                raise
+            # A previous or concurrent worker left a transaction open: append to it.
+            branch = self._client.datasets.Dataset.Branch.get(self._dataset_rid, self.branch_name)
+            transaction = transactions.get(self._dataset_rid, branch.transaction_rid)
+            logger.info(f"Adopting open Foundry transaction '{transaction.rid}'.")
+        self._transaction_rid = transaction.rid
+        self._opened_at = time.monotonic()
+        self._bytes_written = 0
+
+    def _commit(self) -> None:
+        transaction_rid, self._transaction_rid = self._transaction_rid, None
+        try:
+            self._client.datasets.Dataset.Transaction.commit(self._dataset_rid, transaction_rid)
+            logger.info(f"Committed Foundry transaction '{transaction_rid}' ({self._bytes_written} bytes).")
+        except BadRequestError as commit_err:
+            if _error_name(commit_err) != "TransactionNotOpen":
+                raise
+            logger.info(f"Foundry transaction '{transaction_rid}' was already committed elsewhere.")
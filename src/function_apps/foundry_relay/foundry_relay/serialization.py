@@ -0,0 +1,47 @@
+from typing import Iterable, Iterator, List, Union
+from . import codec
+
+Content = Union[bytes, Iterable[bytes]]
+
+
+def validate_json_body(body: bytes) -> bytes:
+    """Check that a message body is UTF-8 encoded JSON and return it unchanged."""
+    codec.validate(body)
+    return body
+
+
+def iter_json_array_chunks(bodies: Iterable[bytes]) -> Iterator[bytes]:
+    """Yield a JSON array built from already-encoded bodies, one chunk at a time."""
+    yield b"["
+    for index, body in enumerate(bodies):
+        if index:
+            yield b",\n"
+        yield body
+    yield b"]"
+
+
+def serialize_json_array(bodies: List[bytes]) -> bytes:
+    return b"".join(iter_json_array_chunks(bodies))
+
+
+def as_ndjson_line(body: bytes) -> bytes:
+    """Return the body on a single line, re-encoding it compactly only if it spans several."""
+    if b"\n" not in body and b"\r" not in body:
+        return body
+    return codec.dumps(codec.loads(body))
+
+
+def iter_ndjson_chunks(bodies: Iterable[bytes]) -> Iterator[bytes]:
+    for body in bodies:
+        yield as_ndjson_line(body)
+        yield b"\n"
+
+
+def serialize_ndjson(bodies: List[bytes]) -> bytes:
+    return b"".join(iter_ndjson_chunks(bodies))
+
+
+def as_bytes(content: Content) -> bytes:
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        return bytes(content)
+    return b"".join(content)
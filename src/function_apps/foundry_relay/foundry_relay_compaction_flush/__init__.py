@@ -0,0 +1 @@
+from ..foundry_relay.foundry_relay import flush as main
@@ -0,0 +1 @@
+from ..foundry_relay.foundry_relay import metrics as main
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Hashable, List, NamedTuple, Optional, TypeVar
+from azure.servicebus.aio import ServiceBusClient, ServiceBusSender
+from .sender_pool import CONNECTION_ERRORS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _PooledSender(NamedTuple):
+    key: Hashable
+    client: ServiceBusClient
+    sender: ServiceBusSender
+
+
+class AsyncSenderPool:
+    """
+    asyncio counterpart of SenderPool for the async send path.
+
+    Async senders are not coroutine-safe, so each in-flight request checks one
+    out exclusively. Up to ``max_size`` connections are multiplexed on the
+    worker's event loop, which is what lets one instance keep many sends in flight.
+    """
+
+    def __init__(self, max_size: int = 1):
+        if max_size < 1:
+            raise ValueError("Sender pool size must be at least 1.")
+        self._max_size = max_size
+        # Created on first use and again whenever the event loop changes, as asyncio
+        # primitives and aio senders belong to the loop they were created on
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._key: Optional[Hashable] = None
+        self._idle: List[_PooledSender] = []
+        self._size = 0
+
+    @asynccontextmanager
+    async def sender(
+        self,
+        key: Hashable,
+        topic_name: str,
+        client_factory: Callable[[], ServiceBusClient],
+    ) -> AsyncIterator[ServiceBusSender]:
+        entry = await self._checkout(key, topic_name, client_factory)
+        healthy = True
+        try:
+            yield entry.sender
+        except CONNECTION_ERRORS:
+            healthy = False
+            raise
+        finally:
+            await self._checkin(entry, healthy)
+
+    async def run(
+        self,
+        key: Hashable,
+        topic_name: str,
+        client_factory: Callable[[], ServiceBusClient],
+        operation: Callable[[ServiceBusSender], Awaitable[T]],
+    ) -> T:
+        """Run an operation on a pooled sender, retrying once on a new connection if it has gone stale."""
+        try:
+            async with self.sender(key, topic_name, client_factory) as sender:
+                return await operation(sender)
+        except CONNECTION_ERRORS as conn_err:
+            logger.warning(f"Service Bus connection lost, retrying on a new connection: {conn_err}")
+            async with self.sender(key, topic_name, client_factory) as sender:
+                return await operation(sender)
+
+    async def close(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            idle, self._idle = self._idle, []
+            self._key = None
+            self._size = 0
+            condition.notify_all()
+        for entry in idle:
+            await _close_quietly(entry)
+
+    async def _checkout(
+        self,
+        key: Hashable,
+        topic_name: str,
+        client_factory: Callable[[], ServiceBusClient],
+    ) -> _PooledSender:
+        stale: List[_PooledSender] = []
+        condition = self._get_condition()
+        async with condition:
+            if key != self._key:
+                if self._key is not None:
+                    logger.info("Service Bus configuration changed, rebuilding pooled senders.")
+                stale, self._idle = self._idle, []
+                self._key = key
+                self._size = 0
+            while not self._idle and self._size >= self._max_size:
+                await condition.wait()
+            entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                self._size += 1
+        for old_entry in stale:
+            await _close_quietly(old_entry)
+        if entry is not None:
+            return entry
+
+        try:
+            logger.info("Opening a new pooled Service Bus connection.")
+            client = client_factory()
+            sender = client.get_topic_sender(topic_name=topic_name)
+            return _PooledSender(key=key, client=client, sender=sender)
+        except Exception:
+            async with condition:
+                if key == self._key:
+                    self._size -= 1
+                condition.notify()
+            raise
+
+    async def _checkin(self, entry: _PooledSender, healthy: bool) -> None:
+        condition = self._get_condition()
+        async with condition:
+            current = entry.key == self._key
+            if current and healthy:
+                self._idle.append(entry)
+                condition.notify()
+                return
+            if current:
+                self._size -= 1
+            condition.notify()
+        await _close_quietly(entry)
+
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            if self._idle:
+                logger.info("Event loop changed, dropping pooled senders opened on the previous loop.")
+            # Senders belong to the loop that opened them, so they can neither be used nor closed from this one
+            self._idle = []
+            self._key = None
+            self._size = 0
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+
+async def _close_quietly(entry: _PooledSender) -> None:
+    try:
+        await entry.sender.close()
+        await entry.client.close()
+    except Exception as close_err:
+        logger.warning(f"Error while closing pooled Service Bus connection: {close_err}")
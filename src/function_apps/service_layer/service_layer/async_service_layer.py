@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+from http import HTTPStatus
+from typing import Iterable, List, Optional
+import azure.functions as func
+from azure.servicebus import ServiceBusMessage
+from azure.servicebus.aio import ServiceBusClient
+from azure.servicebus.exceptions import ServiceBusError
+from . import codec
+from .async_sender_pool import AsyncSenderPool
+from .batching import SendProgress, send_in_batches_async
+from .bulk import (
+    Record,
+    build_topic_messages,
+    bulk_response,
+    is_bulk_request,
+    iter_bulk_records,
+    iter_chunks,
+    merge_send_errors,
+    record_results,
+)
+from .claim_check import make_topic_message_async
+from .service_bus import (
+    BATCH_MAX_BYTES,
+    BATCH_MAX_MESSAGES,
+    BULK_CHUNK_SIZE,
+    ServiceBusEnv,
+    create_client,
+    get_async_credential,
+    load_service_bus_env,
+)
+from .tracing import TraceContext, get_trace_context
+
+logger = logging.getLogger(__name__)
+
+
+def create_service_bus_client(env: ServiceBusEnv) -> ServiceBusClient:
+    return create_client(env, ServiceBusClient, get_async_credential)
+
+
+# Shared by every invocation running on the worker's event loop.
+sender_pool = AsyncSenderPool(max_size=int(os.getenv("SERVICE_BUS_SENDER_POOL_SIZE", "4")))
+
+
+async def send_to_topic(env: ServiceBusEnv, message: ServiceBusMessage) -> None:
+    await sender_pool.run(
+        env, env.topic, lambda: create_service_bus_client(env), lambda sender: sender.send_messages(message)
+    )
+
+
+async def send_batch_to_topic(env: ServiceBusEnv, messages: List[ServiceBusMessage]) -> List[Optional[Exception]]:
+    # Shared by the retry, so a dropped connection only resends the batches that had not gone out.
+    progress = SendProgress(len(messages))
+    return await sender_pool.run(
+        env,
+        env.topic,
+        lambda: create_service_bus_client(env),
+        lambda sender: send_in_batches_async(
+            sender, messages, max_size_in_bytes=BATCH_MAX_BYTES, max_messages=BATCH_MAX_MESSAGES, progress=progress
+        ),
+    )
+
+
+async def ingest_records(env: ServiceBusEnv, records: Iterable[Record], trace: TraceContext) -> List[dict]:
+    """Async counterpart of service_layer.ingest_records."""
+    results = []
+    for chunk in iter_chunks(records, BULK_CHUNK_SIZE):
+        # Claim check uploads block, so the chunk's messages are built on a worker thread
+        messages, errors = await asyncio.to_thread(build_topic_messages, chunk, trace)
+        if messages:
+            errors = merge_send_errors(errors, await send_batch_to_topic(env, messages))
+        results.extend(record_results(chunk, errors))
+    return results
+
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    logger.info("Service Bus file upload function (async) triggered.")
+
+    try:
+        # JSON arrays and NDJSON streams are ingested record by record
+        content_type = req.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        trace = get_trace_context(req)
+        body = req.get_body()
+        if is_bulk_request(content_type, body):
+            env = load_service_bus_env()
+            return bulk_response(await ingest_records(env, iter_bulk_records(content_type, body), trace))
+
+        # Validate the JSON payload; the request body is forwarded as it is, never re-encoded
+        try:
+            is_object = codec.is_object(body)
+        except codec.JSONDecodeError:
+            return func.HttpResponse("Invalid JSON payload.", status_code=HTTPStatus.BAD_REQUEST)
+
+        if not is_object:
+            return func.HttpResponse("Invalid payload format. Expected a JSON object.", status_code=HTTPStatus.BAD_REQUEST)
+
+        env = load_service_bus_env()
+
+        # Send message to topic over a pooled connection without blocking the event loop
+        await send_to_topic(env, await make_topic_message_async(body, trace))
+        return func.HttpResponse("Payload uploaded successfully to Service Bus.", status_code=HTTPStatus.OK)
+
+    except EnvironmentError as env_err:
+        logger.error(f"Configuration error: {env_err}")
+        return func.HttpResponse(str(env_err), status_code=HTTPStatus.BAD_REQUEST)
+    except ServiceBusError as sb_err:
+        logger.error(f"Service Bus error: {sb_err}")
+        return func.HttpResponse(f"Service Bus error: {sb_err}", status_code=HTTPStatus.INTERNAL_SERVER_ERROR)
+    except Exception as e:
+        logger.error(f"Unhandled error: {e}", exc_info=True)
+        return func.HttpResponse("An internal server error occurred.", status_code=HTTPStatus.INTERNAL_SERVER_ERROR)
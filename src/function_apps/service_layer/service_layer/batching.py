@@ -0,0 +1,262 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Deque, Hashable, List, NamedTuple, Optional, Sequence
+from azure.servicebus import ServiceBusMessage, ServiceBusSender
+from azure.servicebus.aio import ServiceBusSender as AsyncServiceBusSender
+from azure.servicebus.exceptions import MessageSizeExceededError, ServiceBusError
+from .sender_pool import CONNECTION_ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+class SendProgress:
+    """
+    How far send_in_batches got through a list of messages.
+
+    Passing the same progress to a retry on a new connection resumes after the
+    last batch that was sent, so batches already sent are not sent again.
+    """
+
+    def __init__(self, count: int):
+        self.results: List[Optional[Exception]] = [None] * count
+        self.next_index = 0
+
+
+def send_in_batches(
+    sender: ServiceBusSender,
+    messages: Sequence[ServiceBusMessage],
+    max_size_in_bytes: Optional[int] = None,
+    max_messages: Optional[int] = None,
+    progress: Optional[SendProgress] = None,
+) -> List[Optional[Exception]]:
+    """
+    Pack messages into as few ServiceBusMessageBatch objects as possible and send them.
+
+    Returns one entry per message: None if it was sent, otherwise the error that
+    stopped it. Connection errors are raised so the caller can drop the connection.
+    """
+    if progress is None:
+        progress = SendProgress(len(messages))
+    results = progress.results
+    batch = sender.create_message_batch(max_size_in_bytes=max_size_in_bytes)
+    indices: List[int] = []
+
+    def flush() -> None:
+        try:
+            sender.send_messages(batch)
+        except CONNECTION_ERRORS:
+            raise
+        except ServiceBusError as sb_err:
+            logger.error(f"Failed to send a batch of {len(indices)} messages: {sb_err}")
+            for index in indices:
+                results[index] = sb_err
+        progress.next_index = indices[-1] + 1
+
+    for index in range(progress.next_index, len(messages)):
+        message = messages[index]
+        if max_messages and len(indices) >= max_messages:
+            flush()
+            batch = sender.create_message_batch(max_size_in_bytes=max_size_in_bytes)
+            indices = []
+        try:
+            batch.add_message(message)
+        except MessageSizeExceededError as size_err:
+            if not indices:
+                results[index] = size_err
+                continue
+            flush()
+            batch = sender.create_message_batch(max_size_in_bytes=max_size_in_bytes)
+            indices = []
+            try:
+                batch.add_message(message)
+            except MessageSizeExceededError as size_err:
+                results[index] = size_err
+                continue
+        indices.append(index)
+
+    if indices:
+        flush()
+    return results
+
+
+async def send_in_batches_async(
+    sender: AsyncServiceBusSender,
+    messages: Sequence[ServiceBusMessage],
+    max_size_in_bytes: Optional[int] = None,
+    max_messages: Optional[int] = None,
+    progress: Optional[SendProgress] = None,
+) -> List[Optional[Exception]]:
+    """Async counterpart of send_in_batches for azure.servicebus.aio senders."""
+    if progress is None:
+        progress = SendProgress(len(messages))
+    results = progress.results
+    batch = await sender.create_message_batch(max_size_in_bytes=max_size_in_bytes)
+    indices: List[int] = []
+
+    async def flush() -> None:
+        try:
+            await sender.send_messages(batch)
+        except CONNECTION_ERRORS:
+            raise
+        except ServiceBusError as sb_err:
+            logger.error(f"Failed to send a batch of {len(indices)} messages: {sb_err}")
+            for index in indices:
+                results[index] = sb_err
+        progress.next_index = indices[-1] + 1
+
+    for index in range(progress.next_index, len(messages)):
+        message = messages[index]
+        if max_messages and len(indices) >= max_messages:
+            await flush()
+            batch = await sender.create_message_batch(max_size_in_bytes=max_size_in_bytes)
+            indices = []
+        try:
+            batch.add_message(message)
+        except MessageSizeExceededError as size_err:
+            if not indices:
+                results[index] = size_err
+                continue
+            await flush()
+            batch = await sender.create_message_batch(max_size_in_bytes=max_size_in_bytes)
+            indices = []
+            try:
+                batch.add_message(message)
+            except MessageSizeExceededError as size_err:
+                results[index] = size_err
+                continue
+        indices.append(index)
+
+    if indices:
+        await flush()
+    return results
+
+
+class MicroBatchTimeout(Exception):
+    """
+    Raised when a micro-batched send is not confirmed in time.
+
+    ``in_flight`` is False if the message was withdrawn before it was sent, and
+    True if it had already gone out in a batch and may still be delivered.
+    """
+
+    def __init__(self, in_flight: bool):
+        self.in_flight = in_flight
+        if in_flight:
+            super().__init__("Timed out waiting for Service Bus to confirm the message; it may still be delivered.")
+        else:
+            super().__init__("Timed out waiting to send the message to Service Bus; it was not sent.")
+
+
+class _PendingSend(NamedTuple):
+    key: Hashable
+    message: ServiceBusMessage
+    size: int
+    future: Future
+    enqueued_at: float
+
+
+class MicroBatcher:
+    """
+    Coalesces messages sent by concurrent invocations into shared batches.
+
+    Callers block on their own future, so every HTTP request still gets its own
+    success or failure. A batch is flushed as soon as it reaches ``max_messages``
+    or ``max_bytes``, or once its oldest message has waited ``linger`` seconds.
+    Messages are only coalesced with others bound for the same ``key``.
+    """
+
+    def __init__(
+        self,
+        send_batch: Callable[[Hashable, List[ServiceBusMessage]], List[Optional[Exception]]],
+        max_messages: int = 100,
+        max_bytes: int = 256 * 1024,
+        linger: float = 0.02,
+    ):
+        self._send_batch = send_batch
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.linger = linger
+        self._pending: Deque[_PendingSend] = deque()
+        self._pending_bytes = 0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def submit(self, key: Hashable, message: ServiceBusMessage, size: int) -> Future:
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Micro-batcher has been closed.")
+            self._pending.append(_PendingSend(key, message, size, future, time.monotonic()))
+            self._pending_bytes += size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="service-bus-micro-batcher", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    def send(self, key: Hashable, message: ServiceBusMessage, size: int, timeout: Optional[float] = None) -> None:
+        future = self.submit(key, message, size)
+        try:
+            future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # A message still queued is withdrawn; one already in a batch cannot be recalled.
+            raise MicroBatchTimeout(in_flight=not future.cancel()) from None
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            thread = self._thread
+            self._condition.notify()
+        if thread is not None:
+            thread.join()
+
+    def _is_full(self) -> bool:
+        return len(self._pending) >= self.max_messages or self._pending_bytes >= self.max_bytes
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                flush_at = self._pending[0].enqueued_at + self.linger
+                while not self._is_full() and not self._closed:
+                    remaining = flush_at - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                items = self._take_batch()
+            if items:
+                self._dispatch(items)
+
+    def _take_batch(self) -> List[_PendingSend]:
+        key = self._pending[0].key
+        items: List[_PendingSend] = []
+        size = 0
+        while self._pending and self._pending[0].key == key and len(items) < self.max_messages:
+            if items and size + self._pending[0].size > self.max_bytes:
+                break
+            item = self._pending.popleft()
+            self._pending_bytes -= item.size
+            if not item.future.set_running_or_notify_cancel():
+                continue
+            size += item.size
+            items.append(item)
+        return items
+
+    def _dispatch(self, items: List[_PendingSend]) -> None:
+        try:
+            results = self._send_batch(items[0].key, [item.message for item in items])
+        except Exception as send_err:
+            results = [send_err] * len(items)
+        for item, error in zip(items, results):
+            if error is None:
+                item.future.set_result(None)
+            else:
+                item.future.set_exception(error)
@@ -0,0 +1,185 @@
+import logging
+from http import HTTPStatus
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import azure.functions as func
+from azure.core.exceptions import AzureError
+from azure.servicebus import ServiceBusMessage
+from . import codec
+from .claim_check import make_topic_message
+from .tracing import TraceContext
+
+logger = logging.getLogger(__name__)
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+_WHITESPACE = " \t\n\r"
+
+
+class Record(NamedTuple):
+    index: int
+    payload: Any
+    error: Optional[str]
+    # The record's JSON exactly as it appeared in the request, forwarded without re-encoding
+    body: Optional[bytes] = None
+
+
+def is_bulk_request(content_type: str, body: bytes) -> bool:
+    """A request is bulk if it is NDJSON or its JSON body is an array."""
+    if content_type == NDJSON_CONTENT_TYPE:
+        return True
+    return body.lstrip()[:1] == b"["
+
+
+def iter_bulk_records(content_type: str, body: bytes) -> Iterator[Record]:
+    if content_type == NDJSON_CONTENT_TYPE:
+        return iter_ndjson_records(body)
+    return iter_json_array_records(body)
+
+
+def iter_chunks(records: Iterable[Record], size: int) -> Iterator[List[Record]]:
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def build_topic_messages(
+    chunk: List[Record], trace: TraceContext
+) -> Tuple[List[ServiceBusMessage], List[Optional[Exception]]]:
+    """
+    Build the topic message of each valid record in ``chunk``. Returns the
+    messages and, per valid record, None or the error that stopped its message,
+    so a claim check that cannot be stored only fails its own record.
+    """
+    messages = []
+    errors: List[Optional[Exception]] = []
+    for record in chunk:
+        if record.error is not None:
+            continue
+        try:
+            messages.append(make_topic_message(record.body, trace, record.index))
+            errors.append(None)
+        except AzureError as store_err:
+            logger.error(f"Failed to store record {record.index} as a claim check: {store_err}")
+            errors.append(store_err)
+    return messages, errors
+
+
+def record_results(chunk: List[Record], errors: List[Optional[Exception]]) -> List[dict]:
+    """
+    Pair each record with its outcome. ``errors`` holds the send result of each
+    valid record in ``chunk``, in order. Records are "rejected" when invalid and
+    "failed" when Service Bus did not accept them, so callers know what to retry.
+    """
+    send_errors = iter(errors)
+    results = []
+    for record in chunk:
+        if record.error is not None:
+            results.append({"index": record.index, "status": "rejected", "error": record.error})
+            continue
+        send_error = next(send_errors)
+        if send_error is not None:
+            results.append({"index": record.index, "status": "failed", "error": str(send_error)})
+        else:
+            results.append({"index": record.index, "status": "accepted"})
+    return results
+
+
+def merge_send_errors(
+    build_errors: List[Optional[Exception]], send_errors: List[Optional[Exception]]
+) -> List[Optional[Exception]]:
+    """
+    Combine the errors from building each valid record's message with the send
+    results of the messages that were built, which are in the same order.
+    """
+    sent = iter(send_errors)
+    return [error if error is not None else next(sent) for error in build_errors]
+
+
+def bulk_response(results: List[dict]) -> func.HttpResponse:
+    counts = {status: 0 for status in ("accepted", "rejected", "failed")}
+    for result in results:
+        counts[result["status"]] += 1
+
+    if counts["accepted"] == len(results):
+        status_code = HTTPStatus.OK
+    elif counts["accepted"]:
+        status_code = HTTPStatus.MULTI_STATUS
+    elif counts["failed"]:
+        status_code = HTTPStatus.INTERNAL_SERVER_ERROR
+    else:
+        status_code = HTTPStatus.BAD_REQUEST
+    body = codec.dumps({**counts, "results": results})
+    return func.HttpResponse(body, status_code=status_code, mimetype="application/json")
+
+
+def validate_record(index: int, payload: Any, body: bytes) -> Record:
+    if not isinstance(payload, dict):
+        return Record(index, None, "Invalid record format. Expected a JSON object.")
+    return Record(index, payload, None, body)
+
+
+def iter_ndjson_records(body: bytes) -> Iterator[Record]:
+    """Yield one record per non-blank line; a bad line only rejects that record."""
+    index = 0
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            payload = codec.loads(line)
+        except codec.JSONDecodeError as decode_err:
+            yield Record(index, None, f"Invalid JSON: {decode_err}")
+        else:
+            yield validate_record(index, payload, line)
+        index += 1
+
+
+def iter_json_array_records(body: bytes) -> Iterator[Record]:
+    """
+    Walk a JSON array element by element without materialising the whole list.
+
+    Elements are decoded one at a time, so a malformed element stops the walk
+    (the array cannot be resynchronised) but earlier elements are still yielded.
+    """
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError as decode_err:
+        yield Record(0, None, f"Invalid JSON: {decode_err}")
+        return
+
+    pos = _skip_whitespace(text, 0)
+    if text[pos:pos + 1] != "[":
+        yield Record(0, None, "Invalid JSON: expected an array.")
+        return
+    pos = _skip_whitespace(text, pos + 1)
+    if text[pos:pos + 1] == "]":
+        return
+
+    index = 0
+    while True:
+        start = pos
+        try:
+            payload, pos = codec.raw_decode(text, pos)
+        except codec.JSONDecodeError as decode_err:
+            yield Record(index, None, f"Invalid JSON: {decode_err}")
+            return
+        yield validate_record(index, payload, text[start:pos].encode("utf-8"))
+        index += 1
+
+        pos = _skip_whitespace(text, pos)
+        separator = text[pos:pos + 1]
+        if separator == "]":
+            return
+        if separator != ",":
+            yield Record(index, None, f"Invalid JSON: expected ',' or ']' at char {pos}.")
+            return
+        pos = _skip_whitespace(text, pos + 1)
+
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos] in _WHITESPACE:
+        pos += 1
+    return pos
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import os
+import time
+from functools import lru_cache
+from typing import NamedTuple, Optional
+from uuid import uuid4
+from azure.servicebus import ServiceBusMessage
+from azure.storage.blob import BlobServiceClient
+from . import codec
+from .tracing import TraceContext, make_message
+
+logger = logging.getLogger(__name__)
+
+# Application properties that mark a message as a claim check; foundry_relay reads the same names.
+CLAIM_CHECK_CONTAINER_PROPERTY = "claim_check_container"
+CLAIM_CHECK_BLOB_PROPERTY = "claim_check_blob"
+CLAIM_CHECK_SIZE_PROPERTY = "claim_check_size"
+
+
+class ClaimCheckEnv(NamedTuple):
+    connection_str: str
+    container: str
+    threshold: int
+
+
+def load_claim_check_env() -> Optional[ClaimCheckEnv]:
+    """Claim check settings, or None when claim checks are turned off."""
+    if os.getenv("SERVICE_BUS_CLAIM_CHECK_ENABLED", "false").lower() != "true":
+        return None
+    connection_str = os.getenv("AZURITE_CONNECTION_STRING")
+    container = os.getenv("AZURITE_CLAIM_CHECK_CONTAINER_NAME")
+    if not connection_str or not container:
+        raise EnvironmentError(
+            "AZURITE_CONNECTION_STRING and AZURITE_CLAIM_CHECK_CONTAINER_NAME are required when using claim checks."
+        )
+    threshold = int(os.getenv("SERVICE_BUS_CLAIM_CHECK_THRESHOLD_BYTES", str(192 * 1024)))
+    return ClaimCheckEnv(connection_str, container, threshold)
+
+
+@lru_cache(maxsize=4)
+def get_blob_service_client(connection_str: str) -> BlobServiceClient:
+    return BlobServiceClient.from_connection_string(connection_str)
+
+
+def store_body(env: ClaimCheckEnv, body: bytes) -> str:
+    """Upload a body under a new, date-prefixed name and return the name."""
+    blob_name = f"{time.strftime('%Y/%m/%d', time.gmtime())}/{uuid4().hex}.json"
+    blob_client = get_blob_service_client(env.connection_str).get_blob_client(container=env.container, blob=blob_name)
+    blob_client.upload_blob(body)
+    logger.info(f"Stored a {len(body)} byte payload as claim check '{blob_name}'.")
+    return blob_name
+
+
+def make_topic_message(body: bytes, trace: TraceContext, index: Optional[int] = None) -> ServiceBusMessage:
+    """
+    Build the topic message for a body, swapping a body over the threshold for a claim check.
+
+    A stored body is put on a single line first, as foundry_relay copies it into
+    NDJSON files without re-encoding it. The topic only carries a small
+    reference to the blob.
+    """
+    env = load_claim_check_env()
+    if env is None or len(body) <= env.threshold:
+        return make_message(body, trace, index)
+    if b"\n" in body or b"\r" in body:
+        body = codec.dumps(codec.loads(body))
+    blob_name = store_body(env, body)
+    reference = {"claim_check": {"container": env.container, "blob": blob_name, "size": len(body)}}
+    message = make_message(codec.dumps(reference), trace, index)
+    message.application_properties[CLAIM_CHECK_CONTAINER_PROPERTY] = env.container
+    message.application_properties[CLAIM_CHECK_BLOB_PROPERTY] = blob_name
+    message.application_properties[CLAIM_CHECK_SIZE_PROPERTY] = len(body)
+    return message
+
+
+async def make_topic_message_async(body: bytes, trace: TraceContext, index: Optional[int] = None) -> ServiceBusMessage:
+    """Async counterpart of make_topic_message; uploads run on a worker thread."""
+    env = load_claim_check_env()
+    if env is None or len(body) <= env.threshold:
+        return make_message(body, trace, index)
+    return await asyncio.to_thread(make_topic_message, body, trace, index)
@@ -0,0 +1,78 @@
+"""
+JSON encoding and decoding, backed by orjson when it is installed.
+
+service_layer and foundry_relay are deployed separately, so each keeps an
+identical copy of this module. The stdlib fallback is set up to behave like
+orjson: input must be UTF-8, NaN and Infinity are rejected, and output is
+compact UTF-8 without ASCII escapes. One difference remains: orjson reads
+integers outside the 64-bit range as floats.
+"""
+
+import json
+from typing import Any, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # the stdlib json module is used instead
+    orjson = None
+
+# orjson raises its own subclass of this error
+JSONDecodeError = json.JSONDecodeError
+
+
+def _reject_constant(name: str) -> Any:
+    raise JSONDecodeError(f"{name} is not valid JSON", name, 0)
+
+
+_decoder = json.JSONDecoder(parse_constant=_reject_constant)
+# Objects are collapsed to None as soon as they are parsed, so validating a
+# document never holds more than one nesting level of its object graph in memory.
+_validator = json.JSONDecoder(object_pairs_hook=lambda pairs: None, parse_constant=_reject_constant)
+_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+
+def backend() -> str:
+    return "orjson" if orjson is not None else "json"
+
+
+def _decode_utf8(data: Union[bytes, bytearray, memoryview, str]) -> str:
+    if isinstance(data, str):
+        return data
+    try:
+        return bytes(data).decode("utf-8")
+    except UnicodeDecodeError as decode_err:
+        raise JSONDecodeError(f"str is not valid UTF-8: {decode_err.reason}", "", decode_err.start) from decode_err
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return _decoder.decode(_decode_utf8(data))
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return _encoder.encode(obj).encode("utf-8")
+
+
+def raw_decode(text: str, pos: int = 0) -> Tuple[Any, int]:
+    """Decode the document starting at ``pos``, returning it and where it ends. Always uses the stdlib parser."""
+    return _decoder.raw_decode(text, pos)
+
+
+def validate(data: Union[bytes, bytearray, memoryview, str]) -> None:
+    """Raise JSONDecodeError unless ``data`` is one JSON document."""
+    if orjson is not None:
+        orjson.loads(data)
+        return
+    _validator.decode(_decode_utf8(data))
+
+
+def is_object(data: Union[bytes, bytearray, memoryview, str]) -> bool:
+    """Validate ``data`` and tell whether it is a JSON object, without keeping the decoded object."""
+    if orjson is not None:
+        return isinstance(orjson.loads(data), dict)
+    text = _decode_utf8(data)
+    _validator.decode(text)
+    return text.lstrip(" \t\n\r")[:1] == "{"
@@ -0,0 +1,160 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Hashable, Iterator, List, NamedTuple, Optional, TypeVar
+from azure.servicebus import ServiceBusClient, ServiceBusSender
+from azure.servicebus.exceptions import (
+    OperationTimeoutError,
+    ServiceBusCommunicationError,
+    ServiceBusConnectionError,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Errors after which a pooled connection can no longer be trusted and must be rebuilt.
+CONNECTION_ERRORS = (
+    ServiceBusConnectionError,
+    ServiceBusCommunicationError,
+    OperationTimeoutError,
+)
+
+
+class _PooledSender(NamedTuple):
+    key: Hashable
+    client: ServiceBusClient
+    sender: ServiceBusSender
+
+
+class SenderPool:
+    """
+    Process-lifetime pool of Service Bus topic senders.
+
+    Opening an AMQP connection (and, with managed identity, fetching a token) costs
+    far more than a single send, so clients and senders are built once per worker
+    and reused across invocations. Senders are not thread-safe, so each caller
+    checks one out exclusively; at most ``max_size`` connections are opened.
+
+    The pool is keyed by the Service Bus configuration. When the key changes every
+    pooled connection is dropped and rebuilt lazily with the new configuration.
+    """
+
+    def __init__(self, max_size: int = 1):
+        if max_size < 1:
+            raise ValueError("Sender pool size must be at least 1.")
+        self._max_size = max_size
+        self._condition = threading.Condition()
+        self._key: Optional[Hashable] = None
+        self._idle: List[_PooledSender] = []
+        self._size = 0
+
+    @contextmanager
+    def sender(
+        self,
+        key: Hashable,
+        topic_name: str,
+        client_factory: Callable[[], ServiceBusClient],
+    ) -> Iterator[ServiceBusSender]:
+        entry = self._checkout(key, topic_name, client_factory)
+        healthy = True
+        try:
+            yield entry.sender
+        except CONNECTION_ERRORS:
+            healthy = False
+            raise
+        finally:
+            self._checkin(entry, healthy)
+
+    def run(
+        self,
+        key: Hashable,
+        topic_name: str,
+        client_factory: Callable[[], ServiceBusClient],
+        operation: Callable[[ServiceBusSender], T],
+    ) -> T:
+        """Run an operation on a pooled sender, retrying once on a new connection if it has gone stale."""
+        try:
+            with self.sender(key, topic_name, client_factory) as sender:
+                return operation(sender)
+        except CONNECTION_ERRORS as conn_err:
+            logger.warning(f"Service Bus connection lost, retrying on a new connection: {conn_err}")
+            with self.sender(key, topic_name, client_factory) as sender:
+                return operation(sender)
+
+    def send(
+        self,
+        key: Hashable,
+        topic_name: str,
+        client_factory: Callable[[], ServiceBusClient],
+        message: Any,
+    ) -> None:
+        self.run(key, topic_name, client_factory, lambda sender: sender.send_messages(message))
+
+    def close(self) -> None:
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._key = None
+            self._size = 0
+            self._condition.notify_all()
+        for entry in idle:
+            _close_quietly(entry)
+
+    def _checkout(
+        self,
+        key: Hashable,
+        topic_name: str,
+        client_factory: Callable[[], ServiceBusClient],
+    ) -> _PooledSender:
+        stale: List[_PooledSender] = []
+        with self._condition:
+            if key != self._key:
+                if self._key is not None:
+                    logger.info("Service Bus configuration changed, rebuilding pooled senders.")
+                stale, self._idle = self._idle, []
+                self._key = key
+                self._size = 0
+            while not self._idle and self._size >= self._max_size:
+                self._condition.wait()
+            entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                self._size += 1
+        for old_entry in stale:
+            _close_quietly(old_entry)
+        if entry is not None:
+            return entry
+
+        try:
+            logger.info("Opening a new pooled Service Bus connection.")
+            client = client_factory()
+            sender = client.get_topic_sender(topic_name=topic_name)
+            return _PooledSender(key=key, client=client, sender=sender)
+        except Exception:
+            self._release_slot(key)
+            raise
+
+    def _checkin(self, entry: _PooledSender, healthy: bool) -> None:
+        with self._condition:
+            current = entry.key == self._key
+            if current and healthy:
+                self._idle.append(entry)
+                self._condition.notify()
+                return
+            if current:
+                self._size -= 1
+            self._condition.notify()
+        _close_quietly(entry)
+
+    def _release_slot(self, key: Hashable) -> None:
+        with self._condition:
+            if key == self._key:
+                self._size -= 1
+            self._condition.notify()
+
+
+def _close_quietly(entry: _PooledSender) -> None:
+    try:
+        entry.sender.close()
+        entry.client.close()
+    except Exception as close_err:
+        logger.warning(f"Error while closing pooled Service Bus connection: {close_err}")
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Callable, NamedTuple, Optional, Type, TypeVar
+from weakref import WeakKeyDictionary
+from azure.identity import DefaultAzureCredential
+from azure.identity.aio import DefaultAzureCredential as AsyncDefaultAzureCredential
+
+logger = logging.getLogger(__name__)
+
+C = TypeVar("C")
+
+BULK_CHUNK_SIZE = int(os.getenv("SERVICE_BUS_BULK_CHUNK_SIZE", "500"))
+
+# Caps on every Service Bus batch, whether sent by the sync or the async function.
+BATCH_MAX_MESSAGES = int(os.getenv("SERVICE_BUS_MICRO_BATCH_MAX_MESSAGES", "100"))
+BATCH_MAX_BYTES = int(os.getenv("SERVICE_BUS_MICRO_BATCH_MAX_BYTES", str(256 * 1024)))
+
+
+class ServiceBusEnv(NamedTuple):
+    use_managed_identity: bool
+    namespace: Optional[str]
+    connection_str: Optional[str]
+    topic: str
+
+
+def load_service_bus_env() -> ServiceBusEnv:
+    use_managed_identity = os.getenv("USE_MANAGED_IDENTITY", "false").lower() == "true"
+    topic_name = os.getenv("TOPIC_NAME")
+
+    if not topic_name:
+        raise EnvironmentError("Service Bus topic name is missing.")
+
+    if use_managed_identity:
+        fully_qualified_namespace = os.getenv("SERVICE_BUS_NAMESPACE")
+        if not fully_qualified_namespace:
+            raise EnvironmentError("SERVICE_BUS_NAMESPACE is required when using managed identity.")
+        return ServiceBusEnv(True, fully_qualified_namespace, None, topic_name)
+
+    connection_str = os.getenv("SERVICE_BUS_CONNECTION_STR")
+    if not connection_str:
+        raise EnvironmentError("SERVICE_BUS_CONNECTION_STR is required when not using managed identity.")
+    return ServiceBusEnv(False, None, connection_str, topic_name)
+
+
+@lru_cache(maxsize=1)
+def get_credential() -> DefaultAzureCredential:
+    return DefaultAzureCredential()
+
+
+# aio credentials hold a transport bound to the event loop they were first used on
+_async_credentials: "WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncDefaultAzureCredential]" = WeakKeyDictionary()
+
+
+def get_async_credential() -> AsyncDefaultAzureCredential:
+    """The async credential for the running event loop."""
+    loop = asyncio.get_running_loop()
+    credential = _async_credentials.get(loop)
+    if credential is None:
+        credential = _async_credentials[loop] = AsyncDefaultAzureCredential()
+    return credential
+
+
+def create_client(env: ServiceBusEnv, client_cls: Type[C], credential_factory: Callable[[], Any]) -> C:
+    """Build a sync or async ServiceBusClient, depending on ``client_cls``, for the configured authentication."""
+    if env.use_managed_identity:
+        logger.info("Using Managed Identity for Service Bus authentication.")
+        return client_cls(fully_qualified_namespace=env.namespace, credential=credential_factory())
+    logger.info("Using connection string for Service Bus authentication.")
+    return client_cls.from_connection_string(env.connection_str)
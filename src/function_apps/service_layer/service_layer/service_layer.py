@@ -1,62 +1,126 @@
-import json
+import atexit
 import logging
 import os
 from http import HTTPStatus
+from typing import Iterable, List, Optional
 import azure.functions as func
-from azure.identity import DefaultAzureCredential
 from azure.servicebus import ServiceBusClient, ServiceBusMessage
 from azure.servicebus.exceptions import ServiceBusError
+from . import codec
+from .batching import MicroBatcher, MicroBatchTimeout, SendProgress, send_in_batches
+from .bulk import (
+    Record,
+    build_topic_messages,
+    bulk_response,
+    is_bulk_request,
+    iter_bulk_records,
+    iter_chunks,
+    merge_send_errors,
+    record_results,
+)
+from .claim_check import make_topic_message
+from .sender_pool import SenderPool
+from .service_bus import (
+    BATCH_MAX_BYTES,
+    BATCH_MAX_MESSAGES,
+    BULK_CHUNK_SIZE,
+    ServiceBusEnv,
+    create_client,
+    get_credential,
+    load_service_bus_env,
+)
+from .tracing import TraceContext, get_trace_context
 
 logger = logging.getLogger(__name__)
 
+
+def create_service_bus_client(env: ServiceBusEnv) -> ServiceBusClient:
+    return create_client(env, ServiceBusClient, get_credential)
+
+
+SEND_TIMEOUT_SECONDS = 60
+
+# Connections live for the lifetime of the worker process and are shared by invocations.
+sender_pool = SenderPool(max_size=int(os.getenv("SERVICE_BUS_SENDER_POOL_SIZE", "4")))
+atexit.register(sender_pool.close)
+
+
+def send_to_topic(env: ServiceBusEnv, message: ServiceBusMessage) -> None:
+    sender_pool.send(env, env.topic, lambda: create_service_bus_client(env), message)
+
+
+def send_batch_to_topic(env: ServiceBusEnv, messages: List[ServiceBusMessage]) -> List[Optional[Exception]]:
+    # Shared by the retry, so a dropped connection only resends the batches that had not gone out.
+    progress = SendProgress(len(messages))
+    return sender_pool.run(
+        env,
+        env.topic,
+        lambda: create_service_bus_client(env),
+        lambda sender: send_in_batches(
+            sender, messages, max_size_in_bytes=BATCH_MAX_BYTES, max_messages=BATCH_MAX_MESSAGES, progress=progress
+        ),
+    )
+
+
+def micro_batching_enabled() -> bool:
+    return os.getenv("SERVICE_BUS_MICRO_BATCH_ENABLED", "false").lower() == "true"
+
+
+# Opt-in: coalesces messages from concurrent invocations into shared Service Bus batches.
+micro_batcher = MicroBatcher(
+    send_batch_to_topic,
+    max_messages=BATCH_MAX_MESSAGES,
+    max_bytes=BATCH_MAX_BYTES,
+    linger=int(os.getenv("SERVICE_BUS_MICRO_BATCH_LINGER_MS", "20")) / 1000,
+)
+atexit.register(micro_batcher.close)
+
+
+def ingest_records(env: ServiceBusEnv, records: Iterable[Record], trace: TraceContext) -> List[dict]:
+    """Fan validated records out to the topic in size-bounded batches, one result per record."""
+    results = []
+    for chunk in iter_chunks(records, BULK_CHUNK_SIZE):
+        messages, errors = build_topic_messages(chunk, trace)
+        if messages:
+            errors = merge_send_errors(errors, send_batch_to_topic(env, messages))
+        results.extend(record_results(chunk, errors))
+    return results
+
+
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logger.info("Service Bus file upload function triggered.")
 
     try:
-        # Parse the incoming JSON payload
+        # JSON arrays and NDJSON streams are ingested record by record
+        content_type = req.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        trace = get_trace_context(req)
+        body = req.get_body()
+        if is_bulk_request(content_type, body):
+            env = load_service_bus_env()
+            return bulk_response(ingest_records(env, iter_bulk_records(content_type, body), trace))
+
+        # Validate the JSON payload; the request body is forwarded as it is, never re-encoded
         try:
-            payload = req.get_json()
-        except json.JSONDecodeError:
+            is_object = codec.is_object(body)
+        except codec.JSONDecodeError:
             return func.HttpResponse("Invalid JSON payload.", status_code=HTTPStatus.BAD_REQUEST)
 
-        if not isinstance(payload, dict):
+        if not is_object:
             return func.HttpResponse("Invalid payload format. Expected a JSON object.", status_code=HTTPStatus.BAD_REQUEST)
 
-        # Determine auth mode
-        use_managed_identity = os.getenv("USE_MANAGED_IDENTITY", "false").lower() == "true"
-        topic_name = os.getenv("TOPIC_NAME")
-
-        if not topic_name:
-            raise EnvironmentError("Service Bus topic name is missing.")
-
-        # Create ServiceBusClient
-        if use_managed_identity:
-            logger.info("Connecting to the Service Bus via Managed Identity.")
+        env = load_service_bus_env()
 
-            fully_qualified_namespace = os.getenv("SERVICE_BUS_NAMESPACE")
-            if not fully_qualified_namespace:
-                raise EnvironmentError("SERVICE_BUS_NAMESPACE is required when using managed identity.")
-            logger.info("Using Managed Identity for Service Bus authentication.")
-            credential = DefaultAzureCredential()
-            client = ServiceBusClient(fully_qualified_namespace=fully_qualified_namespace, credential=credential)
+        # Send message to topic over the pooled connection
+        message = make_topic_message(body, trace)
+        if micro_batching_enabled():
+            micro_batcher.send(env, message, sum(map(len, message.body)), timeout=SEND_TIMEOUT_SECONDS)
         else:
-            # Validate environment variables
-            logger.info("Connecting to the Service Bus via a connection string.")
-            connection_str = os.getenv("SERVICE_BUS_CONNECTION_STR")
-            if not connection_str:
-                raise EnvironmentError("SERVICE_BUS_CONNECTION_STR is required when not using managed identity.")
-            logger.info("Using connection string for Service Bus authentication.")
-            client = ServiceBusClient.from_connection_string(connection_str)
-
-        # Send message to topic
-        with client:
-            sender = client.get_topic_sender(topic_name=topic_name)
-            with sender:
-                json_message = json.dumps(payload)
-                message = ServiceBusMessage(json_message)
-                sender.send_messages(message)
-                return func.HttpResponse("Payload uploaded successfully to Service Bus.", status_code=HTTPStatus.OK)
+            send_to_topic(env, message)
+        return func.HttpResponse("Payload uploaded successfully to Service Bus.", status_code=HTTPStatus.OK)
 
+    except MicroBatchTimeout as timeout_err:
+        logger.error(f"Micro-batched send timed out: {timeout_err}")
+        return func.HttpResponse(str(timeout_err), status_code=HTTPStatus.SERVICE_UNAVAILABLE)
     except EnvironmentError as env_err:
         logger.error(f"Configuration error: {env_err}")
         return func.HttpResponse(str(env_err), status_code=HTTPStatus.BAD_REQUEST)
@@ -0,0 +1,38 @@
+import time
+from typing import NamedTuple, Optional, Union
+from uuid import uuid4
+import azure.functions as func
+from azure.servicebus import ServiceBusMessage
+
+CORRELATION_ID_HEADER = "X-Correlation-Id"
+# Epoch milliseconds at which the change was captured from the database
+CAPTURE_TIME_HEADER = "X-Capture-Time"
+
+
+class TraceContext(NamedTuple):
+    correlation_id: str
+    capture_time: Optional[int]
+
+
+def get_trace_context(req: func.HttpRequest) -> TraceContext:
+    """Read the caller's correlation ID and capture time, starting a new trace if there is none."""
+    correlation_id = req.headers.get(CORRELATION_ID_HEADER) or uuid4().hex
+    try:
+        capture_time = int(req.headers.get(CAPTURE_TIME_HEADER, ""))
+    except ValueError:
+        capture_time = None
+    return TraceContext(correlation_id, capture_time)
+
+
+def make_message(body: Union[str, bytes], trace: TraceContext, index: Optional[int] = None) -> ServiceBusMessage:
+    """
+    Build a topic message that carries the trace as application properties.
+
+    Records of a bulk request share the request's correlation ID, suffixed with
+    their index, so each one can be followed on its own.
+    """
+    correlation_id = trace.correlation_id if index is None else f"{trace.correlation_id}.{index}"
+    application_properties = {"correlation_id": correlation_id, "received_time": int(time.time() * 1000)}
+    if trace.capture_time is not None:
+        application_properties["capture_time"] = trace.capture_time
+    return ServiceBusMessage(body, correlation_id=correlation_id, application_properties=application_properties)
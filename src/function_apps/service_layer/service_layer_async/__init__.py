@@ -0,0 +1 @@
+from ..service_layer.async_service_layer import main
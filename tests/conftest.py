@@ -0,0 +1,29 @@
+"""
+Shared pytest configuration.
+
+Some test modules swap SDK packages in ``sys.modules`` for light-weight stubs at
+import time. Without intervention those stubs leak into every test module that
+is collected afterwards, so the real SDK modules are snapshotted here and put
+back before each collector runs.
+"""
+
+import sys
+
+import azure.functions  # noqa: F401
+import azure.identity  # noqa: F401
+import azure.servicebus  # noqa: F401
+import azure.servicebus.exceptions  # noqa: F401
+import azure.storage.blob  # noqa: F401
+import foundry_sdk  # noqa: F401
+
+_SNAPSHOT_PACKAGES = ("azure", "foundry_sdk")
+
+_real_modules = {
+    name: module
+    for name, module in sys.modules.items()
+    if name.split(".")[0] in _SNAPSHOT_PACKAGES
+}
+
+
+def pytest_collectstart(collector):
+    sys.modules.update(_real_modules)
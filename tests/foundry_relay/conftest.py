@@ -0,0 +1,86 @@
+import json
+from typing import Any
+from unittest.mock import MagicMock, patch
+import pytest
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+
+
+def _make_message(payload: Any, **attributes: Any) -> MagicMock:
+    message = MagicMock()
+    message.get_body.return_value = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+    message.application_properties = {}
+    for name, value in attributes.items():
+        setattr(message, name, value)
+    return message
+
+
+@pytest.fixture
+def make_message():
+    """
+    Factory for Service Bus messages. A bytes payload is the body as it is, anything
+    else is JSON encoded; keyword arguments set attributes such as ``message_id``.
+    """
+    return _make_message
+
+
+@pytest.fixture
+def sample_message(make_message):
+    return make_message({"key1": "value1"})
+
+
+@pytest.fixture
+def blob_service_client(monkeypatch):
+    """Target blob storage through a mocked BlobServiceClient, which is returned."""
+    monkeypatch.setenv("TARGET_DATA_WAREHOUSE", "blob")
+    monkeypatch.setenv("AZURITE_CONNECTION_STRING", "UseDevelopmentStorage=true")
+    monkeypatch.setenv("AZURITE_CONTAINER_NAME", "inbound")
+    with patch(
+        "function_apps.foundry_relay.foundry_relay.foundry_relay.BlobServiceClient"
+    ) as mock_blob_service_client_cls:
+        service_client = mock_blob_service_client_cls.from_connection_string.return_value
+        service_client.get_blob_client.return_value.exists.return_value = False
+        yield service_client
+
+
+@pytest.fixture
+def blob_client(blob_service_client):
+    """The mocked client of every blob the relay writes."""
+    return blob_service_client.get_blob_client.return_value
+
+
+@pytest.fixture(autouse=True)
+def reset_cached_clients():
+    """Cached SDK clients outlive a single invocation, so drop them between tests."""
+    foundry_relay.foundry_clients.clear()
+    foundry_relay.blob_clients.clear()
+    yield
+    foundry_relay.foundry_clients.clear()
+    foundry_relay.blob_clients.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_written_files():
+    foundry_relay.written_files.clear()
+    yield
+    foundry_relay.written_files.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_dedup_index():
+    foundry_relay.dedup_index.clear()
+    yield
+    foundry_relay.dedup_index.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_relay_metrics():
+    foundry_relay.relay_metrics.clear()
+    yield
+    foundry_relay.relay_metrics.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_batch_sizer():
+    foundry_relay.batch_sizer.clear()
+    yield
+    foundry_relay.batch_sizer.clear()
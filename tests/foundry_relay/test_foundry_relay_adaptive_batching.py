@@ -0,0 +1,67 @@
+import json
+import pytest
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+from function_apps.foundry_relay.foundry_relay.batch_sizing import AdaptiveBatchSizer
+from function_apps.foundry_relay.foundry_relay.compaction import CompactionBuffer
+
+
+@pytest.fixture(autouse=True)
+def adaptive_batching(monkeypatch):
+    monkeypatch.setenv("FOUNDRY_RELAY_ADAPTIVE_BATCHING_ENABLED", "true")
+
+
+def uploaded_payloads(blob_client):
+    return [json.loads(call.args[0]) for call in blob_client.upload_blob.call_args_list]
+
+
+def test_target_follows_observed_throughput():
+    sizer = AdaptiveBatchSizer(target_bytes=1000, target_seconds=1, min_bytes=100, max_bytes=10000)
+
+    sizer.observe(1000, 0.1)
+    assert sizer.target_bytes == 2000  # 10000 bytes/s, but the step is capped at twice the last target
+
+    for _ in range(5):
+        sizer.observe(1000, 0.1)
+    assert sizer.target_bytes == 10000
+
+    for _ in range(20):
+        sizer.observe(1000, 10)
+    assert sizer.target_bytes == 100
+
+
+def test_split_keeps_order_and_oversized_bodies():
+    sizer = AdaptiveBatchSizer(target_bytes=10, target_seconds=1, min_bytes=1, max_bytes=100)
+
+    assert sizer.split([b"aaaa", b"bbbb", b"cccc", b"d" * 20, b"ee"]) == [
+        [b"aaaa", b"bbbb"],
+        [b"cccc"],
+        [b"d" * 20],
+        [b"ee"],
+    ]
+
+
+def test_trigger_batch_is_split_into_target_sized_files(blob_client, monkeypatch, make_message):
+    monkeypatch.setattr(foundry_relay.batch_sizer, "target_bytes", 20)
+
+    foundry_relay.main([make_message({"id": index}) for index in range(4)])
+
+    assert uploaded_payloads(blob_client) == [[{"id": 0}, {"id": 1}], [{"id": 2}, {"id": 3}]]
+
+
+def test_compaction_target_follows_the_sizer(blob_client, monkeypatch, tmp_path, make_message):
+    compaction_buffer = CompactionBuffer(str(tmp_path), target_bytes=10 ** 9, max_age=3600)
+    monkeypatch.setattr(foundry_relay, "compaction_buffer", compaction_buffer)
+    monkeypatch.setenv("FOUNDRY_RELAY_COMPACTION_ENABLED", "true")
+    monkeypatch.setattr(foundry_relay.batch_sizer, "target_bytes", 20)
+
+    foundry_relay.main([make_message({"id": 0})])
+    blob_client.upload_blob.assert_not_called()
+    foundry_relay.main([make_message({"id": 1}), make_message({"id": 2})])
+
+    assert compaction_buffer.target_bytes == 20
+    assert uploaded_payloads(blob_client) == [[{"id": 0}, {"id": 1}], [{"id": 2}]]
+    compaction_buffer.close()
+
+
+def test_target_is_exposed_as_a_gauge():
+    assert "foundry_relay_adaptive_target_bytes 8388608" in foundry_relay.relay_metrics.render().splitlines()
@@ -0,0 +1,102 @@
+import gzip
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+import pytest
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+from function_apps.foundry_relay.foundry_relay.blob_upload import block_id, iter_blocks, stage_blocks
+
+BODIES = [json.dumps({"operation": "INSERT", "data": {"id": i, "name": "Kate"}}).encode("utf-8") for i in range(200)]
+
+
+class RecordingBlobClient:
+    """Keeps staged blocks and tracks how many stage_block calls overlap."""
+
+    def __init__(self, stage_latency: float = 0.0):
+        self.stage_latency = stage_latency
+        self.staged = {}
+        self.committed = None
+        self.commit_kwargs = None
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def stage_block(self, block_id, data, length=None):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.stage_latency)
+        with self._lock:
+            self.in_flight -= 1
+            self.staged[block_id] = data
+
+    def commit_block_list(self, block_list, **kwargs):
+        self.committed = b"".join(self.staged[block] for block in block_list)
+        self.commit_kwargs = kwargs
+
+
+@pytest.fixture
+def blob_env(blob_service_client, monkeypatch):
+    monkeypatch.setenv("BLOB_UPLOAD_BLOCK_SIZE", "1024")
+    monkeypatch.setenv("BLOB_UPLOAD_MAX_CONCURRENCY", "3")
+    blob_service_client.get_blob_client.return_value = RecordingBlobClient(stage_latency=0.01)
+    return blob_service_client.get_blob_client.return_value
+
+
+@pytest.mark.parametrize("content", [b"x" * 2500, [b"x" * 700, b"x" * 700, b"x" * 1100]])
+def test_iter_blocks_regroups_content(content):
+    blocks = list(iter_blocks(content, 1000))
+    assert [len(block) for block in blocks] == [1000, 1000, 500]
+
+
+def test_block_ids_have_equal_length():
+    assert len({len(block_id(index)) for index in (0, 9, 10, 99_999)}) == 1
+
+
+def test_stage_blocks_bounds_concurrency():
+    blob_client = RecordingBlobClient(stage_latency=0.02)
+    blocks = [bytes([index]) * 10 for index in range(12)]
+
+    assert stage_blocks(blob_client, iter(blocks), max_concurrency=4) == 12
+
+    assert blob_client.committed == b"".join(blocks)
+    assert 1 < blob_client.max_in_flight <= 4
+
+
+def test_stage_block_failure_is_raised():
+    blob_client = MagicMock()
+    blob_client.stage_block.side_effect = [None, RuntimeError("stage failed"), None]
+
+    with pytest.raises(RuntimeError, match="stage failed"):
+        stage_blocks(blob_client, iter([b"a", b"b", b"c"]), max_concurrency=1)
+    blob_client.commit_block_list.assert_not_called()
+
+
+def test_large_batch_is_staged_in_blocks(blob_env, make_message):
+    foundry_relay.main([make_message(body) for body in BODIES])
+
+    assert len(blob_env.staged) > 1
+    assert json.loads(blob_env.committed) == [json.loads(body) for body in BODIES]
+    assert blob_env.commit_kwargs == {}
+    assert blob_env.max_in_flight <= 3
+
+
+def test_staged_upload_keeps_content_encoding(blob_env, monkeypatch, make_message):
+    monkeypatch.setenv("TARGET_FILE_COMPRESSION", "gzip")
+    monkeypatch.setenv("TARGET_FILE_COMPRESSION_LEVEL", "0")
+
+    foundry_relay.main([make_message(body) for body in BODIES])
+
+    assert len(blob_env.staged) > 1
+    assert blob_env.commit_kwargs["content_settings"].content_encoding == "gzip"
+    assert json.loads(gzip.decompress(blob_env.committed)) == [json.loads(body) for body in BODIES]
+
+
+def test_small_batch_uses_a_single_upload(blob_env, make_message):
+    blob_env.upload_blob = MagicMock()
+
+    foundry_relay.main([make_message(BODIES[0])])
+
+    blob_env.upload_blob.assert_called_once_with(b"[" + BODIES[0] + b"]", overwrite=True)
+    assert blob_env.staged == {}
@@ -0,0 +1,68 @@
+import json
+import pytest
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+from function_apps.foundry_relay.foundry_relay.blob_upload import BlockFromUrl
+from function_apps.foundry_relay.foundry_relay.claim_check import ClaimCheck, iter_claimed_blocks
+
+AZURITE_KEY = "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+CLAIMED_PAYLOAD = {"id": 2, "notes": "x" * 1000}
+
+
+@pytest.fixture
+def claim_check_message(make_message):
+    claim = {"container": "claim-checks", "blob": "2026/10/17/abc.json", "size": len(json.dumps(CLAIMED_PAYLOAD))}
+    return make_message(
+        {"claim_check": claim},
+        application_properties={
+            "claim_check_container": "claim-checks",
+            "claim_check_blob": claim["blob"],
+            "claim_check_size": claim["size"],
+        },
+    )
+
+
+@pytest.fixture
+def service_client(blob_service_client, monkeypatch):
+    monkeypatch.setenv("TARGET_FILE_FORMAT", "ndjson")
+    blob_service_client.credential.account_name = "devstoreaccount1"
+    blob_service_client.credential.account_key = AZURITE_KEY
+    blob_client = blob_service_client.get_blob_client.return_value
+    blob_client.url = "http://azurite:10000/devstoreaccount1/claim-checks/2026/10/17/abc.json"
+    blob_client.download_blob.return_value.readall.return_value = json.dumps(CLAIMED_PAYLOAD).encode("utf-8")
+    return blob_service_client
+
+
+def test_claimed_body_is_copied_by_the_storage_service(service_client, make_message, claim_check_message):
+    blob_client = service_client.get_blob_client.return_value
+
+    foundry_relay.main([make_message({"id": 1}), claim_check_message])
+
+    blob_client.download_blob.assert_not_called()
+    assert [call.args[1] for call in blob_client.stage_block.call_args_list] == [b'{"id": 1}\n', b"\n"]
+    source_url = blob_client.stage_block_from_url.call_args.args[1]
+    assert source_url.startswith(blob_client.url + "?") and "sig=" in source_url
+    assert len(blob_client.commit_block_list.call_args.args[0]) == 3
+
+
+def test_claimed_body_is_downloaded_when_it_cannot_be_copied(
+    service_client, monkeypatch, make_message, claim_check_message
+):
+    monkeypatch.setenv("FOUNDRY_RELAY_CLAIM_CHECK_SERVER_COPY", "false")
+    blob_client = service_client.get_blob_client.return_value
+
+    foundry_relay.main([make_message({"id": 1}), claim_check_message])
+
+    service_client.get_blob_client.assert_any_call(container="claim-checks", blob="2026/10/17/abc.json")
+    uploaded = blob_client.upload_blob.call_args.args[0]
+    assert [json.loads(line) for line in uploaded.splitlines()] == [{"id": 1}, CLAIMED_PAYLOAD]
+    blob_client.stage_block_from_url.assert_not_called()
+
+
+def test_claimed_blocks_keep_inline_chunks_together():
+    claims = {b"ref": ClaimCheck("claim-checks", "a.json", 10)}
+
+    blocks = list(
+        iter_claimed_blocks([b"[", b"aa", b",\n", b"ref", b",\n", b"bbbbbb", b"]"], claims, lambda claim: claim.blob, 4)
+    )
+
+    assert blocks == [b"[aa,", b"\n", BlockFromUrl("a.json"), b",\nbb", b"bbbb", b"]"]
@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock, patch
+import pytest
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+
+
+@pytest.fixture
+def foundry_env(monkeypatch):
+    monkeypatch.setenv("TARGET_DATA_WAREHOUSE", "foundry")
+    monkeypatch.setenv("FOUNDRY_API_URL", "https://foundry.example.com")
+    monkeypatch.setenv("FOUNDRY_API_TOKEN", "token-1")
+    monkeypatch.setenv("FOUNDRY_PARENT_FOLDER_RID", "mock-folder-rid")
+
+
+def test_blob_client_is_reused_across_invocations(blob_client, monkeypatch, sample_message):
+    monkeypatch.setenv("AZURITE_CONNECTION_STRING", "fake-conn")
+
+    for _ in range(3):
+        foundry_relay.main([sample_message])
+
+    foundry_relay.BlobServiceClient.from_connection_string.assert_called_once_with("fake-conn")
+    assert blob_client.upload_blob.call_count == 3
+
+
+def test_foundry_client_is_reused_across_invocations(foundry_env, sample_message):
+    with patch(
+        "function_apps.foundry_relay.foundry_relay.foundry_relay.FoundryClient"
+    ) as mock_foundry_client:
+        foundry_relay.main([sample_message])
+        foundry_relay.main([sample_message])
+
+    mock_foundry_client.assert_called_once()
+    assert mock_foundry_client.return_value.datasets.Dataset.File.upload.call_count == 2
+
+
+def test_foundry_client_is_rebuilt_when_token_changes(monkeypatch, foundry_env, sample_message):
+    first_client, second_client = MagicMock(), MagicMock()
+
+    with patch(
+        "function_apps.foundry_relay.foundry_relay.foundry_relay.FoundryClient",
+        side_effect=[first_client, second_client],
+    ):
+        foundry_relay.main([sample_message])
+        monkeypatch.setenv("FOUNDRY_API_TOKEN", "token-2")
+        foundry_relay.main([sample_message])
+
+    first_client.close.assert_called_once()
+    second_client.datasets.Dataset.File.upload.assert_called_once()
@@ -0,0 +1,40 @@
+import filecmp
+import pytest
+from function_apps.foundry_relay.foundry_relay import codec
+from function_apps.service_layer.service_layer import codec as service_layer_codec
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "orjson":
+        if codec.orjson is None:
+            pytest.skip("orjson is not installed")
+    else:
+        monkeypatch.setattr(codec, "orjson", None)
+    return request.param
+
+
+def test_backends_encode_identically(backend):
+    assert codec.backend() == backend
+    assert codec.dumps({"name": "Zoë", "age": 60, "tags": [1.5, None, True]}) == (
+        '{"name":"Zoë","age":60,"tags":[1.5,null,true]}'.encode("utf-8")
+    )
+    assert codec.loads(b' {"a": "\\u00e9"} ') == {"a": "é"}
+
+
+@pytest.mark.parametrize("data", [b'{"a": NaN}', b"[Infinity]", b'"\xff"', b'{"a": 1', b""])
+def test_backends_reject_the_same_input(backend, data):
+    with pytest.raises(codec.JSONDecodeError):
+        codec.loads(data)
+    with pytest.raises(codec.JSONDecodeError):
+        codec.validate(data)
+
+
+def test_is_object(backend):
+    assert codec.is_object(b'{"a": [1, {"b": 2}]}')
+    assert not codec.is_object(b"[{}]")
+    assert not codec.is_object(b'"{"')
+
+
+def test_both_apps_ship_the_same_codec():
+    assert filecmp.cmp(codec.__file__, service_layer_codec.__file__, shallow=False)
@@ -0,0 +1,129 @@
+import json
+import os
+import time
+from unittest.mock import MagicMock
+import pytest
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+from function_apps.foundry_relay.foundry_relay.compaction import CompactionBuffer
+
+
+@pytest.fixture
+def buffer(tmp_path, monkeypatch):
+    compaction_buffer = CompactionBuffer(str(tmp_path), target_bytes=60, max_age=3600)
+    monkeypatch.setattr(foundry_relay, "compaction_buffer", compaction_buffer)
+    monkeypatch.setenv("FOUNDRY_RELAY_COMPACTION_ENABLED", "true")
+    yield compaction_buffer
+    compaction_buffer.close()
+
+
+def uploaded_payloads(blob_client):
+    return [json.loads(call.args[0]) for call in blob_client.upload_blob.call_args_list]
+
+
+def test_payloads_are_buffered_until_target_size(buffer, blob_client, make_message):
+    foundry_relay.main([make_message({"id": 1})])
+    foundry_relay.main([make_message({"id": 2})])
+    blob_client.upload_blob.assert_not_called()
+
+    foundry_relay.main([make_message({"id": 3, "padding": "x" * 40})])
+
+    assert uploaded_payloads(blob_client) == [[{"id": 1}, {"id": 2}, {"id": 3, "padding": "x" * 40}]]
+    assert buffer.records == 0
+    assert os.listdir(buffer.spill_dir) == []
+
+
+def test_buffer_is_flushed_by_age(buffer, blob_client, make_message):
+    buffer.max_age = 0.01
+    foundry_relay.flush(MagicMock())
+    blob_client.upload_blob.assert_not_called()
+
+    buffer.max_age = 3600
+    foundry_relay.main([make_message({"id": 1})])
+    blob_client.upload_blob.assert_not_called()
+
+    buffer.max_age = 0.01
+    time.sleep(0.02)
+    foundry_relay.flush(MagicMock())
+
+    assert uploaded_payloads(blob_client) == [[{"id": 1}]]
+
+
+def test_failed_flush_keeps_payloads_and_completes_messages(buffer, blob_client, make_message):
+    blob_client.upload_blob.side_effect = [RuntimeError("storage down"), None]
+    buffer.target_bytes = 1
+
+    foundry_relay.main([make_message({"id": 1})])
+    foundry_relay.main([make_message({"id": 2})])
+
+    assert blob_client.upload_blob.call_count == 2
+    assert uploaded_payloads(blob_client)[-1] == [{"id": 1}, {"id": 2}]
+    assert buffer.records == 0
+
+
+def test_orphaned_spill_file_is_adopted(tmp_path):
+    crashed = CompactionBuffer(str(tmp_path), target_bytes=1024, max_age=3600)
+    crashed.append([b'{"id": 1}', b'{"id": 2}'])
+    crashed._file.close()  # the worker died without flushing
+
+    survivor = CompactionBuffer(str(tmp_path), target_bytes=1024, max_age=3600)
+    survivor.append([b'{"id": 3}'])
+
+    with survivor.drain() as records:
+        assert sorted(records) == [b'{"id": 1}', b'{"id": 2}', b'{"id": 3}']
+    assert os.listdir(tmp_path) == []
+
+
+def test_live_spill_file_is_not_adopted(tmp_path):
+    first = CompactionBuffer(str(tmp_path), target_bytes=1024, max_age=3600)
+    second = CompactionBuffer(str(tmp_path), target_bytes=1024, max_age=3600)
+    first.append([b'{"id": 1}'])
+    second.append([b'{"id": 2}'])
+
+    with second.drain() as records:
+        assert records == [b'{"id": 2}']
+    assert first.records == 1
+    first.close()
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    crashed = CompactionBuffer(str(tmp_path), target_bytes=1024, max_age=3600)
+    crashed.append([b'{"id": 1}'])
+    crashed._file.write(b"\x00\x00\x00\x20{\"id\"")
+    crashed._file.close()
+
+    survivor = CompactionBuffer(str(tmp_path), target_bytes=1024, max_age=3600)
+    with survivor.drain() as records:
+        assert records == [b'{"id": 1}']
+
+
+def test_compaction_disabled_writes_every_batch(buffer, blob_client, monkeypatch, make_message):
+    monkeypatch.setenv("FOUNDRY_RELAY_COMPACTION_ENABLED", "false")
+
+    foundry_relay.main([make_message({"id": 1})])
+
+    assert uploaded_payloads(blob_client) == [[{"id": 1}]]
+    assert buffer.records == 0
+
+
+def test_empty_buffer_creates_no_spill_file(tmp_path):
+    retry_buffer = CompactionBuffer(str(tmp_path / "retry"), target_bytes=0, max_age=0)
+
+    assert not retry_buffer.is_ready()
+    with retry_buffer.drain() as records:
+        assert records == []
+    assert not os.path.exists(retry_buffer.spill_dir)
+
+
+def test_orphan_left_after_startup_is_adopted_by_the_timer(buffer, blob_client):
+    assert not buffer.is_ready()
+    crashed = CompactionBuffer(buffer.spill_dir, target_bytes=1024, max_age=3600)
+    crashed.append([b'{"id": 1}', b'{"id": 2}'])
+    crashed._file.close()  # the worker died after this one started
+
+    assert not buffer.is_ready()
+    assert buffer.records == 0
+
+    foundry_relay.flush(MagicMock())
+
+    assert buffer.records == 2
+    blob_client.upload_blob.assert_not_called()
@@ -0,0 +1,75 @@
+import gzip
+import io
+import json
+from unittest.mock import patch
+import pytest
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+from function_apps.foundry_relay.foundry_relay.compression import Compression, compress, iter_compressed
+
+BODIES = [json.dumps({"operation": "INSERT", "data": {"id": i, "name": "Kate"}}).encode("utf-8") for i in range(50)]
+
+
+def test_gzip_is_streamed_chunk_by_chunk():
+    chunks = iter_compressed(iter(BODIES), Compression.GZIP, level=1)
+    assert not isinstance(chunks, bytes)
+    assert gzip.decompress(b"".join(chunks)) == b"".join(BODIES)
+
+
+def test_no_compression_returns_content_unchanged():
+    assert compress(b"[]", Compression.NONE) == b"[]"
+
+
+def test_zstd_round_trip():
+    zstandard = pytest.importorskip("zstandard")
+    compressed = b"".join(iter_compressed(b"".join(BODIES), Compression.ZSTD, level=19))
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(compressed) == b"".join(BODIES)
+
+
+def test_gzip_blob_upload_sets_name_and_content_encoding(blob_service_client, monkeypatch, make_message):
+    monkeypatch.setenv("TARGET_FILE_COMPRESSION", "gzip")
+    monkeypatch.setenv("TARGET_FILE_COMPRESSION_LEVEL", "9")
+
+    foundry_relay.main([make_message(body) for body in BODIES])
+
+    assert blob_service_client.get_blob_client.call_args.kwargs["blob"].endswith(".json.gz")
+    upload = blob_service_client.get_blob_client.return_value.upload_blob.call_args
+    assert upload.kwargs["content_settings"].content_encoding == "gzip"
+    payloads = json.loads(gzip.decompress(upload.args[0]))
+    assert [payload["data"]["id"] for payload in payloads] == list(range(50))
+
+
+def test_compressed_ndjson_to_foundry(monkeypatch, make_message):
+    monkeypatch.setenv("TARGET_DATA_WAREHOUSE", "foundry")
+    monkeypatch.setenv("TARGET_FILE_FORMAT", "ndjson")
+    monkeypatch.setenv("TARGET_FILE_COMPRESSION", "gzip")
+    monkeypatch.setenv("FOUNDRY_API_URL", "https://foundry.example.com")
+    monkeypatch.setenv("FOUNDRY_API_TOKEN", "mock-token")
+    monkeypatch.setenv("FOUNDRY_PARENT_FOLDER_RID", "mock-folder-rid")
+    with patch("function_apps.foundry_relay.foundry_relay.foundry_relay.FoundryClient") as mock_foundry_client_cls:
+        foundry_relay.main([make_message(body) for body in BODIES[:2]])
+
+    datasets = mock_foundry_client_cls.return_value.datasets.Dataset
+    upload = datasets.File.upload.call_args.kwargs
+    assert upload["file_path"] == f"{datasets.create.call_args.kwargs['name']}.ndjson.gz"
+    assert gzip.decompress(upload["body"]) == b"".join(body + b"\n" for body in BODIES[:2])
+
+
+def test_parquet_uses_compression_as_internal_codec(blob_service_client, monkeypatch, make_message):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setenv("TARGET_FILE_FORMAT", "parquet")
+    monkeypatch.setenv("TARGET_FILE_SCHEMA", "infer")
+    monkeypatch.setenv("TARGET_FILE_COMPRESSION", "gzip")
+
+    foundry_relay.main([make_message(body) for body in BODIES])
+
+    assert blob_service_client.get_blob_client.call_args.kwargs["blob"].endswith(".parquet")
+    upload = blob_service_client.get_blob_client.return_value.upload_blob.call_args
+    assert "content_settings" not in upload.kwargs
+    metadata = pq.ParquetFile(io.BytesIO(upload.args[0])).metadata
+    assert metadata.row_group(0).column(0).compression == "GZIP"
+
+
+def test_unsupported_compression(blob_service_client, monkeypatch, make_message):
+    monkeypatch.setenv("TARGET_FILE_COMPRESSION", "brotli")
+    with pytest.raises(ValueError, match="Unsupported TARGET_FILE_COMPRESSION"):
+        foundry_relay.main([make_message(BODIES[0])])
@@ -0,0 +1,77 @@
+import json
+import pytest
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+from function_apps.foundry_relay.foundry_relay.dedup import DedupIndex
+
+
+@pytest.fixture(autouse=True)
+def dedup_enabled(monkeypatch):
+    monkeypatch.setenv("FOUNDRY_RELAY_DEDUP_ENABLED", "true")
+
+
+def uploaded(blob_client):
+    return [json.loads(call.args[0]) for call in blob_client.upload_blob.call_args_list]
+
+
+def test_keys_expire_after_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("function_apps.foundry_relay.foundry_relay.dedup.time.time", lambda: clock[0])
+    index = DedupIndex(max_size=10, ttl=60)
+    index.add(["a"])
+
+    assert index.is_duplicate("a")
+    clock[0] += 61
+    assert not index.is_duplicate("a")
+    assert index.stats() == {"hits": 1, "misses": 1, "evictions": 0, "size": 0}
+
+
+def test_least_recently_seen_keys_are_evicted():
+    index = DedupIndex(max_size=2, ttl=60)
+    index.add(["a", "b"])
+    assert index.is_duplicate("a")
+    index.add(["c"])
+
+    assert not index.is_duplicate("b")
+    assert index.is_duplicate("a") and index.is_duplicate("c")
+    assert index.evictions == 1
+
+
+def test_sqlite_backing_survives_restart(tmp_path):
+    db_path = str(tmp_path / "dedup.sqlite")
+    first = DedupIndex(max_size=10, ttl=60, db_path=db_path)
+    first.add(["a"])
+    first.close()
+
+    restarted = DedupIndex(max_size=10, ttl=60, db_path=db_path)
+    assert restarted.is_duplicate("a")
+    assert not restarted.is_duplicate("b")
+    restarted.close()
+
+
+def test_redelivered_messages_are_dropped(blob_client, make_message):
+    foundry_relay.main([make_message({"id": 1}, message_id="m1"), make_message({"id": 2}, message_id="m2")])
+    foundry_relay.main([make_message({"id": 2}, message_id="m2"), make_message({"id": 3}, message_id="m3")])
+    foundry_relay.main([make_message({"id": 3}, message_id="m3")])
+
+    assert uploaded(blob_client) == [[{"id": 1}, {"id": 2}], [{"id": 3}]]
+    assert foundry_relay.dedup_index.hits == 2
+
+
+def test_payload_hash_drops_reposted_payloads(blob_client, monkeypatch, make_message):
+    monkeypatch.setenv("FOUNDRY_RELAY_DEDUP_KEY", "payload_hash")
+
+    foundry_relay.main([make_message({"id": 1}, message_id="m1"), make_message({"id": 1}, message_id="m2")])
+    foundry_relay.main([make_message({"id": 1}, message_id="m3")])
+
+    assert uploaded(blob_client) == [[{"id": 1}]]
+
+
+def test_failed_batch_is_not_remembered(blob_client, make_message):
+    blob_client.upload_blob.side_effect = [RuntimeError("storage down"), None]
+    batch = [make_message({"id": 1}, message_id="m1")]
+
+    with pytest.raises(RuntimeError):
+        foundry_relay.main(batch)
+    foundry_relay.main(batch)
+
+    assert blob_client.upload_blob.call_count == 2
@@ -0,0 +1,73 @@
+import threading
+from unittest.mock import patch
+import pytest
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+
+
+@pytest.fixture
+def both_targets(blob_client, monkeypatch):
+    monkeypatch.setenv("TARGET_DATA_WAREHOUSE", "foundry, blob")
+    monkeypatch.setenv("FOUNDRY_API_URL", "https://foundry.example.com")
+    monkeypatch.setenv("FOUNDRY_API_TOKEN", "mock-token")
+    monkeypatch.setenv("FOUNDRY_PARENT_FOLDER_RID", "mock-folder-rid")
+    with patch(
+        "function_apps.foundry_relay.foundry_relay.foundry_relay.FoundryClient"
+    ) as mock_foundry_client_cls:
+        yield mock_foundry_client_cls.return_value.datasets.Dataset.File, blob_client
+
+
+def test_targets_are_parsed_from_a_list(monkeypatch):
+    monkeypatch.setenv("TARGET_DATA_WAREHOUSE", "Blob,foundry,blob")
+    assert foundry_relay.get_data_warehouse_targets() == [
+        foundry_relay.DataWarehouseTarget.BLOB,
+        foundry_relay.DataWarehouseTarget.FOUNDRY,
+    ]
+
+    monkeypatch.setenv("TARGET_DATA_WAREHOUSE", "blob,s3")
+    with pytest.raises(ValueError, match="Unsupported TARGET_DATA_WAREHOUSE"):
+        foundry_relay.get_data_warehouse_targets()
+
+
+def test_batch_is_written_to_every_target(both_targets, sample_message):
+    foundry_files, blob_client = both_targets
+
+    foundry_relay.main([sample_message])
+
+    foundry_body = foundry_files.upload.call_args.kwargs["body"]
+    blob_body = blob_client.upload_blob.call_args.args[0]
+    assert foundry_body == blob_body == b'[{"key1": "value1"}]'
+
+
+def test_targets_are_written_concurrently(both_targets, sample_message):
+    foundry_files, blob_client = both_targets
+    # Each sink waits for the other, so this only completes if they run at the same time.
+    barrier = threading.Barrier(2, timeout=5)
+    foundry_files.upload.side_effect = lambda **kwargs: barrier.wait()
+    blob_client.upload_blob.side_effect = lambda *args, **kwargs: barrier.wait()
+
+    foundry_relay.main([sample_message])
+
+    foundry_files.upload.assert_called_once()
+    blob_client.upload_blob.assert_called_once()
+
+
+def test_one_failing_target_does_not_stop_the_other(both_targets, sample_message):
+    foundry_files, blob_client = both_targets
+    foundry_files.upload.side_effect = RuntimeError("Foundry unavailable")
+
+    with pytest.raises(foundry_relay.SinkWriteError) as error:
+        foundry_relay.main([sample_message])
+
+    assert list(error.value.failures) == [foundry_relay.DataWarehouseTarget.FOUNDRY]
+    blob_client.upload_blob.assert_called_once()
+
+
+def test_missing_settings_fail_before_any_write(both_targets, sample_message, monkeypatch):
+    foundry_files, blob_client = both_targets
+    monkeypatch.delenv("AZURITE_CONTAINER_NAME")
+
+    with pytest.raises(EnvironmentError):
+        foundry_relay.main([sample_message])
+
+    foundry_files.upload.assert_not_called()
+    blob_client.upload_blob.assert_not_called()
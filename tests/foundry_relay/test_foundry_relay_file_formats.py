@@ -0,0 +1,127 @@
+import io
+import json
+from datetime import datetime, timezone
+from unittest.mock import patch
+import pytest
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+from function_apps.foundry_relay.foundry_relay.serialization import as_ndjson_line, serialize_ndjson
+
+INSERT_EVENT = {
+    "operation": "INSERT",
+    "timestamp": "2024-05-01T09:30:00.12345+00:00",
+    "data": {
+        "id": 1,
+        "name": "Alice",
+        "age": 52,
+        "created_at": "2024-05-01T09:30:00.12345",
+        "updated_at": "2024-05-01T09:30:00.12345",
+    },
+}
+DELETE_EVENT = {"operation": "DELETE", "timestamp": "2024-05-01T09:31:00+00:00", "data": None}
+
+
+def uploaded(blob_service_client):
+    blob_name = blob_service_client.get_blob_client.call_args.kwargs["blob"]
+    content = blob_service_client.get_blob_client.return_value.upload_blob.call_args.args[0]
+    return blob_name, content
+
+
+def test_ndjson_lines_keep_single_line_bodies_untouched():
+    body = b'{"b": 1,  "a": "x"}'
+    assert as_ndjson_line(body) is body
+    assert as_ndjson_line(b'{\n  "a": "\\u00e9"\n}') == '{"a":"é"}'.encode("utf-8")
+
+
+def test_ndjson_batch_written_to_blob(blob_service_client, monkeypatch, make_message):
+    monkeypatch.setenv("TARGET_FILE_FORMAT", "ndjson")
+    bodies = [json.dumps(INSERT_EVENT, indent=2).encode("utf-8"), json.dumps(DELETE_EVENT).encode("utf-8")]
+
+    foundry_relay.main([make_message(body) for body in bodies])
+
+    blob_name, content = uploaded(blob_service_client)
+    assert blob_name.endswith(".ndjson")
+    assert content == serialize_ndjson(bodies)
+    assert [json.loads(line) for line in content.splitlines()] == [INSERT_EVENT, DELETE_EVENT]
+
+
+def test_unsupported_file_format(blob_service_client, monkeypatch, make_message):
+    monkeypatch.setenv("TARGET_FILE_FORMAT", "csv")
+    with pytest.raises(ValueError, match="Unsupported TARGET_FILE_FORMAT"):
+        foundry_relay.main([make_message(json.dumps(DELETE_EVENT).encode("utf-8"))])
+
+
+def test_parquet_batch_uses_subjects_schema(blob_service_client, monkeypatch, make_message):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setenv("TARGET_FILE_FORMAT", "parquet")
+
+    foundry_relay.main([make_message(json.dumps(event).encode("utf-8")) for event in (INSERT_EVENT, DELETE_EVENT)])
+
+    blob_name, content = uploaded(blob_service_client)
+    assert blob_name.endswith(".parquet")
+    parquet_file = pq.ParquetFile(io.BytesIO(content))
+    assert parquet_file.metadata.row_group(0).column(0).compression == "ZSTD"
+    table = parquet_file.read()
+    assert str(table.schema.field("timestamp").type) == "timestamp[us, tz=UTC]"
+    insert, delete = table.to_pylist()
+    assert insert["timestamp"] == datetime(2024, 5, 1, 9, 30, 0, 123450, tzinfo=timezone.utc)
+    assert insert["data"]["created_at"] == datetime(2024, 5, 1, 9, 30, 0, 123450)
+    assert insert["data"]["name"] == "Alice"
+    assert delete["operation"] == "DELETE"
+    assert delete["data"] is None
+
+
+def test_records_not_matching_the_parquet_schema_are_poisoned(blob_service_client, monkeypatch, make_message):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setenv("TARGET_FILE_FORMAT", "parquet")
+    monkeypatch.setenv("FOUNDRY_RELAY_POISON_ENABLED", "true")
+    monkeypatch.setenv("AZURITE_POISON_CONTAINER_NAME", "inbound-poison")
+    wrong_type = {**INSERT_EVENT, "data": {**INSERT_EVENT["data"], "age": "forty"}}
+
+    foundry_relay.main(
+        [
+            make_message(json.dumps(INSERT_EVENT).encode("utf-8")),
+            make_message(json.dumps(wrong_type).encode("utf-8"), message_id="wrong-type"),
+            make_message(b'{"key1": "value1"}', message_id="unknown-field"),
+        ]
+    )
+
+    blob_client = blob_service_client.get_blob_client.return_value
+    uploads = {
+        get_call.kwargs["container"]: upload_call.args[0]
+        for get_call, upload_call in zip(
+            blob_service_client.get_blob_client.call_args_list, blob_client.upload_blob.call_args_list
+        )
+    }
+    poison_records = [json.loads(line) for line in uploads["inbound-poison"].splitlines()]
+    assert [record["message_id"] for record in poison_records] == ["wrong-type", "unknown-field"]
+    assert "forty" in poison_records[0]["error"]
+    assert "key1" in poison_records[1]["error"]
+    assert [row["data"]["name"] for row in pq.read_table(io.BytesIO(uploads["inbound"])).to_pylist()] == ["Alice"]
+
+
+def test_parquet_schema_can_be_inferred(blob_service_client, monkeypatch, make_message):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setenv("TARGET_FILE_FORMAT", "parquet")
+    monkeypatch.setenv("TARGET_FILE_SCHEMA", "infer")
+
+    foundry_relay.main([make_message(b'{"key1": "value1", "count": 3}')])
+
+    _, content = uploaded(blob_service_client)
+    assert pq.read_table(io.BytesIO(content)).to_pylist() == [{"key1": "value1", "count": 3}]
+
+
+def test_parquet_to_foundry_names_dataset_without_extension(monkeypatch, make_message):
+    pytest.importorskip("pyarrow")
+    monkeypatch.setenv("TARGET_DATA_WAREHOUSE", "foundry")
+    monkeypatch.setenv("TARGET_FILE_FORMAT", "parquet")
+    monkeypatch.setenv("FOUNDRY_API_URL", "https://foundry.example.com")
+    monkeypatch.setenv("FOUNDRY_API_TOKEN", "mock-token")
+    monkeypatch.setenv("FOUNDRY_PARENT_FOLDER_RID", "mock-folder-rid")
+    with patch("function_apps.foundry_relay.foundry_relay.foundry_relay.FoundryClient") as mock_foundry_client_cls:
+        foundry_relay.main([make_message(json.dumps(INSERT_EVENT).encode("utf-8"))])
+
+    datasets = mock_foundry_client_cls.return_value.datasets.Dataset
+    dataset_name = datasets.create.call_args.kwargs["name"]
+    file_path = datasets.File.upload.call_args.kwargs["file_path"]
+    assert file_path == f"{dataset_name}.parquet"
+    assert datasets.File.upload.call_args.kwargs["body"].startswith(b"PAR1")
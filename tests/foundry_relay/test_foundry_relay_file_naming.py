@@ -0,0 +1,83 @@
+from unittest.mock import patch
+import pytest
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+from function_apps.foundry_relay.foundry_relay.idempotency import WrittenFiles, content_hash
+
+
+def test_content_hash_depends_on_body_boundaries():
+    assert content_hash([b"ab", b"c"]) != content_hash([b"a", b"bc"])
+    assert content_hash([b"ab", b"c"]) == content_hash([b"ab", b"c"])
+
+
+def test_written_files_evicts_least_recently_used():
+    written = WrittenFiles(max_size=2)
+    written.add("a")
+    written.add("b")
+    assert "a" in written
+    written.add("c")
+    assert "a" in written and "c" in written and "b" not in written
+
+
+def test_content_hash_naming_skips_a_redelivered_batch(blob_service_client, monkeypatch, make_message):
+    monkeypatch.setenv("FOUNDRY_RELAY_FILE_NAMING", "content_hash")
+    batch = [make_message({"id": 1}), make_message({"id": 2})]
+
+    foundry_relay.main(batch)
+    foundry_relay.main(batch)
+
+    blob_service_client.get_blob_client.return_value.upload_blob.assert_called_once()
+    (name,) = {call.kwargs["blob"] for call in blob_service_client.get_blob_client.call_args_list}
+    expected_hash = content_hash([b'{"id": 1}', b'{"id": 2}'])
+    assert name == f"batch_{expected_hash[:32]}.json"
+
+
+def test_existing_blob_is_not_rewritten(blob_service_client, monkeypatch, make_message):
+    monkeypatch.setenv("FOUNDRY_RELAY_FILE_NAMING", "content_hash")
+    blob_service_client.get_blob_client.return_value.exists.return_value = True
+
+    foundry_relay.main([make_message({"id": 1})])
+
+    blob_service_client.get_blob_client.return_value.upload_blob.assert_not_called()
+
+
+def test_sequence_naming(blob_service_client, monkeypatch, make_message):
+    monkeypatch.setenv("FOUNDRY_RELAY_FILE_NAMING", "sequence")
+
+    foundry_relay.main([make_message({"id": 1}, sequence_number=42), make_message({"id": 2}, sequence_number=40)])
+
+    assert blob_service_client.get_blob_client.call_args.kwargs["blob"] == "batch_00000000000000000040-00000000000000000042.json"
+
+
+def test_random_naming_writes_every_delivery(blob_service_client, make_message):
+    batch = [make_message({"id": 1})]
+
+    foundry_relay.main(batch)
+    foundry_relay.main(batch)
+
+    assert blob_service_client.get_blob_client.return_value.upload_blob.call_count == 2
+    blob_service_client.get_blob_client.return_value.exists.assert_not_called()
+
+
+def test_redelivery_only_writes_the_target_that_failed(blob_service_client, monkeypatch, make_message):
+    monkeypatch.setenv("TARGET_DATA_WAREHOUSE", "foundry,blob")
+    monkeypatch.setenv("FOUNDRY_RELAY_FILE_NAMING", "content_hash")
+    monkeypatch.setenv("FOUNDRY_API_URL", "https://foundry.example.com")
+    monkeypatch.setenv("FOUNDRY_API_TOKEN", "mock-token")
+    monkeypatch.setenv("FOUNDRY_PARENT_FOLDER_RID", "mock-folder-rid")
+    batch = [make_message({"id": 1})]
+
+    with patch("function_apps.foundry_relay.foundry_relay.foundry_relay.FoundryClient") as mock_foundry_client_cls:
+        foundry_files = mock_foundry_client_cls.return_value.datasets.Dataset.File
+        foundry_files.upload.side_effect = [RuntimeError("Foundry unavailable"), None]
+        with pytest.raises(foundry_relay.SinkWriteError):
+            foundry_relay.main(batch)
+        foundry_relay.main(batch)
+
+    assert foundry_files.upload.call_count == 2
+    blob_service_client.get_blob_client.return_value.upload_blob.assert_called_once()
+
+
+def test_unsupported_file_naming(blob_service_client, monkeypatch, make_message):
+    monkeypatch.setenv("FOUNDRY_RELAY_FILE_NAMING", "timestamp")
+    with pytest.raises(ValueError, match="Unsupported FOUNDRY_RELAY_FILE_NAMING"):
+        foundry_relay.main([make_message({"id": 1})])
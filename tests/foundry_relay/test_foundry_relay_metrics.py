@@ -0,0 +1,67 @@
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+from function_apps.foundry_relay.foundry_relay.metrics import ContentMeter, Histogram
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("relay_seconds", "Test histogram.", (1, 5), ("target",))
+    for value in (0.5, 3, 3, 10):
+        histogram.observe(value, target="blob")
+
+    lines = list(histogram.render())
+
+    assert 'relay_seconds_bucket{target="blob",le="1.0"} 1' in lines
+    assert 'relay_seconds_bucket{target="blob",le="5.0"} 3' in lines
+    assert 'relay_seconds_bucket{target="blob",le="+Inf"} 4' in lines
+    assert 'relay_seconds_sum{target="blob"} 16.5' in lines
+    assert 'relay_seconds_count{target="blob"} 4' in lines
+
+
+def test_content_meter_counts_bytes_and_encoding_time():
+    def slow_chunks():
+        time.sleep(0.01)
+        yield b"abc"
+        yield b"de"
+
+    meter = ContentMeter(slow_chunks())
+
+    assert b"".join(meter) == b"abcde"
+    assert meter.size == 5
+    assert meter.seconds >= 0.01
+
+
+def test_main_records_stage_histograms(blob_client, make_message):
+    capture_time = int((time.time() - 5) * 1000)
+    enqueued_at = datetime.now(timezone.utc) - timedelta(seconds=2)
+    foundry_relay.main(
+        [
+            make_message(
+                {"id": 1}, enqueued_time_utc=enqueued_at, application_properties={"capture_time": capture_time}
+            ),
+            make_message({"id": 2}, enqueued_time_utc=enqueued_at),
+        ]
+    )
+
+    assert foundry_relay.decode_seconds.count() == 1
+    assert foundry_relay.serialize_seconds.count() == 1
+    assert foundry_relay.upload_seconds.count(target="blob") == 1
+    assert foundry_relay.batch_records.count() == 1
+    assert foundry_relay.enqueue_to_write_seconds.count() == 2
+    assert foundry_relay.capture_to_write_seconds.count() == 1
+    assert "foundry_relay_batch_bytes_sum 22.0" in foundry_relay.relay_metrics.render()
+
+
+def test_metrics_endpoint_serves_prometheus_text(blob_client, monkeypatch, make_message):
+    monkeypatch.setenv("FOUNDRY_RELAY_METRICS_ENABLED", "true")
+    foundry_relay.main([make_message({"id": 1})])
+
+    response = foundry_relay.metrics(MagicMock())
+
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE foundry_relay_upload_seconds histogram" in response.get_body().decode("utf-8")
+
+
+def test_metrics_endpoint_is_off_by_default():
+    assert foundry_relay.metrics(MagicMock()).status_code == 404
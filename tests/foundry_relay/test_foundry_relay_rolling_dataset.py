@@ -0,0 +1,116 @@
+from unittest.mock import MagicMock, patch
+import pytest
+from foundry_sdk import BadRequestError, ConflictError
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+from function_apps.foundry_relay.foundry_relay.rolling_dataset import RollingDatasetWriter
+
+DATASET_RID = "ri.foundry.main.dataset.rolling"
+
+
+@pytest.fixture
+def rolling_env(monkeypatch):
+    monkeypatch.setenv("TARGET_DATA_WAREHOUSE", "foundry")
+    monkeypatch.setenv("FOUNDRY_WRITE_MODE", "rolling")
+    monkeypatch.setenv("FOUNDRY_API_URL", "https://foundry.example.com")
+    monkeypatch.setenv("FOUNDRY_API_TOKEN", "mock-token")
+    monkeypatch.setenv("FOUNDRY_PARENT_FOLDER_RID", "mock-folder-rid")
+    monkeypatch.setenv("FOUNDRY_TARGET_DATASET_RID", DATASET_RID)
+    monkeypatch.setattr(foundry_relay, "rolling_dataset", RollingDatasetWriter(max_bytes=10_000, max_age=3600))
+
+
+@pytest.fixture
+def mock_foundry_client():
+    with patch(
+        "function_apps.foundry_relay.foundry_relay.foundry_relay.FoundryClient"
+    ) as mock_foundry_client_cls:
+        client = mock_foundry_client_cls.return_value
+        client.datasets.Dataset.Transaction.create.side_effect = [
+            MagicMock(rid=f"ri.foundry.main.transaction.{i}") for i in range(5)
+        ]
+        yield client
+
+
+def test_batches_are_appended_to_one_transaction(rolling_env, mock_foundry_client, sample_message):
+    """No dataset is created per batch; every file lands in the same open transaction."""
+    for _ in range(3):
+        foundry_relay.main([sample_message])
+
+    datasets = mock_foundry_client.datasets.Dataset
+    datasets.create.assert_not_called()
+    datasets.Transaction.create.assert_called_once_with(DATASET_RID, transaction_type="APPEND", branch_name="master")
+    uploads = datasets.File.upload.call_args_list
+    assert len(uploads) == 3
+    assert {call.kwargs["transaction_rid"] for call in uploads} == {"ri.foundry.main.transaction.0"}
+    datasets.Transaction.commit.assert_not_called()
+
+
+def test_transaction_is_committed_and_rolled_by_size(rolling_env, mock_foundry_client, sample_message):
+    foundry_relay.rolling_dataset.max_bytes = 1
+
+    foundry_relay.main([sample_message])
+    foundry_relay.main([sample_message])
+
+    transactions = mock_foundry_client.datasets.Dataset.Transaction
+    assert transactions.create.call_count == 2
+    assert [call.args for call in transactions.commit.call_args_list] == [
+        (DATASET_RID, "ri.foundry.main.transaction.0"),
+        (DATASET_RID, "ri.foundry.main.transaction.1"),
+    ]
+
+
+def test_open_transaction_left_by_another_worker_is_adopted(rolling_env, mock_foundry_client, sample_message):
+    transactions = mock_foundry_client.datasets.Dataset.Transaction
+    transactions.create.side_effect = ConflictError({"errorName": "OpenTransactionAlreadyExists"})
+    transactions.get.return_value = MagicMock(rid="ri.foundry.main.transaction.open")
+
+    foundry_relay.main([sample_message])
+
+    upload = mock_foundry_client.datasets.Dataset.File.upload.call_args
+    assert upload.kwargs["transaction_rid"] == "ri.foundry.main.transaction.open"
+
+
+def test_transaction_closed_elsewhere_is_replaced(rolling_env, mock_foundry_client, sample_message):
+    uploads = mock_foundry_client.datasets.Dataset.File.upload
+    uploads.side_effect = [None, BadRequestError({"errorName": "TransactionNotOpen"}), None]
+
+    foundry_relay.main([sample_message])
+    foundry_relay.main([sample_message])
+
+    assert uploads.call_args.kwargs["transaction_rid"] == "ri.foundry.main.transaction.1"
+
+
+def test_dataset_is_created_once_without_a_configured_rid(
+    monkeypatch, rolling_env, mock_foundry_client, sample_message
+):
+    monkeypatch.delenv("FOUNDRY_TARGET_DATASET_RID")
+    mock_foundry_client.datasets.Dataset.create.return_value.rid = DATASET_RID
+
+    foundry_relay.main([sample_message])
+    foundry_relay.main([sample_message])
+
+    mock_foundry_client.datasets.Dataset.create.assert_called_once()
+
+
+def test_timer_commits_a_transaction_older_than_the_roll_interval(rolling_env, mock_foundry_client, sample_message):
+    foundry_relay.main([sample_message])
+    transactions = mock_foundry_client.datasets.Dataset.Transaction
+
+    foundry_relay.flush(MagicMock())
+    transactions.commit.assert_not_called()
+
+    foundry_relay.rolling_dataset.max_age = 0
+    foundry_relay.flush(MagicMock())
+    transactions.commit.assert_called_once_with(DATASET_RID, "ri.foundry.main.transaction.0")
+
+
+def test_open_transaction_is_committed_when_the_dataset_changes(
+    monkeypatch, rolling_env, mock_foundry_client, sample_message
+):
+    foundry_relay.main([sample_message])
+    monkeypatch.setenv("FOUNDRY_TARGET_DATASET_RID", "ri.foundry.main.dataset.other")
+    foundry_relay.main([sample_message])
+
+    transactions = mock_foundry_client.datasets.Dataset.Transaction
+    transactions.commit.assert_called_once_with(DATASET_RID, "ri.foundry.main.transaction.0")
+    upload = mock_foundry_client.datasets.Dataset.File.upload.call_args
+    assert upload.kwargs["dataset_rid"] == "ri.foundry.main.dataset.other"
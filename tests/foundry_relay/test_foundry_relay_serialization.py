@@ -0,0 +1,61 @@
+import json
+from unittest.mock import MagicMock, patch
+import pytest
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+from function_apps.foundry_relay.foundry_relay.serialization import (
+    as_bytes,
+    iter_json_array_chunks,
+    serialize_json_array,
+    validate_json_body,
+)
+
+SUBJECT_EVENTS = [
+    {"operation": "INSERT", "timestamp": "2025-05-23T10:00:00", "data": {"id": 1, "name": "Kate", "age": 40}},
+    {"operation": "UPDATE", "timestamp": "2025-05-23T10:00:01", "data": {"id": 1, "name": "Kate", "age": 41}},
+]
+
+
+def test_serialized_batch_round_trips():
+    """The spliced output parses back to exactly the original payloads."""
+    bodies = [json.dumps(event).encode("utf-8") for event in SUBJECT_EVENTS]
+
+    assert json.loads(serialize_json_array(bodies)) == SUBJECT_EVENTS
+
+
+def test_bodies_are_spliced_without_re_encoding():
+    body = b'{ "keep" :  "my spacing" }'
+
+    assert serialize_json_array([body]) == b"[" + body + b"]"
+
+
+@pytest.mark.parametrize("body", [b"invalid_payload", b'{"unterminated": ', b"\xff\xfe"])
+def test_invalid_bodies_are_rejected(body):
+    with pytest.raises(ValueError):
+        validate_json_body(body)
+
+
+def test_as_bytes_accepts_chunk_iterators():
+    assert as_bytes(iter_json_array_chunks([b"1", b"2"])) == b"[1,\n2]"
+
+
+def test_main_uploads_raw_message_bytes(monkeypatch):
+    monkeypatch.setenv("TARGET_DATA_WAREHOUSE", "blob")
+    monkeypatch.setenv("AZURITE_CONNECTION_STRING", "fake-conn")
+    monkeypatch.setenv("AZURITE_CONTAINER_NAME", "inbound")
+    messages = []
+    for event in SUBJECT_EVENTS:
+        message = MagicMock()
+        message.get_body.return_value = json.dumps(event).encode("utf-8")
+        messages.append(message)
+    bad_message = MagicMock()
+    bad_message.get_body.return_value = b"not json"
+
+    with patch(
+        "function_apps.foundry_relay.foundry_relay.foundry_relay.BlobServiceClient"
+    ) as mock_blob_service_client:
+        blob_client = mock_blob_service_client.from_connection_string.return_value.get_blob_client.return_value
+        foundry_relay.main(messages + [bad_message])
+
+    uploaded = blob_client.upload_blob.call_args.args[0]
+    assert isinstance(uploaded, bytes)
+    assert json.loads(uploaded) == SUBJECT_EVENTS
@@ -0,0 +1,104 @@
+import json
+from unittest.mock import patch
+import pytest
+from function_apps.foundry_relay.foundry_relay import foundry_relay
+from function_apps.foundry_relay.foundry_relay.compaction import CompactionBuffer
+
+
+@pytest.fixture
+def blob_env(blob_service_client, monkeypatch):
+    monkeypatch.setenv("AZURITE_POISON_CONTAINER_NAME", "inbound-poison")
+    return blob_service_client
+
+
+def uploads_by_container(service_client):
+    uploads = {}
+    blob_client = service_client.get_blob_client.return_value
+    for get_call, upload_call in zip(service_client.get_blob_client.call_args_list, blob_client.upload_blob.call_args_list):
+        uploads.setdefault(get_call.kwargs["container"], []).append(upload_call.args[0])
+    return uploads
+
+
+def test_poison_messages_are_parked_and_valid_ones_written(blob_env, monkeypatch, make_message):
+    monkeypatch.setenv("FOUNDRY_RELAY_POISON_ENABLED", "true")
+
+    foundry_relay.main([make_message(b'{"id": 1}'), make_message(b"not json", message_id="msg-2")])
+
+    uploads = uploads_by_container(blob_env)
+    assert uploads["inbound"] == [b'[{"id": 1}]']
+    (poison_file,) = uploads["inbound-poison"]
+    record = json.loads(poison_file)
+    assert record["message_id"] == "msg-2"
+    assert record["body"] == "not json"
+    assert "line 1 column 1" in record["error"]
+
+
+def test_all_poison_batch_is_completed(blob_env, monkeypatch, make_message):
+    monkeypatch.setenv("FOUNDRY_RELAY_POISON_ENABLED", "true")
+
+    foundry_relay.main([make_message(b"not json")])
+
+    assert list(uploads_by_container(blob_env)) == ["inbound-poison"]
+
+
+def test_poison_write_failure_is_raised(blob_env, monkeypatch, make_message):
+    monkeypatch.setenv("FOUNDRY_RELAY_POISON_ENABLED", "true")
+    blob_env.get_blob_client.return_value.upload_blob.side_effect = RuntimeError("storage down")
+
+    with pytest.raises(RuntimeError):
+        foundry_relay.main([make_message(b"not json")])
+
+
+@pytest.fixture
+def fan_out_env(blob_env, monkeypatch, tmp_path):
+    monkeypatch.setenv("TARGET_DATA_WAREHOUSE", "foundry,blob")
+    monkeypatch.setenv("FOUNDRY_RELAY_SINK_RETRY_ENABLED", "true")
+    monkeypatch.setenv("FOUNDRY_API_URL", "https://foundry.example.com")
+    monkeypatch.setenv("FOUNDRY_API_TOKEN", "mock-token")
+    monkeypatch.setenv("FOUNDRY_PARENT_FOLDER_RID", "mock-folder-rid")
+    retry_buffers = {
+        target: CompactionBuffer(str(tmp_path / target.value), target_bytes=0, max_age=0)
+        for target in foundry_relay.DataWarehouseTarget
+    }
+    monkeypatch.setattr(foundry_relay, "retry_buffers", retry_buffers)
+    with patch("function_apps.foundry_relay.foundry_relay.foundry_relay.FoundryClient") as mock_foundry_client_cls:
+        yield mock_foundry_client_cls.return_value.datasets.Dataset.File, blob_env.get_blob_client.return_value
+    for retry_buffer in retry_buffers.values():
+        retry_buffer.close()
+
+
+def test_only_the_failed_target_is_retried(fan_out_env, make_message):
+    foundry_files, blob_client = fan_out_env
+    foundry_files.upload.side_effect = [RuntimeError("Foundry unavailable"), None, None]
+
+    foundry_relay.main([make_message(b'{"id": 1}')])
+    assert foundry_relay.retry_buffers[foundry_relay.DataWarehouseTarget.FOUNDRY].records == 1
+
+    foundry_relay.main([make_message(b'{"id": 2}')])
+
+    assert [call.args[0] for call in blob_client.upload_blob.call_args_list] == [b'[{"id": 1}]', b'[{"id": 2}]']
+    assert [call.kwargs["body"] for call in foundry_files.upload.call_args_list] == [
+        b'[{"id": 1}]',
+        b'[{"id": 1}]',
+        b'[{"id": 2}]',
+    ]
+    assert foundry_relay.retry_buffers[foundry_relay.DataWarehouseTarget.FOUNDRY].records == 0
+
+
+def test_batch_is_redelivered_when_every_target_fails(fan_out_env, make_message):
+    foundry_files, blob_client = fan_out_env
+    foundry_files.upload.side_effect = RuntimeError("Foundry unavailable")
+    blob_client.upload_blob.side_effect = RuntimeError("storage down")
+
+    with pytest.raises(foundry_relay.SinkWriteError):
+        foundry_relay.main([make_message(b'{"id": 1}')])
+    assert all(retry_buffer.records == 0 for retry_buffer in foundry_relay.retry_buffers.values())
+
+
+def test_partial_failure_raises_without_sink_retry(fan_out_env, monkeypatch, make_message):
+    foundry_files, _ = fan_out_env
+    monkeypatch.setenv("FOUNDRY_RELAY_SINK_RETRY_ENABLED", "false")
+    foundry_files.upload.side_effect = RuntimeError("Foundry unavailable")
+
+    with pytest.raises(foundry_relay.SinkWriteError):
+        foundry_relay.main([make_message(b'{"id": 1}')])
@@ -0,0 +1,173 @@
+import asyncio
+import json
+from http import HTTPStatus
+from unittest.mock import patch
+import pytest
+import azure.functions as func
+from azure.servicebus.exceptions import ServiceBusConnectionError
+from function_apps.service_layer.service_layer import async_service_layer, service_bus
+from function_apps.service_layer.service_layer.async_sender_pool import AsyncSenderPool
+
+
+class FakeBatch(list):
+    def add_message(self, message):
+        self.append(message)
+
+
+class FakeAsyncSender:
+    def __init__(self, fail_first_send: bool = False):
+        self.sent = []
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail_first_send = fail_first_send
+
+    async def send_messages(self, message):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if self.fail_first_send:
+            self.fail_first_send = False
+            raise ServiceBusConnectionError(message="connection lost")
+        if isinstance(message, FakeBatch):
+            self.batches.append([json.loads(str(batched)) for batched in message])
+            return
+        self.sent.append(json.loads(str(message)))
+
+    async def create_message_batch(self, max_size_in_bytes=None):
+        return FakeBatch()
+
+    async def close(self):
+        pass
+
+
+class FakeAsyncClient:
+    instances = []
+    fail_first_send = False
+
+    def __init__(self, sender: FakeAsyncSender):
+        self.sender = sender
+        self.closed = False
+        FakeAsyncClient.instances.append(self)
+
+    @classmethod
+    def from_connection_string(cls, conn_str):
+        return cls(FakeAsyncSender(fail_first_send=cls.fail_first_send and not cls.instances))
+
+    def get_topic_sender(self, topic_name):
+        return self.sender
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    monkeypatch.setenv("TOPIC_NAME", "topic.1")
+    monkeypatch.setenv("SERVICE_BUS_CONNECTION_STR", "Endpoint=sb://localhost;")
+    FakeAsyncClient.instances = []
+    FakeAsyncClient.fail_first_send = False
+    with patch.object(async_service_layer, "ServiceBusClient", FakeAsyncClient):
+        yield FakeAsyncClient
+    asyncio.run(async_service_layer.sender_pool.close())
+
+
+def make_request(payload) -> func.HttpRequest:
+    return func.HttpRequest(
+        method="POST", url="/api/service_layer_async", body=json.dumps(payload).encode("utf-8"), headers={}
+    )
+
+
+def test_concurrent_requests_share_the_event_loop(fake_client):
+    """Many in-flight requests are served concurrently over pooled connections."""
+
+    async def run():
+        return await asyncio.gather(*(async_service_layer.main(make_request({"id": i})) for i in range(8)))
+
+    responses = asyncio.run(run())
+
+    assert all(response.status_code == HTTPStatus.OK for response in responses)
+    sent = [payload for client in fake_client.instances for payload in client.sender.sent]
+    assert sorted(payload["id"] for payload in sent) == list(range(8))
+    assert 1 < len(fake_client.instances) <= 4
+
+
+def test_stale_connection_is_replaced(fake_client):
+    fake_client.fail_first_send = True
+
+    response = asyncio.run(async_service_layer.main(make_request({"id": 1})))
+
+    assert response.status_code == HTTPStatus.OK
+    assert fake_client.instances[0].closed
+    assert fake_client.instances[1].sender.sent == [{"id": 1}]
+
+
+def test_invalid_payload_is_rejected(fake_client):
+    response = asyncio.run(async_service_layer.main(make_request("not an object")))
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_bulk_batches_use_the_same_caps_as_the_sync_function(fake_client, monkeypatch):
+    monkeypatch.setattr(async_service_layer, "BATCH_MAX_MESSAGES", 2)
+    request = func.HttpRequest(
+        method="POST",
+        url="/api/service_layer_async",
+        body=b"\n".join(json.dumps({"id": i}).encode("utf-8") for i in range(5)),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    response = asyncio.run(async_service_layer.main(request))
+
+    assert response.status_code == HTTPStatus.OK
+    batches = fake_client.instances[0].sender.batches
+    assert [[payload["id"] for payload in batch] for batch in batches] == [[0, 1], [2, 3], [4]]
+
+
+def test_pool_created_outside_an_event_loop_serves_each_loop():
+    pool = AsyncSenderPool(max_size=1)
+
+    async def send_concurrently():
+        async def send(sender):
+            await asyncio.sleep(0.01)
+
+        client_factory = lambda: FakeAsyncClient(FakeAsyncSender())  # noqa: E731
+        await asyncio.gather(*(pool.run("key", "topic.1", client_factory, send) for _ in range(3)))
+        await pool.close()
+
+    asyncio.run(send_concurrently())
+    asyncio.run(send_concurrently())
+
+
+def test_pool_does_not_hand_out_senders_from_a_previous_loop():
+    pool = AsyncSenderPool(max_size=1)
+    clients = []
+
+    def client_factory():
+        clients.append(FakeAsyncClient(FakeAsyncSender()))
+        return clients[-1]
+
+    async def send_once():
+        async def send(sender):
+            return sender
+
+        return await pool.run("key", "topic.1", client_factory, send)
+
+    first = asyncio.run(send_once())
+    second = asyncio.run(send_once())
+
+    assert second is not first
+    assert [client.sender for client in clients] == [first, second]
+
+
+def test_async_credential_is_created_per_loop():
+    async def credentials():
+        return service_bus.get_async_credential(), service_bus.get_async_credential()
+
+    with patch.object(service_bus, "AsyncDefaultAzureCredential", side_effect=lambda: object()):
+        first, same_loop = asyncio.run(credentials())
+        second, _ = asyncio.run(credentials())
+
+    assert first is same_loop
+    assert second is not first
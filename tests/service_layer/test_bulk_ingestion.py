@@ -0,0 +1,100 @@
+import json
+from http import HTTPStatus
+from unittest.mock import MagicMock, patch
+import pytest
+import azure.functions as func
+from azure.servicebus.exceptions import ServiceBusError
+from function_apps.service_layer.service_layer import service_layer
+from function_apps.service_layer.service_layer.bulk import iter_json_array_records, iter_ndjson_records
+
+
+@pytest.fixture
+def sent_messages(monkeypatch):
+    """Patch the Service Bus client and collect the bodies of every batch sent."""
+    monkeypatch.setenv("TOPIC_NAME", "topic.1")
+    monkeypatch.setenv("SERVICE_BUS_CONNECTION_STR", "Endpoint=sb://localhost;")
+    service_layer.sender_pool.close()
+    batches = []
+
+    class FakeBatch(list):
+        add_message = list.append
+
+    with patch(
+        "function_apps.service_layer.service_layer.service_layer.ServiceBusClient"
+    ) as mock_client_cls:
+        sender = MagicMock()
+        sender.create_message_batch.side_effect = lambda max_size_in_bytes=None: FakeBatch()
+        sender.send_messages.side_effect = lambda batch: batches.append(
+            [json.loads(str(message)) for message in batch] if isinstance(batch, FakeBatch) else str(batch)
+        )
+        mock_client_cls.from_connection_string.return_value.get_topic_sender.return_value = sender
+        yield batches
+    service_layer.sender_pool.close()
+
+
+def make_request(body: bytes, content_type: str = "application/json") -> func.HttpRequest:
+    return func.HttpRequest(
+        method="POST", url="/api/service_layer", body=body, headers={"Content-Type": content_type}
+    )
+
+
+def test_json_array_records_are_streamed():
+    records = list(iter_json_array_records(b' [ {"a": 1}, 2 , {"b": 2} ] '))
+
+    assert [record.payload for record in records] == [{"a": 1}, None, {"b": 2}]
+    assert records[1].error is not None
+
+
+def test_malformed_array_keeps_earlier_records():
+    records = list(iter_json_array_records(b'[{"a": 1}, {"b": ]'))
+
+    assert records[0].payload == {"a": 1}
+    assert records[1].error.startswith("Invalid JSON")
+
+
+def test_ndjson_bad_line_only_rejects_that_record():
+    records = list(iter_ndjson_records(b'{"a": 1}\nnot json\n\n{"b": 2}\n'))
+
+    assert [record.index for record in records] == [0, 1, 2]
+    assert [record.error is None for record in records] == [True, False, True]
+
+
+def test_json_array_is_sent_in_one_batch(sent_messages):
+    payload = [{"id": i} for i in range(3)]
+
+    response = service_layer.main(make_request(json.dumps(payload).encode()))
+
+    assert response.status_code == HTTPStatus.OK
+    assert sent_messages == [payload]
+    assert json.loads(response.get_body())["accepted"] == 3
+
+
+def test_ndjson_reports_per_record_results(sent_messages):
+    body = b'{"id": 1}\n[1, 2]\n{"id": 2}\n'
+
+    response = service_layer.main(make_request(body, "application/x-ndjson; charset=utf-8"))
+
+    result = json.loads(response.get_body())
+    assert response.status_code == HTTPStatus.MULTI_STATUS
+    assert sent_messages == [[{"id": 1}, {"id": 2}]]
+    assert [r["status"] for r in result["results"]] == ["accepted", "rejected", "accepted"]
+
+
+def test_send_failure_marks_records_failed(sent_messages):
+    sender = service_layer.ServiceBusClient.from_connection_string.return_value.get_topic_sender.return_value
+    sender.send_messages.side_effect = ServiceBusError("broker unavailable")
+
+    response = service_layer.main(make_request(b'[{"id": 1}]'))
+
+    assert response.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+    assert json.loads(response.get_body())["failed"] == 1
+
+
+def test_single_object_still_uses_the_original_path(sent_messages):
+    sender = service_layer.ServiceBusClient.from_connection_string.return_value.get_topic_sender.return_value
+
+    response = service_layer.main(make_request(b'{"id": 1}'))
+
+    assert response.status_code == HTTPStatus.OK
+    sender.create_message_batch.assert_not_called()
+    sender.send_messages.assert_called_once()
@@ -0,0 +1,118 @@
+import asyncio
+import json
+from http import HTTPStatus
+from unittest.mock import AsyncMock, patch
+import pytest
+import azure.functions as func
+from azure.core.exceptions import ServiceRequestError
+from function_apps.service_layer.service_layer import async_service_layer, claim_check, service_layer
+
+
+@pytest.fixture(autouse=True)
+def service_bus_env(monkeypatch):
+    monkeypatch.setenv("TOPIC_NAME", "topic.1")
+    monkeypatch.setenv("SERVICE_BUS_CONNECTION_STR", "Endpoint=sb://localhost;")
+    monkeypatch.setenv("SERVICE_BUS_CLAIM_CHECK_ENABLED", "true")
+    monkeypatch.setenv("SERVICE_BUS_CLAIM_CHECK_THRESHOLD_BYTES", "100")
+    monkeypatch.setenv("AZURITE_CONNECTION_STRING", "UseDevelopmentStorage=true")
+    monkeypatch.setenv("AZURITE_CLAIM_CHECK_CONTAINER_NAME", "claim-checks")
+
+
+@pytest.fixture
+def claim_blob_client():
+    claim_check.get_blob_service_client.cache_clear()
+    with patch(
+        "function_apps.service_layer.service_layer.claim_check.BlobServiceClient"
+    ) as mock_blob_service_client_cls:
+        yield mock_blob_service_client_cls.from_connection_string.return_value.get_blob_client
+    claim_check.get_blob_service_client.cache_clear()
+
+
+def make_request(payload: dict) -> func.HttpRequest:
+    return func.HttpRequest(
+        method="POST", url="/api/service_layer", body=json.dumps(payload).encode("utf-8"), headers={}
+    )
+
+
+def test_large_payload_is_sent_as_a_claim_check(claim_blob_client):
+    payload = {"id": 1, "notes": "x" * 200}
+    with patch.object(service_layer, "send_to_topic") as send_to_topic:
+        response = service_layer.main(make_request(payload))
+
+    assert response.status_code == HTTPStatus.OK
+    blob_name = claim_blob_client.call_args.kwargs["blob"]
+    assert claim_blob_client.call_args.kwargs["container"] == "claim-checks"
+    claim_blob_client.return_value.upload_blob.assert_called_once_with(json.dumps(payload).encode("utf-8"))
+
+    message = send_to_topic.call_args.args[1]
+    assert json.loads(str(message)) == {
+        "claim_check": {"container": "claim-checks", "blob": blob_name, "size": len(json.dumps(payload))}
+    }
+    assert message.application_properties["claim_check_blob"] == blob_name
+    assert message.application_properties["claim_check_size"] == len(json.dumps(payload))
+
+
+def test_small_payload_stays_inline(claim_blob_client):
+    with patch.object(service_layer, "send_to_topic") as send_to_topic:
+        service_layer.main(make_request({"id": 1}))
+
+    claim_blob_client.assert_not_called()
+    message = send_to_topic.call_args.args[1]
+    assert json.loads(str(message)) == {"id": 1}
+    assert "claim_check_blob" not in message.application_properties
+
+
+def test_claim_checks_are_off_by_default(claim_blob_client, monkeypatch):
+    monkeypatch.delenv("SERVICE_BUS_CLAIM_CHECK_ENABLED")
+    with patch.object(service_layer, "send_to_topic") as send_to_topic:
+        service_layer.main(make_request({"id": 1, "notes": "x" * 200}))
+
+    claim_blob_client.assert_not_called()
+    assert json.loads(str(send_to_topic.call_args.args[1]))["notes"] == "x" * 200
+
+
+def test_missing_claim_check_container_is_a_configuration_error(claim_blob_client, monkeypatch):
+    monkeypatch.delenv("AZURITE_CLAIM_CHECK_CONTAINER_NAME")
+    with patch.object(service_layer, "send_to_topic") as send_to_topic:
+        response = service_layer.main(make_request({"id": 1}))
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    send_to_topic.assert_not_called()
+
+
+def make_bulk_request(records: list) -> func.HttpRequest:
+    body = "\n".join(json.dumps(record) for record in records).encode("utf-8")
+    return func.HttpRequest(
+        method="POST", url="/api/service_layer", body=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+
+
+BULK_RECORDS = [{"id": 0}, {"id": 1, "notes": "x" * 200}, {"id": 2}]
+
+
+def send_all(env, messages):
+    return [None] * len(messages)
+
+
+def test_failed_claim_check_upload_only_fails_its_record(claim_blob_client):
+    claim_blob_client.return_value.upload_blob.side_effect = ServiceRequestError("storage unavailable")
+    with patch.object(service_layer, "send_batch_to_topic", side_effect=send_all) as send:
+        response = service_layer.main(make_bulk_request(BULK_RECORDS))
+
+    assert response.status_code == HTTPStatus.MULTI_STATUS
+    results = json.loads(response.get_body())["results"]
+    assert [result["status"] for result in results] == ["accepted", "failed", "accepted"]
+    assert "storage unavailable" in results[1]["error"]
+    assert [json.loads(str(message))["id"] for message in send.call_args.args[1]] == [0, 2]
+
+
+def test_failed_claim_check_upload_only_fails_its_record_async(claim_blob_client):
+    claim_blob_client.return_value.upload_blob.side_effect = ServiceRequestError("storage unavailable")
+    send = AsyncMock(side_effect=send_all)
+    with patch.object(async_service_layer, "send_batch_to_topic", send):
+        response = asyncio.run(async_service_layer.main(make_bulk_request(BULK_RECORDS)))
+
+    assert response.status_code == HTTPStatus.MULTI_STATUS
+    results = json.loads(response.get_body())["results"]
+    assert [result["status"] for result in results] == ["accepted", "failed", "accepted"]
+    assert [json.loads(str(message))["id"] for message in send.call_args.args[1]] == [0, 2]
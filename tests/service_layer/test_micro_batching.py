@@ -0,0 +1,200 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from unittest.mock import MagicMock, patch
+import pytest
+import azure.functions as func
+from azure.servicebus.exceptions import MessageSizeExceededError, ServiceBusConnectionError, ServiceBusError
+from function_apps.service_layer.service_layer import service_layer
+from function_apps.service_layer.service_layer.batching import (
+    MicroBatcher,
+    MicroBatchTimeout,
+    SendProgress,
+    send_in_batches,
+)
+from function_apps.service_layer.service_layer.sender_pool import SenderPool
+
+
+class FakeBatch:
+    """Stand-in for ServiceBusMessageBatch that holds a fixed number of messages."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.messages = []
+
+    def add_message(self, message):
+        if len(self.messages) >= self.capacity:
+            raise MessageSizeExceededError(message="batch is full")
+        self.messages.append(message)
+
+
+class FakeSender:
+    def __init__(self, capacity: int = 3, fail_on_send: int = 0):
+        self.capacity = capacity
+        self.fail_on_send = fail_on_send
+        self.sent = []
+
+    def create_message_batch(self, max_size_in_bytes=None):
+        return FakeBatch(self.capacity)
+
+    def send_messages(self, batch):
+        self.sent.append(list(batch.messages))
+        if len(self.sent) == self.fail_on_send:
+            raise ServiceBusError("send failed")
+
+
+def test_send_in_batches_rolls_over_full_batches():
+    """Messages are packed into as few batches as fit, preserving order."""
+    sender = FakeSender(capacity=3)
+
+    results = send_in_batches(sender, list(range(7)))
+
+    assert sender.sent == [[0, 1, 2], [3, 4, 5], [6]]
+    assert results == [None] * 7
+
+
+def test_send_in_batches_reports_failures_per_message():
+    """Only the messages in a failed batch are reported as failed."""
+    sender = FakeSender(capacity=2, fail_on_send=2)
+
+    results = send_in_batches(sender, list(range(5)))
+
+    assert [error is None for error in results] == [True, True, False, False, True]
+
+
+def test_send_in_batches_respects_message_limit():
+    sender = FakeSender(capacity=10)
+
+    send_in_batches(sender, list(range(5)), max_messages=2)
+
+    assert sender.sent == [[0, 1], [2, 3], [4]]
+
+
+def test_retry_after_a_dropped_connection_only_sends_the_remainder():
+    sent = []
+
+    class DroppingSender(FakeSender):
+        def send_messages(self, batch):
+            if len(sent) == 1 and not getattr(self, "dropped", False):
+                self.dropped = True
+                raise ServiceBusConnectionError(message="connection lost")
+            sent.append(list(batch.messages))
+
+    sender = DroppingSender(capacity=2)
+    client = MagicMock()
+    client.get_topic_sender.return_value = sender
+    progress = SendProgress(5)
+
+    results = SenderPool().run(
+        "key", "topic.1", lambda: client, lambda pooled: send_in_batches(pooled, list(range(1, 6)), progress=progress)
+    )
+
+    assert sent == [[1, 2], [3, 4], [5]]
+    assert results == [None] * 5
+
+
+def test_concurrent_submissions_are_coalesced():
+    """Messages submitted within the linger window share a single broker call."""
+    calls = []
+    batcher = MicroBatcher(lambda key, messages: calls.append(messages) or [None] * len(messages), linger=0.2)
+
+    futures = [batcher.submit("key", f"message-{i}", 10) for i in range(5)]
+    for future in futures:
+        future.result(timeout=5)
+    batcher.close()
+
+    assert len(calls) == 1
+    assert calls[0] == [f"message-{i}" for i in range(5)]
+
+
+def test_full_batch_is_flushed_without_waiting_for_linger():
+    flushed = threading.Event()
+    batcher = MicroBatcher(
+        lambda key, messages: flushed.set() or [None] * len(messages), max_messages=2, linger=60
+    )
+
+    batcher.submit("key", "a", 1)
+    batcher.submit("key", "b", 1)
+
+    assert flushed.wait(timeout=5)
+    batcher.close()
+
+
+def test_each_caller_gets_its_own_outcome():
+    error = ServiceBusError("rejected")
+    batcher = MicroBatcher(lambda key, messages: [None, error], linger=0.2)
+
+    ok = batcher.submit("key", "a", 1)
+    failed = batcher.submit("key", "b", 1)
+
+    assert ok.result(timeout=5) is None
+    with pytest.raises(ServiceBusError):
+        failed.result(timeout=5)
+    batcher.close()
+
+
+def test_timed_out_message_is_withdrawn_if_not_yet_sent():
+    sent = []
+    batcher = MicroBatcher(lambda key, messages: sent.extend(messages) or [None] * len(messages), linger=0.5)
+
+    with pytest.raises(MicroBatchTimeout) as timeout:
+        batcher.send("key", "a", 1, timeout=0.05)
+    batcher.close()
+
+    assert timeout.value.in_flight is False
+    assert sent == []
+
+
+def test_timed_out_message_already_in_a_batch_is_reported_in_flight():
+    release = threading.Event()
+    batcher = MicroBatcher(lambda key, messages: release.wait(5) and [None] * len(messages), linger=0)
+
+    with pytest.raises(MicroBatchTimeout) as timeout:
+        batcher.send("key", "a", 1, timeout=0.1)
+    release.set()
+    batcher.close()
+
+    assert timeout.value.in_flight is True
+
+
+def test_main_returns_service_unavailable_on_timeout(monkeypatch):
+    monkeypatch.setenv("SERVICE_BUS_MICRO_BATCH_ENABLED", "true")
+    monkeypatch.setenv("TOPIC_NAME", "topic.1")
+    monkeypatch.setenv("SERVICE_BUS_CONNECTION_STR", "Endpoint=sb://localhost;")
+    request = func.HttpRequest(method="POST", url="/api/service_layer", body=b'{"id": 1}', headers={})
+
+    with patch.object(service_layer.micro_batcher, "send", side_effect=MicroBatchTimeout(in_flight=True)):
+        response = service_layer.main(request)
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert b"may still be delivered" in response.get_body()
+
+
+def test_main_coalesces_concurrent_requests(monkeypatch):
+    """With micro-batching enabled, concurrent HTTP requests share batches."""
+    monkeypatch.setenv("SERVICE_BUS_MICRO_BATCH_ENABLED", "true")
+    monkeypatch.setenv("TOPIC_NAME", "topic.1")
+    monkeypatch.setenv("SERVICE_BUS_CONNECTION_STR", "Endpoint=sb://localhost;")
+    monkeypatch.setattr(service_layer.micro_batcher, "linger", 0.2)
+    service_layer.sender_pool.close()
+    sender = FakeSender(capacity=100)
+
+    with patch(
+        "function_apps.service_layer.service_layer.service_layer.ServiceBusClient"
+    ) as mock_client_cls:
+        client = MagicMock()
+        client.get_topic_sender.return_value = sender
+        mock_client_cls.from_connection_string.return_value = client
+
+        requests = [
+            func.HttpRequest(method="POST", url="/api/service_layer", body=json.dumps({"id": i}).encode(), headers={})
+            for i in range(8)
+        ]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(pool.map(service_layer.main, requests))
+
+    service_layer.sender_pool.close()
+    assert all(response.status_code == HTTPStatus.OK for response in responses)
+    assert sum(len(batch) for batch in sender.sent) == 8
+    assert len(sender.sent) < 8
@@ -0,0 +1,48 @@
+from http import HTTPStatus
+from unittest.mock import patch
+import pytest
+import azure.functions as func
+from function_apps.service_layer.service_layer import service_layer
+
+
+@pytest.fixture(autouse=True)
+def service_bus_env(monkeypatch):
+    monkeypatch.setenv("TOPIC_NAME", "topic.1")
+    monkeypatch.setenv("SERVICE_BUS_CONNECTION_STR", "Endpoint=sb://localhost;")
+
+
+def make_request(body: bytes, content_type: str = "application/json") -> func.HttpRequest:
+    return func.HttpRequest(method="POST", url="/api/service_layer", body=body, headers={"Content-Type": content_type})
+
+
+def message_body(message) -> bytes:
+    return b"".join(message.body)
+
+
+def test_payload_is_forwarded_byte_for_byte():
+    body = '{\n  "id": 1,\n  "name": "Zoë",\n  "big": 123456789012345678901234567890\n}'.encode("utf-8")
+    with patch.object(service_layer, "send_to_topic") as send_to_topic:
+        response = service_layer.main(make_request(body))
+
+    assert response.status_code == HTTPStatus.OK
+    assert message_body(send_to_topic.call_args.args[1]) == body
+
+
+def test_bulk_records_are_forwarded_byte_for_byte():
+    with patch.object(
+        service_layer, "send_batch_to_topic", side_effect=lambda env, messages: [None] * len(messages)
+    ) as send:
+        service_layer.main(make_request(b'[{"id": 1},  {"id" : 2}]'))
+        service_layer.main(make_request(b'{"id": 3}\n{ "id": 4 }\n', "application/x-ndjson"))
+
+    assert [message_body(message) for message in send.call_args_list[0].args[1]] == [b'{"id": 1}', b'{"id" : 2}']
+    assert [message_body(message) for message in send.call_args_list[1].args[1]] == [b'{"id": 3}', b'{ "id": 4 }']
+
+
+@pytest.mark.parametrize("body", [b'{"id": NaN}', b'{"name": "\xff"}'])
+def test_non_standard_json_is_rejected(body):
+    with patch.object(service_layer, "send_to_topic") as send_to_topic:
+        response = service_layer.main(make_request(body))
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    send_to_topic.assert_not_called()
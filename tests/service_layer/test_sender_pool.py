@@ -0,0 +1,106 @@
+import json
+from http import HTTPStatus
+from unittest.mock import MagicMock, patch
+import pytest
+import azure.functions as func
+from azure.servicebus.exceptions import ServiceBusConnectionError
+from function_apps.service_layer.service_layer import service_layer
+from function_apps.service_layer.service_layer.sender_pool import SenderPool
+
+CONNECTION_STR = "Endpoint=sb://localhost;SharedAccessKeyName=key;SharedAccessKey=value;"
+
+
+@pytest.fixture(autouse=True)
+def reset_pool():
+    service_layer.sender_pool.close()
+    yield
+    service_layer.sender_pool.close()
+
+
+@pytest.fixture
+def service_bus_env(monkeypatch):
+    monkeypatch.setenv("USE_MANAGED_IDENTITY", "false")
+    monkeypatch.setenv("TOPIC_NAME", "topic.1")
+    monkeypatch.setenv("SERVICE_BUS_CONNECTION_STR", CONNECTION_STR)
+
+
+@pytest.fixture
+def mock_service_bus_client():
+    with patch(
+        "function_apps.service_layer.service_layer.service_layer.ServiceBusClient"
+    ) as mock_client_cls:
+        yield mock_client_cls
+
+
+def make_request(payload) -> func.HttpRequest:
+    return func.HttpRequest(
+        method="POST",
+        url="/api/service_layer",
+        body=json.dumps(payload).encode("utf-8"),
+        headers={},
+    )
+
+
+def test_connection_is_reused_across_invocations(service_bus_env, mock_service_bus_client):
+    """Several invocations should share one client and sender."""
+    for i in range(3):
+        response = service_layer.main(make_request({"id": i}))
+        assert response.status_code == HTTPStatus.OK
+
+    mock_service_bus_client.from_connection_string.assert_called_once_with(CONNECTION_STR)
+    client = mock_service_bus_client.from_connection_string.return_value
+    client.get_topic_sender.assert_called_once_with(topic_name="topic.1")
+    assert client.get_topic_sender.return_value.send_messages.call_count == 3
+
+
+def test_connection_is_rebuilt_after_connection_error(service_bus_env, mock_service_bus_client):
+    """A connection error should drop the pooled sender and retry on a fresh one."""
+    stale_client, fresh_client = MagicMock(), MagicMock()
+    stale_client.get_topic_sender.return_value.send_messages.side_effect = ServiceBusConnectionError(
+        message="connection lost"
+    )
+    mock_service_bus_client.from_connection_string.side_effect = [stale_client, fresh_client]
+
+    response = service_layer.main(make_request({"id": 1}))
+
+    assert response.status_code == HTTPStatus.OK
+    stale_client.close.assert_called_once()
+    fresh_client.get_topic_sender.return_value.send_messages.assert_called_once()
+
+
+def test_connection_is_rebuilt_when_config_changes(monkeypatch, service_bus_env, mock_service_bus_client):
+    """Changing the topic should close the old connection and open a new one."""
+    first_client, second_client = MagicMock(), MagicMock()
+    mock_service_bus_client.from_connection_string.side_effect = [first_client, second_client]
+
+    service_layer.main(make_request({"id": 1}))
+    monkeypatch.setenv("TOPIC_NAME", "topic.2")
+    service_layer.main(make_request({"id": 2}))
+
+    first_client.close.assert_called_once()
+    second_client.get_topic_sender.assert_called_once_with(topic_name="topic.2")
+
+
+def test_missing_topic_returns_bad_request(monkeypatch, mock_service_bus_client):
+    """Missing configuration is reported before any connection is opened."""
+    monkeypatch.delenv("TOPIC_NAME", raising=False)
+
+    response = service_layer.main(make_request({"id": 1}))
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    mock_service_bus_client.from_connection_string.assert_not_called()
+
+
+def test_pool_never_opens_more_than_max_size():
+    """Idle senders are handed out again rather than opening new connections."""
+    pool = SenderPool(max_size=2)
+    factory = MagicMock()
+
+    with pool.sender("key", "topic", factory):
+        with pool.sender("key", "topic", factory):
+            pass
+    with pool.sender("key", "topic", factory):
+        pass
+
+    assert factory.call_count == 2
+    pool.close()
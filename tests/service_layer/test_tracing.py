@@ -0,0 +1,49 @@
+import json
+from unittest.mock import patch
+import pytest
+import azure.functions as func
+from function_apps.service_layer.service_layer import service_layer
+
+
+@pytest.fixture(autouse=True)
+def service_bus_env(monkeypatch):
+    monkeypatch.setenv("TOPIC_NAME", "topic.1")
+    monkeypatch.setenv("SERVICE_BUS_CONNECTION_STR", "Endpoint=sb://localhost;")
+
+
+def make_request(body: bytes, headers: dict) -> func.HttpRequest:
+    return func.HttpRequest(method="POST", url="/api/service_layer", body=body, headers=headers)
+
+
+def test_trace_headers_become_application_properties():
+    request = make_request(
+        json.dumps({"id": 1}).encode("utf-8"), {"X-Correlation-Id": "abc", "X-Capture-Time": "1700000000000"}
+    )
+    with patch.object(service_layer, "send_to_topic") as send_to_topic:
+        response = service_layer.main(request)
+
+    assert response.status_code == 200
+    message = send_to_topic.call_args.args[1]
+    assert message.correlation_id == "abc"
+    assert message.application_properties["correlation_id"] == "abc"
+    assert message.application_properties["capture_time"] == 1700000000000
+    assert "received_time" in message.application_properties
+
+
+def test_bulk_records_get_indexed_correlation_ids():
+    request = make_request(b'{"id": 1}\n{"id": 2}\n', {"Content-Type": "application/x-ndjson", "X-Correlation-Id": "abc"})
+    with patch.object(service_layer, "send_batch_to_topic", side_effect=lambda env, messages: [None] * len(messages)) as send:
+        service_layer.main(request)
+
+    messages = send.call_args.args[1]
+    assert [message.correlation_id for message in messages] == ["abc.0", "abc.1"]
+    assert "capture_time" not in messages[0].application_properties
+
+
+def test_missing_correlation_id_starts_a_new_trace():
+    with patch.object(service_layer, "send_to_topic") as send_to_topic:
+        service_layer.main(make_request(json.dumps({"id": 1}).encode("utf-8"), {"X-Capture-Time": "soon"}))
+
+    message = send_to_topic.call_args.args[1]
+    assert len(message.correlation_id) == 32
+    assert "capture_time" not in message.application_properties